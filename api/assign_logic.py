@@ -17,62 +17,124 @@ def load_exercise(exercise_id: str):
     return data
 
 
-def assign_exercise_to_patient(patient_id: str, exercise_id: str):
+def selection_fields(tipo: str, personalizado: bool) -> dict:
+    """
+    Campos de /ejercicios_VNEST para elegir un ejercicio nuevo sin leer /ejercicios:
+    visibilidad copiada del ejercicio general y una clave aleatoria fija.
+    """
+    return {
+        "publico": tipo != "privado",
+        "personalizado": personalizado,
+        "aleatorio": random.random(),
+    }
+
+
+# ============================================================
+# Prioridad de asignaciones
+# ============================================================
+# /pacientes/{id}/contadores/ejercicios_asignados guarda la última prioridad
+# usada. Se lee e incrementa en la misma transacción que escribe la
+# asignación: lecturas constantes y prioridades únicas aunque haya
+# asignaciones concurrentes (Firestore reintenta la transacción si choca).
+
+def _counter_ref(patient_ref):
+    return patient_ref.collection("contadores").document("ejercicios_asignados")
+
+
+@firestore.transactional
+def _assign_with_priority(
+    transaction, patient_ref, exercise_id: str, data: dict, extra_writes=()
+) -> int:
+    """`extra_writes` [(ref, datos)] se escriben en la misma transacción (p. ej. el ejercicio recién creado)."""
+    counter_ref = _counter_ref(patient_ref)
+    col_ref = patient_ref.collection("ejercicios_asignados")
+
+    counter = counter_ref.get(transaction=transaction)
+    if counter.exists:
+        last = counter.to_dict().get("ultima_prioridad", 0)
+    else:
+        # Pacientes sin contador: se parte de la mayor prioridad existente (una sola vez)
+        top = list(
+            col_ref.order_by("prioridad", direction=firestore.Query.DESCENDING)
+            .limit(1)
+            .stream(transaction=transaction)
+        )
+        last = top[0].to_dict().get("prioridad", 0) if top else 0
+
+    prioridad = last + 1
+    for ref, doc in extra_writes:
+        transaction.set(ref, doc)
+    transaction.set(counter_ref, {"ultima_prioridad": prioridad})
+    transaction.set(col_ref.document(exercise_id), {**data, "prioridad": prioridad})
+    return prioridad
+
+
+def assign_with_priority(patient_id: str, exercise_id: str, data: dict, extra_writes=()) -> int:
+    """Escribe la asignación `data` con la siguiente prioridad del paciente; devuelve la prioridad."""
+    patient_ref = db.collection("pacientes").document(patient_id)
+    return _assign_with_priority(db.transaction(), patient_ref, exercise_id, data, extra_writes)
+
+
+def assignment_record(exercise_id: str, exercise_data: dict, sub_data: dict) -> dict:
+    """
+    Documento de /pacientes/{id}/ejercicios_asignados/{exercise_id} (sin prioridad)
+    a partir del ejercicio general y el específico. Copia verbo, nivel y
+    personalizado para poder filtrar sin volver a leer el ejercicio.
+    """
+    tipo = exercise_data.get("terapia")
+    if not tipo:
+        raise ValueError(f"El ejercicio {exercise_id} no tiene campo 'tipo' definido")
+
+    context = sub_data.get("contexto")
+    if not context:
+        raise ValueError(f"No se encontró el contexto para el ejercicio {exercise_id} (tipo {tipo})")
+
+    return {
+        "id_ejercicio": exercise_id,
+        "contexto": context,
+        "tipo": tipo,
+        "verbo": sub_data.get("verbo"),
+        "nivel": sub_data.get("nivel"),
+        "estado": "pendiente",
+        "ultima_fecha_realizado": None,
+        "veces_realizado": 0,
+        "fecha_asignacion": firestore.SERVER_TIMESTAMP,
+        "personalizado": exercise_data.get("personalizado", False),
+    }
+
+
+def assign_exercise_to_patient(
+    patient_id: str,
+    exercise_id: str,
+    exercise_data: dict = None,
+    sub_data: dict = None,
+):
     """
     Crea el registro en /patients/{id}/ejercicios_asignados/,
     buscando automáticamente el contexto según el tipo de ejercicio.
+    Si quien llama ya leyó el ejercicio base (`exercise_data`) o el
+    específico (`sub_data`), no se vuelven a leer.
     """
     try:
         # Buscar el ejercicio base para saber su tipo
-        exercise_doc = db.collection("ejercicios").document(exercise_id).get()
-        if not exercise_doc.exists:
-            raise ValueError(f"No existe el ejercicio con ID {exercise_id}")
+        if exercise_data is None:
+            exercise_doc = db.collection("ejercicios").document(exercise_id).get()
+            if not exercise_doc.exists:
+                raise ValueError(f"No existe el ejercicio con ID {exercise_id}")
+            exercise_data = exercise_doc.to_dict()
 
-        exercise_data = exercise_doc.to_dict()
+        # Buscar el ejercicio específico (contexto, verbo, nivel) según el tipo
         tipo = exercise_data.get("terapia")
-
-        if not tipo:
-            raise ValueError(f"El ejercicio {exercise_id} no tiene campo 'tipo' definido")
-
-        # Buscar el contexto según el tipo
-        context = None
-        if tipo == "VNEST":
-            sub_doc = db.collection("ejercicios_VNEST").document(exercise_id).get()
+        if sub_data is None and tipo in ("VNEST", "SR"):
+            sub_doc = db.collection(f"ejercicios_{tipo}").document(exercise_id).get()
             if sub_doc.exists:
-                context = sub_doc.to_dict().get("contexto")
-        elif tipo == "SR":
-            sub_doc = db.collection("ejercicios_SR").document(exercise_id).get()
-            if sub_doc.exists:
-                context = sub_doc.to_dict().get("contexto")
+                sub_data = sub_doc.to_dict()
 
-        if not context:
-            raise ValueError(f"No se encontró el contexto para el ejercicio {exercise_id} (tipo {tipo})")
+        data = assignment_record(exercise_id, exercise_data, sub_data or {})
 
-        # Calcular la prioridad del nuevo ejercicio
-        col_ref = (
-            db.collection("pacientes")
-            .document(patient_id)
-            .collection("ejercicios_asignados")
-        )
-        docs = col_ref.stream()
-        priorities = [d.to_dict().get("prioridad", 0) for d in docs]
-        next_priority = max(priorities) + 1 if priorities else 1
-
-        # Detectar si es personalizado
-        personalizado = exercise_data.get("personalizado", False)
-
-        # Crear el documento en la subcolección del paciente
-        col_ref.document(exercise_id).set({
-            "id_ejercicio": exercise_id,
-            "contexto": context,
-            "tipo": tipo,
-            "estado": "pendiente",
-            "prioridad": next_priority,
-            "ultima_fecha_realizado": None,
-            "veces_realizado": 0,
-            "fecha_asignacion": firestore.SERVER_TIMESTAMP,
-            "personalizado": personalizado,
-        })
+        # Crear el documento en la subcolección del paciente (la prioridad
+        # se asigna en la misma transacción que incrementa el contador)
+        assign_with_priority(patient_id, exercise_id, data)
 
         print(f"Ejercicio {exercise_id} asignado correctamente al paciente {patient_id}")
 
@@ -80,6 +142,38 @@ def assign_exercise_to_patient(patient_id: str, exercise_id: str):
         print(f"Error al asignar ejercicio: {e}")
 
 
+# ============================================================
+# Selección aleatoria de ejercicios no asignados
+# ============================================================
+# Cada ejercicio VNEST tiene una clave 'aleatorio' en [0, 1). Se sortea r y
+# se leen los primeros k ejercicios públicos con clave >= r (dando la vuelta
+# desde 0 si no alcanzan); k cubre los ya asignados más unos pocos extra, así
+# que las lecturas no dependen del tamaño del catálogo.
+CANDIDATOS_EXTRA = 5
+
+
+def _pick_unassigned(context: str, verbo: str, assigned_ids: set):
+    """Primer ejercicio público del verbo con clave >= r que el paciente no tenga asignado."""
+    k = len(assigned_ids) + CANDIDATOS_EXTRA
+    r = random.random()
+    base = (
+        db.collection("ejercicios_VNEST")
+        .where("contexto", "==", context)
+        .where("verbo", "==", verbo)
+        .where("publico", "==", True)
+    )
+    for query in (
+        base.where("aleatorio", ">=", r).order_by("aleatorio").limit(k),
+        base.where("aleatorio", "<", r).order_by("aleatorio").limit(k),
+    ):
+        for doc in query.stream():
+            if doc.id not in assigned_ids:
+                data = doc.to_dict()
+                data["id"] = doc.id
+                return data
+    return None
+
+
 # ============================================================
 # Función principal con lógica de highlight
 # ============================================================
@@ -93,90 +187,53 @@ def get_exercise_for_context(email: str, context: str, verbo: str):
     Agrega 'highlight' = True si el ejercicio es personalizado.
     """
     try:
-        patient_ref = db.collection("pacientes").document(email)
+        assigned_ref = (
+            db.collection("pacientes").document(email).collection("ejercicios_asignados")
+        )
 
-        # Obtener todos los ejercicios asignados del contexto
-        assigned_docs = (
-            patient_ref.collection("ejercicios_asignados")
-            .where("contexto", "==", context)
+        # Pendiente del verbo: personalizados primero, luego por prioridad
+        # (índice compuesto en database/firestore.indexes.json)
+        pending = list(
+            assigned_ref.where("contexto", "==", context)
+            .where("verbo", "==", verbo)
+            .where("estado", "==", "pendiente")
+            .order_by("personalizado", direction=firestore.Query.DESCENDING)
+            .order_by("prioridad")
+            .limit(1)
             .stream()
         )
-        assigned_list = [doc.to_dict() for doc in assigned_docs]
-
-        # Filtrar por verbo y agregar personalización
-        pending, completed = [], []
-        for e in assigned_list:
-            vn_doc = db.collection("ejercicios_VNEST").document(e["id_ejercicio"]).get()
-            if not vn_doc.exists:
-                continue
-            vn_data = vn_doc.to_dict()
-            if vn_data.get("verbo") != verbo:
-                continue
-
-            general_id = vn_data.get("id_ejercicio_general")
-            personalizado = False
-            if general_id:
-                ex_doc = db.collection("ejercicios").document(general_id).get()
-                if ex_doc.exists:
-                    personalizado = ex_doc.to_dict().get("personalizado", False)
-
-            e["personalizado"] = personalizado
-            e["highlight"] = personalizado
-            e["prioridad"] = int(e.get("prioridad", 999))
-
-            if e["estado"] == "pendiente":
-                pending.append(e)
-            else:
-                completed.append(e)
-
-        # Ordenar pendientes: personalizados primero, luego por prioridad
-        pending_sorted = sorted(
-            pending, key=lambda x: (not x["personalizado"], x["prioridad"])
-        )
-        if pending_sorted:
-            chosen = pending_sorted[0]
+        if pending:
+            chosen = pending[0].to_dict()
             print("Devolviendo ejercicio pendiente existente")
             ex = load_exercise(chosen["id_ejercicio"])
             if ex:
-                ex["highlight"] = chosen.get("highlight", False)
+                ex["highlight"] = chosen.get("personalizado", False)
             return ex
 
-        # Buscar ejercicios VNEST no asignados para el verbo
-        all_docs = db.collection("ejercicios_VNEST").where("contexto", "==", context).stream()
-        available = []
-        for doc in all_docs:
-            data = doc.to_dict()
-            data["id"] = doc.id
-            if data.get("verbo") != verbo:
-                continue
-            if any(a["id_ejercicio"] == doc.id for a in assigned_list):
-                continue
-
-            # Revisar tipo y personalización
-            general_id = data.get("id_ejercicio_general")
-            tipo = "publico"
-            personalizado = False
-            if general_id:
-                ex_doc = db.collection("ejercicios").document(general_id).get()
-                if ex_doc.exists:
-                    base = ex_doc.to_dict()
-                    tipo = base.get("tipo", "publico")
-                    personalizado = base.get("personalizado", False)
-
-            if tipo != "privado":
-                data["highlight"] = personalizado
-                available.append(data)
+        # Asignados del verbo (ninguno pendiente): se excluyen al buscar nuevos
+        # y sirven para devolver el completado más antiguo
+        completed = [
+            doc.to_dict()
+            for doc in assigned_ref.where("contexto", "==", context)
+            .where("verbo", "==", verbo)
+            .stream()
+        ]
 
         # Asignar uno nuevo si hay disponibles
-        if available:
-            choice = random.choice(available)
+        assigned_ids = {a["id_ejercicio"] for a in completed}
+        choice = _pick_unassigned(context, verbo, assigned_ids)
+        if choice:
             new_ex_id = choice["id"]
+            highlight = choice.get("personalizado", False)
             print(f"Asignando nuevo ejercicio {new_ex_id} al paciente {email}")
-            assign_exercise_to_patient(email, new_ex_id)
-            ex = load_exercise(new_ex_id)
-            if ex:
-                ex["highlight"] = choice.get("highlight", False)
-            return ex
+            assign_exercise_to_patient(
+                email,
+                new_ex_id,
+                exercise_data={"terapia": "VNEST", "personalizado": highlight},
+                sub_data=choice,
+            )
+            choice["highlight"] = highlight
+            return choice
 
         # Si no hay pendientes ni nuevos, devolver el completado más antiguo
         completed_valid = [e for e in completed if e.get("ultima_fecha_realizado")]
@@ -1,13 +1,6 @@
-import json
+import json, asyncio
 from typing import List, Dict, Any
-from openai import AzureOpenAI
-
-# ============== CONFIG ==============
-AZURE_ENDPOINT = "https://invuniandesai-2.openai.azure.com/"
-AZURE_DEPLOYMENT = "gpt-4.1"  # nombre del deployment del modelo, ej. "gpt-4o-mini"
-AZURE_API_KEY = ""
-AZURE_API_VERSION = "2024-12-01-preview"  # usa la que tengas habilitada
-# ====================================
+import llm_client
 
 
 # ---------- Prompts ----------
@@ -178,16 +171,6 @@ def generate_prompt_b(contexto: str) -> str:
     )
 
 
-# ---------- Cliente Azure ----------
-
-def get_client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=AZURE_API_KEY,
-        azure_endpoint=AZURE_ENDPOINT,
-        api_version=AZURE_API_VERSION,
-    )
-
-
 # ---------- Utilidades ----------
 
 def parse_json(raw: str) -> Any:
@@ -217,27 +200,24 @@ def parse_json(raw: str) -> Any:
     return json.loads(s)
 
 
+SYSTEM_PROMPT = (
+    "Eres experto en terapias del lenguaje y en la generación de ejercicios VNeST "
+    "(Verb Network Strengthening Treatment) para pacientes con afasia."
+)
+
+async def _run_prompt(prompt: str) -> Dict[str, Any]:
+    try:
+        return await llm_client.run_prompt(
+            prompt, SYSTEM_PROMPT, temperature=0.4, max_tokens=1200, top_p=1.0, parser=parse_json
+        )
+    finally:
+        # Cada asyncio.run abre un loop nuevo: el pool ligado a este se cierra antes de salir
+        await llm_client.aclose_client()
+
+
 def run_prompt(prompt: str) -> Dict[str, Any]:
-    client = get_client()
-    resp = client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,  # nombre del deployment en Azure
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "Eres experto en terapias del lenguaje y en la generación de ejercicios VNeST "
-                    "(Verb Network Strengthening Treatment) para pacientes con afasia."
-                ),
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.4,          # más estable
-        top_p=1.0,
-        max_tokens=1200,
-        response_format={"type": "json_object"},  # fuerza JSON
-    )
-    content = resp.choices[0].message.content
-    return parse_json(content)
+    # Script síncrono: usa el mismo cliente compartido que la API
+    return asyncio.run(_run_prompt(prompt))
 
 
 # ---------- Flujo ejemplo ----------
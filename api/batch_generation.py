@@ -0,0 +1,125 @@
+import os, time, uuid, asyncio
+from typing import List
+
+import main_langraph_vnest as vnest  # inicializa firebase_admin
+import checkpoints
+import context_lexicon
+import metrics
+
+# ============================================================
+# Generación VNeST por lotes
+# ============================================================
+# - Límite global (por proceso) de pipelines concurrentes y de arranques por minuto.
+# - step1/step2 se ejecutan una sola vez por contexto; los ítems arrancan con el léxico listo.
+# - Los ejercicios se escriben con WriteBatch (save_pending_docs) en lugar de dos set() por ítem.
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+BATCH_MAX_PER_MINUTE = float(os.getenv("BATCH_MAX_PER_MINUTE", "60"))
+FIRESTORE_BATCH_LIMIT = 500  # operaciones por commit
+
+
+class RateLimiter:
+    """Espacia los arranques para no superar `per_minute` por minuto."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+_limiter = RateLimiter(BATCH_MAX_PER_MINUTE)
+
+# ==============================
+# PASOS
+# ==============================
+async def _ensure_lexicon(contexto: str):
+    """Genera y clasifica los verbos del contexto si aún no están guardados."""
+    if await asyncio.to_thread(context_lexicon.get_lexicon, contexto):
+        return
+    async with _semaphore:
+        await _limiter.wait()
+        state = await vnest.step1_generate_verbs({"contexto": contexto})
+        await vnest.step2_classify_verbs(state)
+
+
+async def _run_item(item: dict, creado_por: str, run_id: str) -> dict:
+    async with _semaphore:
+        await _limiter.wait()
+        state = {
+            "contexto": item["context"],
+            "nivel": item["nivel"],
+            "tipo": item.get("tipo", "privado"),
+            "creado_por": creado_por,
+            "diferir_guardado": True,
+        }
+        return await vnest.get_workflow().ainvoke(state, config=vnest.run_config(run_id))
+
+
+# ==============================
+# MAIN
+# ==============================
+@metrics.pipeline("vnest_batch")
+async def generate_batch(items: List[dict], creado_por: str) -> List[dict]:
+    """
+    items: [{"context": str, "nivel": str, "tipo": str}]
+    Devuelve un reporte por ítem, en el mismo orden: {"indice", "ok", "ejercicio" | "error" + "run_id"}.
+    """
+    report: List[dict] = [{"indice": i} for i in range(len(items))]
+
+    # 1️⃣ Léxico compartido: una sola generación por contexto distinto
+    contexts = {context_lexicon.normalize_context(it["context"]): it["context"] for it in items}
+    lexicon_results = await asyncio.gather(
+        *[_ensure_lexicon(c) for c in contexts.values()], return_exceptions=True
+    )
+    lexicon_errors = {
+        key: res for key, res in zip(contexts, lexicon_results) if isinstance(res, Exception)
+    }
+
+    # 2️⃣ Pipelines concurrentes (desde step3 gracias al léxico)
+    runnable = []
+    for i, it in enumerate(items):
+        err = lexicon_errors.get(context_lexicon.normalize_context(it["context"]))
+        if err is not None:
+            report[i].update({"ok": False, "error": f"Léxico del contexto: {err}"})
+        else:
+            runnable.append(i)
+
+    # Cada ítem con su run_id: si falla, se reanuda con /context/generate/resume/{run_id}
+    run_ids = {i: uuid.uuid4().hex for i in runnable}
+    results = await asyncio.gather(
+        *[_run_item(items[i], creado_por, run_ids[i]) for i in runnable], return_exceptions=True
+    )
+    done = []
+    for i, res in zip(runnable, results):
+        if isinstance(res, Exception):
+            report[i].update({"ok": False, "error": str(res), "run_id": run_ids[i]})
+        else:
+            done.append((i, res))
+
+    # 3️⃣ Escritura agrupada (dos documentos por ejercicio)
+    per_commit = FIRESTORE_BATCH_LIMIT // 2
+    saved = 0
+    for start in range(0, len(done), per_commit):
+        chunk = done[start:start + per_commit]
+        try:
+            await asyncio.to_thread(vnest.save_pending_docs, *[res["docs_pendientes"] for _, res in chunk])
+        except Exception as e:
+            for i, _ in chunk:
+                report[i].update({"ok": False, "error": f"Error guardando en Firestore: {e}", "run_id": run_ids[i]})
+            continue
+        for i, res in chunk:
+            report[i].update({"ok": True, "ejercicio": vnest._to_response(res)})
+            await checkpoints.forget(run_ids[i])
+        saved += len(chunk)
+
+    print(f"✅ Lote VNeST: {saved}/{len(items)} ejercicios guardados")
+    return report
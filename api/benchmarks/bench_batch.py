@@ -0,0 +1,90 @@
+"""
+Generación por lotes: ejercicios por minuto uno por uno (antes) vs. /context/generate/batch (ahora).
+
+Levanta el servidor falso de Azure OpenAI y genera los mismos ítems
+(contextos x niveles) de dos formas:
+- "secuencial": una llamada a main_langraph_vnest por ítem, como el bucle del frontend.
+- "lote":       batch_generation.generate_batch (léxico compartido por contexto,
+                pipelines concurrentes acotados y escritura con WriteBatch).
+
+`db` se reemplaza por un mock y la caché de LLM se desactiva con force_fresh,
+así que el tiempo medido es LLM falso + orquestación.
+
+Uso (desde api/, con serviceAccountKey.json disponible):
+    python -m benchmarks.bench_batch --contexts 5 --latency 1.0 --concurrency 8
+"""
+import argparse, asyncio, os, tempfile, time
+from unittest.mock import MagicMock
+
+from benchmarks import fake_llm_server
+
+NIVELES = ("facil", "medio", "dificil")
+
+
+def _items(n_contexts: int) -> list:
+    return [
+        {"context": f"contexto de prueba {c}", "nivel": nivel, "tipo": "privado"}
+        for c in range(n_contexts)
+        for nivel in NIVELES
+    ]
+
+
+def _mock_db() -> MagicMock:
+    db = MagicMock()
+    db.collection.return_value.document.return_value.get.return_value.exists = False
+    return db
+
+
+def _reset(modules):
+    for module in modules:
+        module.db = _mock_db()
+    modules[0]._mirror.clear()
+
+
+async def run_mode(mode: str, items: list) -> dict:
+    import main_langraph_vnest as vnest
+    import batch_generation, context_lexicon, exercise_store, llm_cache
+
+    _reset([context_lexicon, vnest, exercise_store])
+    llm_cache.force_fresh.set(True)
+
+    t0 = time.perf_counter()
+    if mode == "secuencial":
+        ok = 0
+        for it in items:
+            await vnest.main_langraph_vnest(it["context"], it["nivel"], "bench", it["tipo"])
+            ok += 1
+    else:
+        report = await batch_generation.generate_batch(items, "bench")
+        ok = sum(1 for r in report if r["ok"])
+    wall = time.perf_counter() - t0
+
+    return {
+        "modo": mode,
+        "items": len(items),
+        "ok": ok,
+        "tiempo_total_s": round(wall, 2),
+        "ejercicios_por_minuto": round(ok / wall * 60, 1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--contexts", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-minute", type=float, default=6000)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    os.environ["AZURE_ENDPOINT"] = f"http://127.0.0.1:{args.port}/"
+    os.environ.setdefault("AZURE_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3")
+    os.environ["BATCH_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ["BATCH_MAX_PER_MINUTE"] = str(args.per_minute)
+    os.environ["LLM_USAGE_RECORDS"] = "0"  # no escribir registros de tokens en el Firestore real
+    fake_llm_server.start_in_thread(args.port, args.latency)
+
+    items = _items(args.contexts)
+    for mode in ("secuencial", "lote"):
+        print(asyncio.run(run_mode(mode, items)))
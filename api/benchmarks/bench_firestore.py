@@ -0,0 +1,194 @@
+"""
+Costo en Firestore de cada operación de la API contra el emulador.
+
+Levanta el emulador (o usa FIRESTORE_EMULATOR_HOST), siembra un catálogo y
+pacientes sintéticos (benchmarks.seed_synthetic) y mide, por tamaño de
+historial del paciente:
+- get_exercise_for_context
+- assign_exercise_to_patient
+- save_sr_cards (5 tarjetas)
+- exercise_store.save_exercise, sin paciente (step5) y con asignación (personalización)
+
+Reporta p50/p95 de latencia y lecturas/escrituras/viajes medios, y la curva
+de crecimiento de cada operación según el historial. El resultado se guarda
+en JSON (con el commit actual) para comparar entre commits con --compare.
+
+Uso (desde api/):
+    python -m benchmarks.bench_firestore --exercises 10000 --patients 1000 --histories 0 10 50 200
+    python -m benchmarks.bench_firestore --compare benchmarks/results/firestore_<commit>.json
+"""
+import argparse, json, os, random, statistics, subprocess, time, uuid
+from datetime import datetime, timezone
+
+from benchmarks import emulator, firestore_counters, seed_synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "desconocido"
+
+
+def _summary(operacion: str, historial: int, samples: list) -> dict:
+    lat = sorted(s["ms"] for s in samples)
+    media = lambda k: round(statistics.mean(s[k] for s in samples), 2)
+    return {
+        "operacion": operacion,
+        "historial": historial,
+        "n": len(samples),
+        "p50_ms": round(statistics.median(lat), 2),
+        "p95_ms": round(lat[int(0.95 * (len(lat) - 1))], 2),
+        "lecturas": media("lecturas"),
+        "escrituras": media("escrituras"),
+        "viajes": media("viajes"),
+    }
+
+
+def _measure(fn) -> dict:
+    with firestore_counters.measure() as c:
+        t0 = time.perf_counter()
+        fn()
+        ms = (time.perf_counter() - t0) * 1000
+    return {"ms": ms, **c}
+
+# ==============================
+# OPERACIONES
+# ==============================
+def _operations(catalog: dict):
+    import assign_logic, exercise_store
+    import main_langraph_sr as sr
+
+    all_ids = [ex_id for ids in catalog.values() for ex_id in ids]
+    cards = [{"stimulus": f"¿Pregunta {i}?", "answer": f"Respuesta {i}"} for i in range(5)]
+
+    def get_exercise(p, rng):
+        verbo = seed_synthetic.verbo(int(p["contexto"].split()[-1]), rng.randrange(seed_synthetic.VERBOS_POR_CONTEXTO))
+        assign_logic.get_exercise_for_context(p["email"], p["contexto"], verbo)
+
+    def assign(p, rng):
+        assign_logic.assign_exercise_to_patient(p["email"], rng.choice(all_ids))
+
+    def save_sr(p, rng):
+        sr.save_sr_cards(p["email"], cards)
+
+    def _docs(p):
+        doc_id = f"B{uuid.uuid4().hex[:8].upper()}"
+        general = {"id": doc_id, "terapia": "VNEST", "tipo": "privado", "personalizado": True}
+        vnest = {
+            "id_ejercicio_general": doc_id, "contexto": p["contexto"], "verbo": "comprar", "nivel": "medio",
+            **assign_logic.selection_fields("privado", True),
+        }
+        return general, vnest
+
+    def save_step5(p, rng):
+        general, vnest = _docs(p)
+        exercise_store.save_exercise(general, "ejercicios_VNEST", vnest)
+
+    def save_personalized(p, rng):
+        general, vnest = _docs(p)
+        exercise_store.save_exercise(general, "ejercicios_VNEST", vnest, p["email"])
+
+    return {
+        "get_exercise_for_context": get_exercise,
+        "assign_exercise_to_patient": assign,
+        "save_sr_cards": save_sr,
+        "save_exercise (step5)": save_step5,
+        "save_exercise + asignación": save_personalized,
+    }
+
+
+def run(args) -> dict:
+    emulator.init_app()
+    firestore_counters.install()
+
+    import assign_logic, exercise_store
+    import main_langraph_sr as sr
+
+    db = assign_logic.db
+    for module in (assign_logic, exercise_store, sr):
+        module.print = lambda *a, **k: None  # silencia los logs por operación
+
+    print("🌱 Sembrando emulador...")
+    emulator.reset()
+    t0 = time.perf_counter()
+    catalog = seed_synthetic.seed_catalog(db, args.exercises, args.contexts)
+    per_bucket = max(1, args.patients // len(args.histories))
+    patients = seed_synthetic.seed_patients(
+        db, catalog, args.contexts, {h: per_bucket for h in args.histories}
+    )
+    print(f"   ↳ {time.perf_counter() - t0:.1f}s")
+
+    rng = random.Random(3)
+    resultados = []
+    for nombre, op in _operations(catalog).items():
+        for historial in args.histories:
+            samples = []
+            for _ in range(args.samples):
+                p = rng.choice(patients[historial])
+                samples.append(_measure(lambda: op(p, rng)))
+            resultados.append(_summary(nombre, historial, samples))
+            print(resultados[-1])
+
+    crecimiento = {}
+    for r in resultados:
+        crecimiento.setdefault(r["operacion"], []).append(
+            {"historial": r["historial"], "lecturas": r["lecturas"], "p50_ms": r["p50_ms"]}
+        )
+
+    return {
+        "commit": _commit(),
+        "fecha": datetime.now(timezone.utc).isoformat(),
+        "parametros": {
+            "exercises": args.exercises,
+            "contexts": args.contexts,
+            "patients": args.patients,
+            "histories": args.histories,
+            "samples": args.samples,
+        },
+        "resultados": resultados,
+        "crecimiento": crecimiento,
+    }
+
+
+def compare(actual: dict, anterior: dict):
+    """Imprime la variación de lecturas, escrituras y p50 respecto de otra corrida."""
+    previos = {(r["operacion"], r["historial"]): r for r in anterior["resultados"]}
+    print(f"\nComparación {anterior['commit']} -> {actual['commit']}")
+    for r in actual["resultados"]:
+        p = previos.get((r["operacion"], r["historial"]))
+        if p is None:
+            continue
+        print(
+            f"  {r['operacion']:<30} hist={r['historial']:<4}"
+            f" lecturas {p['lecturas']:>8} -> {r['lecturas']:<8}"
+            f" escrituras {p['escrituras']:>6} -> {r['escrituras']:<6}"
+            f" p50 {p['p50_ms']:>8}ms -> {r['p50_ms']}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--exercises", type=int, default=10000)
+    parser.add_argument("--contexts", type=int, default=50)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--histories", type=int, nargs="+", default=[0, 10, 50, 200])
+    parser.add_argument("--samples", type=int, default=30)
+    parser.add_argument("--out", default=None, help="ruta del JSON (por defecto benchmarks/results/firestore_<commit>.json)")
+    parser.add_argument("--compare", default=None, help="JSON de otra corrida para comparar")
+    args = parser.parse_args()
+
+    with emulator.start():
+        report = run(args)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"firestore_{report['commit']}.json")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"📄 Resultados en {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,70 @@
+"""
+Benchmark del overhead por llamada al LLM: cliente nuevo por llamada (antes)
+vs. cliente compartido de llm_client (ahora).
+
+El servidor falso responde sin latencia, así que el tiempo medido es solo
+el costo de construir el cliente, abrir conexión y serializar la petición.
+llm_cache se desactiva (LLM_CACHE_ENABLED=0): todas las llamadas llegan al servidor.
+
+Uso (desde api/):
+    python -m benchmarks.bench_llm_client --calls 200
+"""
+import argparse, asyncio, os, statistics, time
+
+from openai import AsyncAzureOpenAI
+
+from benchmarks import fake_llm_server
+
+
+async def _per_call_client():
+    async with AsyncAzureOpenAI(
+        api_key="fake",
+        azure_endpoint=os.environ["AZURE_ENDPOINT"],
+        api_version="2024-12-01-preview",
+    ) as client:
+        await client.chat.completions.create(
+            model="gpt-4.1",
+            messages=[{"role": "user", "content": "ping"}],
+            response_format={"type": "json_object"},
+        )
+
+
+async def _shared_client():
+    import llm_client
+    await llm_client.run_prompt("ping", "system", temperature=0.0, max_tokens=10)
+
+
+async def measure(name: str, fn, calls: int) -> dict:
+    await fn()  # calentamiento
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return {
+        "modo": name,
+        "llamadas": calls,
+        "media_ms": round(statistics.mean(samples), 2),
+        "p50_ms": round(statistics.median(samples), 2),
+        "p95_ms": round(samples[int(0.95 * (calls - 1))], 2),
+    }
+
+
+async def main(calls: int):
+    print(await measure("cliente_por_llamada", _per_call_client, calls))
+    print(await measure("cliente_compartido", _shared_client, calls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    os.environ["AZURE_ENDPOINT"] = f"http://127.0.0.1:{args.port}/"
+    os.environ.setdefault("AZURE_API_KEY", "fake")
+    # Mismo prompt en todas las llamadas: sin esto se mediría llm_cache y no el cliente HTTP
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    fake_llm_server.start_in_thread(args.port, latency=0.0)
+    asyncio.run(main(args.calls))
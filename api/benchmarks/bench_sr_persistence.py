@@ -0,0 +1,72 @@
+"""
+Persistencia de tarjetas SR contra el emulador de Firestore:
+tres set() por tarjeta (antes) vs. save_sr_cards con WriteBatch (ahora).
+
+Mide por tamaño de generación (--cards) la latencia de guardado y los viajes
+y escrituras contados con firestore_counters.
+
+Uso (desde api/, con el emulador corriendo):
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python -m benchmarks.bench_sr_persistence --cards 5 50 200
+"""
+import argparse, json, statistics, time, uuid
+
+from benchmarks import emulator, firestore_counters
+
+PACIENTE = "bench-sr@aphasia.test"
+
+
+def _cards(n: int) -> list:
+    return [{"stimulus": f"¿Pregunta {i}?", "answer": f"Respuesta {i}"} for i in range(n)]
+
+
+def _save_sequential(sr, user_id: str, cards: list):
+    """Versión anterior de save_sr_cards: cada escritura es un viaje."""
+    db = sr.db
+    for card in cards:
+        doc_id = f"E{uuid.uuid4().hex[:6].upper()}"
+        db.collection("ejercicios").document(doc_id).set({
+            "id": doc_id, "terapia": "SR", "tipo": "privado", "personalizado": True, "id_paciente": user_id,
+        })
+        db.collection("ejercicios_SR").document(doc_id).set({
+            "id_ejercicio_general": doc_id, "pregunta": card["stimulus"], "rta_correcta": card["answer"],
+        })
+        sr.asignar_a_paciente(user_id, doc_id)
+
+
+def main(sizes, repeat: int):
+    emulator.init_app()
+    firestore_counters.install()
+
+    import main_langraph_sr as sr
+
+    modes = {
+        "secuencial (antes)": lambda cards: _save_sequential(sr, PACIENTE, cards),
+        "WriteBatch (ahora)": lambda cards: sr.save_sr_cards(PACIENTE, cards),
+    }
+    report = []
+    for n in sizes:
+        cards = _cards(n)
+        for mode, save in modes.items():
+            emulator.clear_collections(sr.db, "ejercicios", "ejercicios_SR", "pacientes")
+            samples = []
+            for _ in range(repeat):
+                with firestore_counters.measure() as c:
+                    t0 = time.perf_counter()
+                    save(cards)
+                    samples.append((time.perf_counter() - t0) * 1000)
+            report.append({
+                "modo": mode,
+                "tarjetas": n,
+                "p50_ms": round(statistics.median(samples), 1),
+                "viajes": c["viajes"],
+                "escrituras": c["escrituras"],
+            })
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.cards, args.repeat)
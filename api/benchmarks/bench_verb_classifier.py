@@ -0,0 +1,95 @@
+"""
+Benchmark y reporte de concordancia del clasificador local de verbos.
+
+- Tiempo por clasificación de 7 verbos con verb_classifier.classify_verbs.
+- Concordancia contra clasificaciones hechas por el LLM, tomadas de:
+    --recorded archivo.jsonl  (una línea por corrida: {"verbos_clasificados": {...}})
+    --firestore               (documentos de contextos_lexico con clasificador "llm";
+                               los anteriores a este campo también vienen del LLM)
+
+Uso (desde api/):
+    python -m benchmarks.bench_verb_classifier --iterations 10000
+    python -m benchmarks.bench_verb_classifier --firestore
+"""
+import argparse, json, time
+from collections import Counter
+
+import verb_classifier
+
+NIVELES = ("facil", "medio", "dificil")
+
+MUESTRAS = [
+    ["comprar", "pagar", "pesar", "escoger", "empacar", "cargar", "devolver"],
+    ["recetar", "examinar", "vacunar", "vendar", "curar", "atender", "operar"],
+    ["cocinar", "pelar", "picar", "hervir", "freír", "mezclar", "servir"],
+]
+
+
+def bench(iterations: int) -> dict:
+    t0 = time.perf_counter()
+    for i in range(iterations):
+        verb_classifier.classify_verbs(MUESTRAS[i % len(MUESTRAS)])
+    elapsed = time.perf_counter() - t0
+    return {"clasificaciones": iterations, "us_por_clasificacion": round(elapsed / iterations * 1e6, 2)}
+
+
+def load_recorded(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line)["verbos_clasificados"] for line in f if line.strip()]
+
+
+def load_firestore() -> list:
+    import firebase_admin
+    from firebase_admin import credentials
+
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(credentials.Certificate("serviceAccountKey.json"))
+    import context_lexicon
+
+    docs = context_lexicon.db.collection(context_lexicon.COLLECTION).stream()
+    return [
+        d.to_dict()["verbos_clasificados"]
+        for d in docs
+        if d.to_dict().get("clasificador", "llm") == "llm"
+    ]
+
+
+def agreement(llm_runs: list) -> dict:
+    confusion = Counter()
+    for llm in llm_runs:
+        verbos = [v for n in NIVELES for v in llm.get(n, [])]
+        local = verb_classifier.classify_verbs(verbos)
+        nivel_local = {v: n for n in NIVELES for v in local[n]}
+        for n in NIVELES:
+            for v in llm.get(n, []):
+                confusion[(n, nivel_local[v])] += 1
+
+    total = sum(confusion.values())
+    exact = sum(c for (a, b), c in confusion.items() if a == b)
+    adjacent = sum(
+        c for (a, b), c in confusion.items() if abs(NIVELES.index(a) - NIVELES.index(b)) <= 1
+    )
+    return {
+        "corridas": len(llm_runs),
+        "verbos": total,
+        "concordancia_exacta": round(exact / total, 3) if total else None,
+        "concordancia_a_un_nivel": round(adjacent / total, 3) if total else None,
+        "confusion_llm_vs_local": {f"{a}->{b}": c for (a, b), c in sorted(confusion.items())},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--recorded", help="JSONL con clasificaciones del LLM")
+    parser.add_argument("--firestore", action="store_true")
+    args = parser.parse_args()
+
+    print(bench(args.iterations))
+    runs = []
+    if args.recorded:
+        runs += load_recorded(args.recorded)
+    if args.firestore:
+        runs += load_firestore()
+    if runs:
+        print(json.dumps(agreement(runs), indent=2, ensure_ascii=False))
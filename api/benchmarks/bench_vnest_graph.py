@@ -0,0 +1,82 @@
+"""
+Micro-benchmark del grafo VNeST sin LLM ni Firestore.
+
+Mide:
+- el costo de construir y compilar el StateGraph (build_graph),
+- el overhead por petición del camino no-LLM compilando en cada petición (antes)
+  vs. reutilizando el grafo memoizado (get_workflow).
+
+run_prompt se reemplaza por respuestas fijas (benchmarks.fake_responses) y `db`
+por un mock, así que el tiempo medido es solo orquestación de LangGraph. El
+léxico por contexto se vacía en cada petición para recorrer los cinco pasos.
+
+Uso (desde api/, con serviceAccountKey.json disponible):
+    python -m benchmarks.bench_vnest_graph --iterations 200
+"""
+import argparse, asyncio, statistics, time, uuid
+from unittest.mock import MagicMock
+
+import main_langraph_vnest as vnest  # inicializa firebase_admin
+import context_lexicon
+import exercise_store
+from benchmarks.fake_responses import respond
+
+
+async def _fake_run_prompt(prompt: str, check=None, schema=None):
+    out = respond(prompt)
+    return check(out) if check else out
+
+
+def _stats(name: str, samples: list) -> dict:
+    samples = sorted(s * 1000 for s in samples)
+    return {
+        "caso": name,
+        "n": len(samples),
+        "media_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3),
+    }
+
+
+async def _invoke(workflow):
+    context_lexicon._mirror.clear()
+    state = {"contexto": "hacer mercado", "nivel": "medio", "creado_por": "bench", "tipo": "privado"}
+    await workflow.ainvoke(state, config=vnest.run_config(uuid.uuid4().hex))
+
+
+async def main(iterations: int):
+    build = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        vnest.build_graph()
+        build.append(time.perf_counter() - t0)
+    print(_stats("build_graph + compile", build))
+
+    per_request = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await _invoke(vnest.build_graph())
+        per_request.append(time.perf_counter() - t0)
+    print(_stats("petición compilando el grafo (antes)", per_request))
+
+    memoized = []
+    vnest.get_workflow()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await _invoke(vnest.get_workflow())
+        memoized.append(time.perf_counter() - t0)
+    print(_stats("petición con grafo memoizado (ahora)", memoized))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    vnest.run_prompt = _fake_run_prompt
+    vnest.db = MagicMock()
+    exercise_store.db = MagicMock()
+    context_lexicon.db = MagicMock()
+    context_lexicon.db.collection.return_value.document.return_value.get.return_value.exists = False
+    vnest.print = lambda *a, **k: None  # silencia los logs de los nodos
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,127 @@
+"""
+Verifica contra el emulador de Firestore que get_exercise_for_context hace
+un número constante de viajes, sin importar cuántos ejercicios tenga
+asignados el paciente.
+
+Para cada tamaño (--sizes) siembra un paciente con N asignaciones en el
+contexto y N candidatos sin asignar, y mide los tres caminos:
+- "pendiente": hay un ejercicio pendiente del verbo
+- "nuevo":     no hay pendientes y se asigna uno de los candidatos
+- "antiguo":   todo está completado y no quedan candidatos
+
+Además asigna candidatos en paralelo y verifica que las prioridades no se repitan.
+
+Uso (desde api/, con el emulador corriendo):
+    FIRESTORE_EMULATOR_HOST=127.0.0.1:8080 python -m benchmarks.check_assign_reads --sizes 5 50
+"""
+import argparse, json, sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from benchmarks import emulator, firestore_counters
+
+CONTEXTO = "hacer mercado"
+VERBO = "comprar"
+PACIENTE = "bench@aphasia.test"
+
+# Viajes máximos por camino:
+# - pendiente: consulta indexada de pendientes + lectura del ejercicio
+# - nuevo:     pendientes + asignados del verbo + candidatos por clave aleatoria
+#              (hasta 2 consultas) + transacción de asignación (contador, mayor
+#              prioridad si el paciente aún no tiene contador, commit)
+# - antiguo:   pendientes + asignados del verbo + 2 consultas de candidatos
+#              + lectura del ejercicio
+MAX_VIAJES = {"pendiente": 2, "nuevo": 7, "antiguo": 5}
+
+
+def _seed(db, n: int, estado: str, candidatos: int):
+    import assign_logic
+
+    emulator.clear_collections(db, "pacientes", "ejercicios", "ejercicios_VNEST")
+    batch = db.batch()
+    base = datetime(2025, 1, 1)
+
+    def add(i: int, asignado: bool):
+        ex_id = f"ex-{'a' if asignado else 'c'}-{i}"
+        batch.set(db.collection("ejercicios").document(ex_id), {
+            "id": ex_id, "terapia": "VNEST", "tipo": "publico", "personalizado": i % 5 == 0,
+        })
+        batch.set(db.collection("ejercicios_VNEST").document(ex_id), {
+            "id_ejercicio_general": ex_id, "contexto": CONTEXTO, "verbo": VERBO, "nivel": "medio",
+            **assign_logic.selection_fields("publico", i % 5 == 0),
+        })
+        if asignado:
+            batch.set(
+                db.collection("pacientes").document(PACIENTE)
+                .collection("ejercicios_asignados").document(ex_id),
+                {
+                    "id_ejercicio": ex_id, "contexto": CONTEXTO, "tipo": "VNEST",
+                    "verbo": VERBO, "nivel": "medio", "personalizado": i % 5 == 0,
+                    "estado": estado, "prioridad": i + 1,
+                    "ultima_fecha_realizado": base + timedelta(days=i), "veces_realizado": 1,
+                },
+            )
+
+    for i in range(n):
+        add(i, asignado=True)
+    for i in range(candidatos):
+        add(i, asignado=False)
+    batch.commit()
+
+
+def main(sizes):
+    emulator.init_app()
+    firestore_counters.install()
+
+    import assign_logic
+
+    db = assign_logic.db
+    assign_logic.print = lambda *a, **k: None
+
+    cases = {
+        "pendiente": lambda n: (n, "pendiente", 0),
+        "nuevo": lambda n: (n, "completado", n),
+        "antiguo": lambda n: (n, "completado", 0),
+    }
+    report, ok = [], True
+    for camino, params in cases.items():
+        viajes = set()
+        for n in sizes:
+            _seed(db, *params(n))
+            with firestore_counters.measure() as c:
+                ex = assign_logic.get_exercise_for_context(PACIENTE, CONTEXTO, VERBO)
+            if not ex or "error" in ex:
+                sys.exit(f"{camino} (n={n}) no devolvió ejercicio: {ex}")
+            viajes.add(c["viajes"])
+            report.append({"camino": camino, "asignados": n, **c})
+            if c["viajes"] > MAX_VIAJES[camino]:
+                ok = False
+        # Constante salvo por la vuelta del muestreo aleatorio (r cerca de 1 suma
+        # una consulta desde el inicio): a lo sumo dos valores distintos
+        if len(viajes) > 2:
+            ok = False
+
+    # Asignaciones concurrentes: el contador transaccional no repite prioridades
+    n = max(sizes)
+    _seed(db, n, "completado", n)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: assign_logic.assign_exercise_to_patient(PACIENTE, f"ex-c-{i}"), range(n)))
+    prioridades = [
+        doc.to_dict()["prioridad"]
+        for doc in db.collection("pacientes").document(PACIENTE).collection("ejercicios_asignados").stream()
+    ]
+    unicas = len(prioridades) == len(set(prioridades)) == 2 * n
+    report.append({"camino": "concurrencia", "asignaciones": len(prioridades), "prioridades_unicas": unicas})
+    ok = ok and unicas
+
+    print(json.dumps(report, indent=2))
+    if not ok:
+        sys.exit("❌ Viajes no constantes, por encima del máximo o prioridades repetidas")
+    print("✅ Viajes constantes por petición y prioridades únicas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 50])
+    args = parser.parse_args()
+    main(args.sizes)
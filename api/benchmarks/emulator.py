@@ -0,0 +1,80 @@
+"""
+Conexión de los benchmarks al emulador de Firestore.
+
+Requiere el emulador corriendo y FIRESTORE_EMULATOR_HOST definido:
+    firebase emulators:start --only firestore
+    export FIRESTORE_EMULATOR_HOST=127.0.0.1:8080
+o bien start() para que el benchmark lo levante y lo apague solo.
+
+Hay que llamar a init_app() antes de importar los módulos de la API, así
+estos encuentran la app ya inicializada y no buscan serviceAccountKey.json.
+"""
+import os, sys, time, socket, subprocess, urllib.request
+from contextlib import contextmanager
+
+import firebase_admin
+from firebase_admin import credentials
+from google.auth.credentials import AnonymousCredentials
+
+PROJECT_ID = os.getenv("EMULATOR_PROJECT_ID", "demo-aphasia")
+# firebase.json (índices y emulador) está en la raíz del repositorio
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _EmulatorCredential(credentials.Base):
+    def get_credential(self):
+        return AnonymousCredentials()
+
+
+def init_app():
+    if not os.getenv("FIRESTORE_EMULATOR_HOST"):
+        sys.exit("Definir FIRESTORE_EMULATOR_HOST (p. ej. 127.0.0.1:8080) con el emulador corriendo")
+    if not firebase_admin._apps:
+        firebase_admin.initialize_app(_EmulatorCredential(), {"projectId": PROJECT_ID})
+
+
+def clear_collections(db, *names):
+    """Borra las colecciones dadas (con sus subcolecciones) en lotes."""
+    for name in names:
+        db.recursive_delete(db.collection(name))
+
+
+def reset():
+    """Vacía toda la base del emulador (mucho más rápido que borrar colección por colección)."""
+    host = os.environ["FIRESTORE_EMULATOR_HOST"]
+    url = f"http://{host}/emulator/v1/projects/{PROJECT_ID}/databases/(default)/documents"
+    urllib.request.urlopen(urllib.request.Request(url, method="DELETE")).close()
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", port)) == 0
+
+
+@contextmanager
+def start(port: int = 8080, timeout_s: float = 60):
+    """
+    Levanta el emulador con el CLI de Firebase si FIRESTORE_EMULATOR_HOST no
+    está definido, y lo apaga al salir. Si ya hay uno definido, lo reutiliza.
+    """
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        yield
+        return
+
+    proc = subprocess.Popen(
+        ["firebase", "emulators:start", "--only", "firestore", "--project", PROJECT_ID],
+        cwd=REPO_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + timeout_s
+        while not _port_open(port):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                sys.exit("No se pudo iniciar el emulador de Firestore (¿firebase-tools instalado?)")
+            time.sleep(0.5)
+        os.environ["FIRESTORE_EMULATOR_HOST"] = f"127.0.0.1:{port}"
+        yield
+    finally:
+        proc.terminate()
+        proc.wait()
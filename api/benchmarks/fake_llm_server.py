@@ -0,0 +1,241 @@
+"""
+Servidor local que imita la API de chat completions de Azure OpenAI.
+
+Sirve para pruebas de carga sin gastar cuota: responde con la misma forma que
+Azure después de una latencia configurable. El contenido sale de
+fake_responses según el prompt, así que los pipelines corren completos.
+
+Latencia (--latency-dist):
+    fixed      siempre --latency segundos
+    uniform    entre --latency-min y --latency-max
+    lognormal  mediana --latency y dispersión --latency-sigma (cola larga, como Azure)
+
+Fallas inyectadas:
+    --rate-429        fracción de peticiones que responden 429 con Retry-After
+    --rate-malformed  fracción de respuestas con JSON truncado
+    --rate-invalid    fracción de respuestas 4A/4B con JSON válido pero fuera de esquema
+                      (fake_responses.invalidate), para medir la reparación parcial
+    --rate-runaway    fracción de respuestas 1/4B que repiten elementos sin parar
+                      (fake_responses.runaway), para medir el corte temprano en streaming
+
+Streaming ("stream": true): el primer pedazo llega a --ttft-fraction de la
+latencia y el resto del texto se reparte en pedazos de STREAM_CHUNK_CHARS
+durante lo que queda, con el uso de tokens al final si se pide include_usage.
+
+Caché de prefijos: como Azure, informa cached_tokens cuando los primeros
+1024+ tokens (system + user, en saltos de 128) ya se vieron antes. Los
+tokens se aproximan con len // 4.
+
+Uso (desde api/):
+    python -m benchmarks.fake_llm_server --port 8100 --latency 1.0 --latency-dist lognormal --rate-429 0.02
+    AZURE_ENDPOINT=http://127.0.0.1:8100/ uvicorn main:app
+"""
+import argparse, asyncio, json, random, threading, time, uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks import fake_responses
+
+# ==============================
+# CONFIG
+# ==============================
+CONFIG = {
+    "latency": 1.0,
+    "latency_dist": "fixed",
+    "latency_min": 0.5,
+    "latency_max": 1.5,
+    "latency_sigma": 0.5,
+    "rate_429": 0.0,
+    "rate_malformed": 0.0,
+    "rate_invalid": 0.0,
+    "rate_runaway": 0.0,
+    "ttft_fraction": 0.2,
+    "retry_after_s": 1,
+}
+
+# Conteo de respuestas por resultado y de tokens, para los reportes de los benchmarks
+STATS = {"ok": 0, "429": 0, "malformado": 0, "invalido": 0, "desbocado": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+CACHE_MIN_TOKENS = 1024
+CACHE_STEP_TOKENS = 128
+CACHE_MAX_PREFIXES = 100_000
+STREAM_CHUNK_CHARS = 16
+_prefixes = set()
+
+app = FastAPI()
+
+
+def sample_latency() -> float:
+    dist = CONFIG["latency_dist"]
+    if dist == "uniform":
+        return random.uniform(CONFIG["latency_min"], CONFIG["latency_max"])
+    if dist == "lognormal":
+        return random.lognormvariate(0, CONFIG["latency_sigma"]) * CONFIG["latency"]
+    return CONFIG["latency"]
+
+
+def cached_tokens(text: str) -> int:
+    """Prefijo más largo de `text` (en tokens, múltiplo de 128 desde 1024) visto en una petición anterior."""
+    if len(_prefixes) > CACHE_MAX_PREFIXES:
+        _prefixes.clear()
+    cached = 0
+    for n in range(CACHE_MIN_TOKENS, len(text) // 4 + 1, CACHE_STEP_TOKENS):
+        key = hash(text[: n * 4])
+        if key in _prefixes:
+            cached = n
+        else:
+            _prefixes.add(key)
+    return cached
+
+
+def _usage(content: str, prompt: str) -> dict:
+    prompt_tokens = len(prompt) // 4
+    completion_tokens = len(content) // 4
+    cached = cached_tokens(prompt)
+    STATS["prompt_tokens"] += prompt_tokens
+    STATS["cached_tokens"] += cached
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached},
+    }
+
+
+def _completion(content: str, model: str, prompt: str) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": _usage(content, prompt),
+    }
+
+
+async def _stream(content: str, model: str, prompt: str, latency: float, include_usage: bool):
+    """Pedazos chat.completion.chunk en SSE; si el cliente corta, el generador se cancela."""
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": model}
+    event = lambda data: f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)] or [""]
+    step = latency * (1 - CONFIG["ttft_fraction"]) / len(pieces)
+
+    await asyncio.sleep(latency * CONFIG["ttft_fraction"])
+    for piece in pieces:
+        yield event({**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        await asyncio.sleep(step)
+    yield event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+    if include_usage:
+        yield event({**base, "choices": [], "usage": _usage(content, prompt)})
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/deployments/{deployment}/chat/completions")
+async def chat_completions(deployment: str, request: Request):
+    body = await request.json()
+
+    if random.random() < CONFIG["rate_429"]:
+        STATS["429"] += 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": str(CONFIG["retry_after_s"])},
+            content={"error": {"code": "429", "message": "Rate limit is exceeded. Try again later."}},
+        )
+
+    latency = sample_latency()
+    prompt = body["messages"][-1]["content"]
+    out = fake_responses.respond(prompt)
+    invalid = fake_responses.invalidate(prompt, out)
+    runaway = fake_responses.runaway(prompt, out)
+    normal_len = len(json.dumps(out, ensure_ascii=False))
+    full_prompt = "".join(m["content"] for m in body["messages"])
+
+    if random.random() < CONFIG["rate_invalid"] and invalid != out:
+        STATS["invalido"] += 1
+        out = invalid
+    elif random.random() < CONFIG["rate_runaway"] and runaway != out:
+        STATS["desbocado"] += 1
+        out = runaway
+    content = json.dumps(out, ensure_ascii=False)
+    latency *= max(1.0, len(content) / normal_len)  # una salida desbocada tarda lo que mide
+
+    if random.random() < CONFIG["rate_malformed"]:
+        STATS["malformado"] += 1
+        content = content[: len(content) // 2]  # JSON cortado, como un max_tokens agotado
+    else:
+        STATS["ok"] += 1
+
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(
+            _stream(content, deployment, full_prompt, latency, include_usage), media_type="text/event-stream"
+        )
+    await asyncio.sleep(latency)
+    return _completion(content, deployment, full_prompt)
+
+
+# ==============================
+# ARRANQUE
+# ==============================
+def configure(**overrides):
+    unknown = set(overrides) - set(CONFIG)
+    if unknown:
+        raise ValueError(f"Opciones desconocidas del servidor falso: {sorted(unknown)}")
+    CONFIG.update(overrides)
+
+
+def start_in_thread(port: int = 8100, latency: float = 1.0, **overrides) -> uvicorn.Server:
+    """Levanta el servidor en un hilo daemon y espera a que acepte conexiones."""
+    configure(latency=latency, **overrides)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Opciones del servidor falso, compartidas con los scripts de carga."""
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default="fixed")
+    parser.add_argument("--latency-min", type=float, default=0.5)
+    parser.add_argument("--latency-max", type=float, default=1.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-malformed", type=float, default=0.0)
+    parser.add_argument("--rate-invalid", type=float, default=0.0)
+    parser.add_argument("--rate-runaway", type=float, default=0.0)
+    parser.add_argument("--ttft-fraction", type=float, default=0.2, help="fracción de la latencia hasta el primer pedazo en streaming")
+
+
+def options_from_args(args) -> dict:
+    return {
+        "latency_dist": args.latency_dist,
+        "latency_min": args.latency_min,
+        "latency_max": args.latency_max,
+        "latency_sigma": args.latency_sigma,
+        "rate_429": args.rate_429,
+        "rate_malformed": args.rate_malformed,
+        "rate_invalid": args.rate_invalid,
+        "rate_runaway": args.rate_runaway,
+        "ttft_fraction": args.ttft_fraction,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    configure(latency=args.latency, **options_from_args(args))
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
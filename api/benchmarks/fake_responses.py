@@ -0,0 +1,148 @@
+"""
+Respuestas JSON de ejemplo para cada prompt de los pipelines.
+
+Se eligen según marcas del texto del prompt, así que los benchmarks pueden
+recorrer el grafo completo sin llamar a Azure.
+"""
+import copy, re
+
+VERBOS = ["comprar", "pagar", "pesar", "escoger", "empacar", "cargar", "devolver"]
+
+CLASIFICADOS = {
+    "facil": ["pagar", "pesar"],
+    "medio": ["comprar", "escoger", "cargar"],
+    "dificil": ["empacar", "devolver"],
+}
+
+ORACIONES_SVO = [
+    {"oracion": "El cliente compra pan.", "sujeto": "cliente", "objeto": "pan"},
+    {"oracion": "El turista compra un recuerdo.", "sujeto": "turista", "objeto": "recuerdo"},
+    {"oracion": "El estudiante compra un cuaderno.", "sujeto": "estudiante", "objeto": "cuaderno"},
+]
+
+
+def _bloque(correcta: str) -> dict:
+    opciones = [correcta, "En la luna", "Nunca", "Porque sí"]
+    return {
+        "opciones": opciones,
+        "opcion_correcta": correcta,
+        "explicaciones": ["Es lo habitual.", "No tiene sentido.", "No tiene sentido.", "No tiene sentido."],
+    }
+
+
+def par_expandido(sujeto: str, objeto: str) -> dict:
+    return {
+        "sujeto": sujeto,
+        "objeto": objeto,
+        "expansiones": {
+            "donde": _bloque("En la tienda del barrio"),
+            "cuando": _bloque("Por la mañana"),
+            "por_que": _bloque("Porque lo necesita"),
+        },
+    }
+
+
+ORACIONES = [{"oracion": f"Oración de ejemplo {i}.", "correcta": i % 2 == 0} for i in range(10)]
+
+
+CARDS = [
+    {"stimulus": "¿Cómo se llama tu hijo?", "answer": "Daniel", "category": "familia"},
+    {"stimulus": "¿Dónde naciste?", "answer": "Bogotá", "category": "personal"},
+    {"stimulus": "¿Qué comes en el almuerzo?", "answer": "Ajiaco", "category": "rutina"},
+    {"stimulus": "¿Cómo se llama tu mascota?", "answer": "Rocky", "category": "objetos"},
+    {"stimulus": "¿Quién es tu pareja?", "answer": "Carlos", "category": "familia"},
+]
+
+PERFIL = {
+    "personal": {
+        "nombre": "María Gómez",
+        "fecha_nacimiento": "1980-05-14",
+        "lugar_nacimiento": "Bogotá",
+        "ciudad_residencia": "Bogotá",
+    },
+    "familia": [{"nombre": "Pedro", "tipo_relacion": "Hijo/a", "descripcion": "Vive con ella"}],
+    "rutinas": [{"titulo": "Salir a caminar", "descripcion": "Camina 30 min cada mañana"}],
+    "objetos": [{"nombre": "Reloj antiguo", "tipo_relacion": "objeto sentimental", "descripcion": "Era de su padre"}],
+}
+
+
+def ejercicio_personalizado(prompt: str) -> dict:
+    """Ejercicio VNeST adaptado, con los campos que pide generate_personalization_prompt."""
+    user_id = re.search(r'"id_paciente": "(.*?)"', prompt)
+    base_id = re.search(r'"referencia_base": "(.*?)"', prompt)
+    return {
+        "terapia": "VNEST",
+        "verbo": "comprar",
+        "nivel": "medio",
+        "contexto": "hacer mercado",
+        "pares": [par_expandido(o["sujeto"], o["objeto"]) for o in ORACIONES_SVO],
+        "oraciones": copy.deepcopy(ORACIONES),
+        "id_paciente": user_id.group(1) if user_id else "",
+        "personalizado": True,
+        "referencia_base": base_id.group(1) if base_id else "",
+        "descripcion_adaptado": "Se cambió un sujeto por el hijo del paciente.",
+    }
+
+
+def respond(prompt: str) -> dict:
+    """Devuelve una salida con el esquema que espera el paso que generó `prompt`."""
+    # Prompts de SR, personalización y perfil (pueden incluir JSON con cualquier texto)
+    if "ejercicios de Spaced Retrieval" in prompt:
+        return {"cards": copy.deepcopy(CARDS)}
+    if "personalización de ejercicios" in prompt:
+        return ejercicio_personalizado(prompt)
+    if "estructurar información personal" in prompt:
+        return copy.deepcopy(PERFIL)
+
+    # Pasos del grafo VNeST
+    if "PROMPT R4A" in prompt:
+        bloques = re.findall(r"^- (\w+):", prompt.split("BLOQUES A CORREGIR:")[1], re.M)
+        expansiones = par_expandido("", "")["expansiones"]
+        return {"expansiones": {b: expansiones[b] for b in bloques if b in expansiones}}
+    if "PROMPT R4B" in prompt:
+        faltantes = int(re.search(r"CANTIDAD FALTANTE: (\d+)", prompt).group(1))
+        return {"oraciones": [{"oracion": f"Oración nueva {i}.", "correcta": i % 2 == 0} for i in range(faltantes)]}
+    if "PROMPT 5" in prompt:
+        return {
+            "verbo": "comprar",
+            "pares": [par_expandido(o["sujeto"], o["objeto"]) for o in ORACIONES_SVO],
+            "oraciones": copy.deepcopy(ORACIONES),
+        }
+    if "PROMPT 4B" in prompt:
+        return {"verbo": "comprar", "oraciones": copy.deepcopy(ORACIONES)}
+    if "PROMPT 4A" in prompt:
+        sujeto = re.search(r"SUJETO: (.*)", prompt).group(1)
+        objeto = re.search(r"OBJETO: (.*)", prompt).group(1)
+        return par_expandido(sujeto, objeto)
+    if "PROMPT 4" in prompt:
+        return {"verbo": "comprar", "pares": [par_expandido(o["sujeto"], o["objeto"]) for o in ORACIONES_SVO]}
+    if "PROMPT 3" in prompt:
+        return {"nivel": "medio", "verbo_seleccionado": "comprar", "oraciones": copy.deepcopy(ORACIONES_SVO)}
+    if "PROMPT 2" in prompt:
+        return {"contexto": "hacer mercado", "verbos_clasificados": copy.deepcopy(CLASIFICADOS)}
+    if "PROMPT 1" in prompt:
+        return {"contexto": "hacer mercado", "verbos": list(VERBOS)}
+    return {}
+
+
+def invalidate(prompt: str, out: dict) -> dict:
+    """
+    Versión que no cumple el esquema (como las fallas reales del modelo):
+    un bloque de 4A con 3 opciones, o 4B con 8 oraciones. El resto queda igual.
+    """
+    out = copy.deepcopy(out)
+    if "PROMPT 4A" in prompt:
+        out["expansiones"]["donde"]["opciones"].pop()
+    elif "PROMPT 4B" in prompt:
+        out["oraciones"] = out["oraciones"][:8]
+    return out
+
+
+def runaway(prompt: str, out: dict) -> dict:
+    """Salida que se queda repitiendo elementos hasta agotar max_tokens (verbos u oraciones x5)."""
+    out = copy.deepcopy(out)
+    if "PROMPT 4B" in prompt:
+        out["oraciones"] = out["oraciones"] * 5
+    elif "PROMPT 1" in prompt:
+        out["verbos"] = out["verbos"] * 5
+    return out
@@ -0,0 +1,113 @@
+"""
+Contadores de operaciones de Firestore para benchmarks y verificaciones.
+
+Envuelve los métodos del SDK que hacen viajes al servidor y cuenta:
+- viajes:    llamadas de red (get, get_all, consultas, commits)
+- lecturas:  documentos devueltos (lo que Firestore factura como lectura)
+- escrituras: operaciones enviadas en commits (set/update/delete, lotes y transacciones)
+
+Uso:
+    from benchmarks import firestore_counters
+    firestore_counters.install()
+    with firestore_counters.measure() as c:
+        get_exercise_for_context(...)
+    print(c)  # {"viajes": 5, "lecturas": 12, "escrituras": 1}
+"""
+import threading
+from contextlib import contextmanager
+
+from google.cloud.firestore_v1 import Client
+from google.cloud.firestore_v1.batch import WriteBatch
+from google.cloud.firestore_v1.document import DocumentReference
+from google.cloud.firestore_v1.query import Query
+from google.cloud.firestore_v1.transaction import Transaction
+
+_lock = threading.Lock()
+_counts = {"viajes": 0, "lecturas": 0, "escrituras": 0}
+_installed = False
+
+
+def _add(**deltas):
+    with _lock:
+        for key, value in deltas.items():
+            _counts[key] += value
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counts)
+
+
+def reset():
+    with _lock:
+        for key in _counts:
+            _counts[key] = 0
+
+
+@contextmanager
+def measure():
+    """Cuenta solo las operaciones hechas dentro del bloque."""
+    before = snapshot()
+    result = {}
+    try:
+        yield result
+    finally:
+        after = snapshot()
+        result.update({key: after[key] - before[key] for key in after})
+
+# ==============================
+# PARCHES DEL SDK
+# ==============================
+def _count_items(gen):
+    """Reemite los documentos de `gen` contándolos como lecturas (conserva su valor de retorno)."""
+    while True:
+        try:
+            item = next(gen)
+        except StopIteration as stop:
+            return stop.value
+        _add(lecturas=1)
+        yield item
+
+
+def install():
+    """Instala los contadores (idempotente)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    doc_get = DocumentReference.get
+
+    def counted_doc_get(self, *args, **kwargs):
+        _add(viajes=1, lecturas=1)
+        return doc_get(self, *args, **kwargs)
+
+    get_all = Client.get_all
+
+    def counted_get_all(self, *args, **kwargs):
+        _add(viajes=1)
+        return (yield from _count_items(get_all(self, *args, **kwargs)))
+
+    make_stream = Query._make_stream
+
+    def counted_make_stream(self, *args, **kwargs):
+        _add(viajes=1)
+        return (yield from _count_items(make_stream(self, *args, **kwargs)))
+
+    batch_commit = WriteBatch.commit
+
+    def counted_batch_commit(self, *args, **kwargs):
+        _add(viajes=1, escrituras=len(self._write_pbs))
+        return batch_commit(self, *args, **kwargs)
+
+    tx_commit = Transaction._commit
+
+    def counted_tx_commit(self, *args, **kwargs):
+        _add(viajes=1, escrituras=len(self._write_pbs))
+        return tx_commit(self, *args, **kwargs)
+
+    DocumentReference.get = counted_doc_get
+    Client.get_all = counted_get_all
+    Query._make_stream = counted_make_stream
+    WriteBatch.commit = counted_batch_commit
+    Transaction._commit = counted_tx_commit
@@ -0,0 +1,73 @@
+"""
+Prueba de carga: endpoints bloqueantes (antes) vs. endpoints async (ahora).
+
+Levanta el servidor falso de Azure OpenAI y lanza N generaciones concurrentes:
+- "sync":  cliente AzureOpenAI síncrono dentro del threadpool de Starlette
+           (lo que hacía FastAPI con los endpoints `def`, 40 hilos por defecto).
+- "async": run_prompt de main_profile_structure con AsyncAzureOpenAI
+           (con llm_cache desactivada para que todas lleguen al servidor).
+
+Uso (desde api/, con serviceAccountKey.json disponible):
+    python -m benchmarks.load_async --requests 200 --latency 1.0
+"""
+import argparse, asyncio, os, statistics, time
+
+import anyio
+from openai import AzureOpenAI
+
+from benchmarks import fake_llm_server
+
+
+def _sync_call(endpoint: str):
+    client = AzureOpenAI(api_key="fake", azure_endpoint=endpoint, api_version="2024-12-01-preview")
+    client.chat.completions.create(
+        model="gpt-4.1",
+        messages=[{"role": "user", "content": "perfil"}],
+        response_format={"type": "json_object"},
+    )
+
+
+async def _timed(coro_factory) -> float:
+    t0 = time.perf_counter()
+    await coro_factory()
+    return time.perf_counter() - t0
+
+
+async def run_mode(mode: str, n: int, endpoint: str) -> dict:
+    if mode == "sync":
+        factory = lambda: anyio.to_thread.run_sync(_sync_call, endpoint)
+    else:
+        from main_profile_structure import run_prompt
+        factory = lambda: run_prompt("perfil")
+
+    t0 = time.perf_counter()
+    latencies = await asyncio.gather(*[_timed(factory) for _ in range(n)])
+    wall = time.perf_counter() - t0
+
+    latencies = sorted(latencies)
+    return {
+        "modo": mode,
+        "peticiones": n,
+        "tiempo_total_s": round(wall, 2),
+        "throughput_rps": round(n / wall, 1),
+        "p50_s": round(statistics.median(latencies), 2),
+        "p95_s": round(latencies[int(0.95 * (n - 1))], 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    endpoint = f"http://127.0.0.1:{args.port}/"
+    os.environ["AZURE_ENDPOINT"] = endpoint
+    os.environ.setdefault("AZURE_API_KEY", "fake")
+    # Mismo prompt en todas las llamadas: sin esto se mediría llm_cache y no el cliente HTTP
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+    fake_llm_server.start_in_thread(args.port, args.latency)
+
+    for mode in ("sync", "async"):
+        print(asyncio.run(run_mode(mode, args.requests, endpoint)))
@@ -0,0 +1,236 @@
+"""
+Prueba de carga de extremo a extremo de los endpoints de main.py.
+
+Por defecto levanta todo en este proceso, sin Azure ni Firestore reales:
+- emulador de Firestore (benchmarks.emulator, o el de FIRESTORE_EMULATOR_HOST),
+- servidor falso de Azure OpenAI (benchmarks.fake_llm_server) con latencia y fallas configurables,
+- la app FastAPI de main.py con uvicorn en un hilo.
+Con --base-url apunta a una API ya desplegada (que debe usar el servidor falso).
+
+Cada endpoint recibe peticiones a --rps constante durante --duration segundos
+(carga abierta: no se espera a que termine una para lanzar la siguiente).
+"jobs" mide el ciclo completo: POST /jobs y GET /jobs/{id} hasta que el
+worker (en un hilo, en modo local) lo termina.
+Reporta por endpoint throughput, p50/p95/p99 y tasa de errores por código,
+y cuántas respuestas del LLM falso fueron 429 o JSON malformado.
+
+Uso (desde api/):
+    python -m benchmarks.load_endpoints --rps 2 --duration 30 --latency 1.0 --latency-dist lognormal --rate-429 0.05
+    python -m benchmarks.load_endpoints --endpoints generate sr --rps 5
+"""
+import argparse, asyncio, json, os, statistics, tempfile, threading, time
+from contextlib import nullcontext
+
+import httpx
+
+from benchmarks import emulator, fake_llm_server, seed_synthetic
+
+PERFIL = {
+    "personal": {"nombre": "María", "lugar_nacimiento": "Bogotá"},
+    "familia": {"hijos": ["Daniel", "Laura"], "pareja": "Carlos"},
+    "rutinas": {"comida_favorita": "Ajiaco"},
+    "objetos": {"mascota": {"nombre": "Rocky"}},
+}
+
+
+def _endpoints(exercise_ids: list) -> dict:
+    """
+    nombre -> (método, ruta, fábrica del payload). force_fresh evita medir la caché de LLM
+    y creado_por distinto en cada petición evita que single_flight las junte.
+    """
+    vnest = lambda i: {
+        "context": f"contexto {i % 20}", "nivel": "medio", "creado_por": f"load{i}", "tipo": "privado", "force_fresh": True,
+    }
+    return {
+        "root": ("GET", "/", None),
+        "generate": ("POST", "/context/generate", vnest),
+        "generate_stream": ("POST", "/context/generate/stream", vnest),
+        "generate_batch": ("POST", "/context/generate/batch", lambda i: {
+            "creado_por": "load", "force_fresh": True,
+            "items": [{"context": f"contexto {i % 20}", "nivel": n} for n in ("facil", "medio", "dificil")],
+        }),
+        "sr": ("POST", "/spaced-retrieval/", lambda i: {"user_id": f"load{i}@test", "profile": PERFIL, "force_fresh": True}),
+        "personalize": ("POST", "/personalize-exercise/", lambda i: {
+            "user_id": f"load{i}@test", "exercise_id": exercise_ids[i % len(exercise_ids)],
+            "profile": PERFIL, "force_fresh": True,
+        }),
+        "profile": ("POST", "/profile/structure/", lambda i: {
+            "user_id": f"load{i}@test", "raw_text": "Me llamo María, nací en Bogotá y tengo un hijo, Pedro.",
+            "force_fresh": True,
+        }),
+        "jobs": ("POST", "/jobs", lambda i: {"tipo": "vnest", "payload": vnest(i)}),
+        "cache_stats": ("GET", "/llm/cache/stats", None),
+    }
+
+JOB_POLL_S = 0.5
+
+# ==============================
+# CARGA
+# ==============================
+async def _job_roundtrip(client: httpx.AsyncClient, payload):
+    resp = await client.post("/jobs", json=payload)
+    if resp.status_code != 202:
+        return resp.status_code
+    job_id = resp.json()["job_id"]
+    while True:
+        await asyncio.sleep(JOB_POLL_S)
+        resp = await client.get(f"/jobs/{job_id}")
+        if resp.status_code != 200:
+            return resp.status_code
+        estado = resp.json()["estado"]
+        if estado == "completado":
+            return 200
+        if estado == "error":
+            return "job_error"
+
+
+async def _request(client: httpx.AsyncClient, method: str, path: str, payload) -> tuple:
+    t0 = time.perf_counter()
+    try:
+        if path == "/jobs":
+            status = await _job_roundtrip(client, payload)
+        elif path.endswith("/stream"):
+            async with client.stream(method, path, json=payload) as resp:
+                body = b"".join([chunk async for chunk in resp.aiter_bytes()])
+            status = resp.status_code
+            if status == 200 and b"event: error" in body:
+                status = "sse_error"
+        else:
+            resp = await client.request(method, path, json=payload)
+            status = resp.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, time.perf_counter() - t0
+
+
+async def _drive(client, method, path, factory, rps: float, duration: float) -> list:
+    """Lanza una petición cada 1/rps segundos durante `duration`, sin esperar respuestas."""
+    tasks, i = [], 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        tasks.append(asyncio.create_task(_request(client, method, path, factory(i) if factory else None)))
+        i += 1
+        await asyncio.sleep(max(0.0, i / rps - (time.perf_counter() - start)))
+    return await asyncio.gather(*tasks)
+
+
+def _report(name: str, results: list, wall: float) -> dict:
+    ok = sorted(lat for status, lat in results if status in (200, 202))
+    errors = {}
+    for status, _ in results:
+        if status not in (200, 202):
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    pct = lambda q: round(ok[min(len(ok) - 1, int(q * len(ok)))], 3) if ok else None
+    return {
+        "endpoint": name,
+        "enviadas": len(results),
+        "ok": len(ok),
+        "tasa_error": round(1 - len(ok) / len(results), 3) if results else 0,
+        "errores": errors,
+        "throughput_rps": round(len(ok) / wall, 2),
+        "p50_s": round(statistics.median(ok), 3) if ok else None,
+        "p95_s": pct(0.95),
+        "p99_s": pct(0.99),
+    }
+
+
+async def run_load(base_url: str, endpoints: dict, names: list, rps: float, duration: float) -> list:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*[
+            _drive(client, *endpoints[name], rps, duration) for name in names
+        ])
+        wall = time.perf_counter() - t0
+    return [_report(name, res, wall) for name, res in zip(names, results)]
+
+# ==============================
+# PILA LOCAL
+# ==============================
+def _start_api(port: int):
+    import uvicorn
+    import main
+
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _local_stack(args) -> list:
+    """Configura el entorno, siembra ejercicios base y levanta LLM falso + API. Devuelve ids para personalizar."""
+    tmp = tempfile.mkdtemp()
+    os.environ["AZURE_ENDPOINT"] = f"http://127.0.0.1:{args.llm_port}/"
+    os.environ.setdefault("AZURE_API_KEY", "fake")
+    os.environ["LLM_CACHE_PATH"] = os.path.join(tmp, "llm_cache.sqlite3")
+    os.environ["JOBS_DB_PATH"] = os.path.join(tmp, "jobs.sqlite3")
+    os.environ["CHECKPOINT_DB_PATH"] = os.path.join(tmp, "checkpoints.sqlite3")
+    os.environ["IDEMPOTENCY_DB_PATH"] = os.path.join(tmp, "idempotency.sqlite3")
+
+    emulator.init_app()
+    emulator.reset()
+    from firebase_admin import firestore
+    catalog = seed_synthetic.seed_catalog(firestore.client(), 50, 5)
+    exercise_ids = [ex_id for ids in catalog.values() for ex_id in ids]
+
+    fake_llm_server.start_in_thread(args.llm_port, args.latency, **fake_llm_server.options_from_args(args))
+    _start_api(args.api_port)
+
+    import worker
+    threading.Thread(target=asyncio.run, args=(worker.main(args.worker_concurrency),), daemon=True).start()
+    return exercise_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rps", type=float, default=1.0, help="peticiones por segundo a cada endpoint")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--endpoints", nargs="+", default=None, help="subconjunto (por defecto todos)")
+    parser.add_argument("--base-url", default=None, help="API ya desplegada; si falta se levanta todo localmente")
+    parser.add_argument("--exercise-ids", nargs="+", default=["E001"], help="ejercicios base para personalize con --base-url")
+    parser.add_argument("--api-port", type=int, default=8200)
+    parser.add_argument("--llm-port", type=int, default=8100)
+    parser.add_argument("--worker-concurrency", type=int, default=4)
+    parser.add_argument("--out", default=None, help="guarda el reporte en JSON")
+    fake_llm_server.add_arguments(parser)
+    args = parser.parse_args()
+
+    with emulator.start() if args.base_url is None else nullcontext():
+        if args.base_url is None:
+            base_url = f"http://127.0.0.1:{args.api_port}"
+            exercise_ids = _local_stack(args)
+        else:
+            base_url, exercise_ids = args.base_url, args.exercise_ids
+
+        endpoints = _endpoints(exercise_ids)
+        names = args.endpoints or list(endpoints)
+        unknown = set(names) - set(endpoints)
+        if unknown:
+            parser.error(f"endpoints desconocidos: {sorted(unknown)} (opciones: {list(endpoints)})")
+
+        print(f"🚀 {len(names)} endpoints a {args.rps} rps durante {args.duration}s contra {base_url}")
+        report = {
+            "parametros": {"rps": args.rps, "duration": args.duration, **fake_llm_server.options_from_args(args),
+                           "latency": args.latency},
+            "endpoints": asyncio.run(run_load(base_url, endpoints, names, args.rps, args.duration)),
+        }
+        if args.base_url is None:
+            report["llm_falso"] = dict(fake_llm_server.STATS)
+
+    for r in report["endpoints"]:
+        print(
+            f"  {r['endpoint']:<16} {r['ok']:>5}/{r['enviadas']:<5} ok"
+            f"  {r['throughput_rps']:>6} rps  p50 {r['p50_s']}s  p95 {r['p95_s']}s  p99 {r['p99_s']}s"
+            f"  errores {r['errores'] or '-'}"
+        )
+    if "llm_falso" in report:
+        stats = report["llm_falso"]
+        ratio = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0
+        print(f"  LLM falso: {stats} (tokens cacheados {ratio:.0%})")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Resultados en {args.out}")
@@ -0,0 +1,154 @@
+"""
+Datos sintéticos para los benchmarks de Firestore.
+
+Versión escalable de database/seedExercises.py y database/seedPatient.py:
+- catálogo de N ejercicios VNEST repartidos en contextos x verbos x niveles
+  (documento general + ejercicios_VNEST, con los campos de selección),
+- pacientes agrupados por tamaño de historial: cada uno con K asignaciones
+  en su contexto "de casa", repartidas entre los verbos, y su contador.
+
+Todo se escribe con WriteBatch de 500 operaciones y con una semilla fija,
+así que dos corridas con los mismos parámetros generan los mismos datos.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from firebase_admin import firestore
+
+FIRESTORE_BATCH_LIMIT = 500
+VERBOS_POR_CONTEXTO = 7
+NIVELES = ("facil", "medio", "dificil")
+
+
+class _Writer:
+    """Acumula set() y hace commit cada FIRESTORE_BATCH_LIMIT operaciones."""
+
+    def __init__(self, db):
+        self.db = db
+        self.batch = db.batch()
+        self.pending = 0
+        self.total = 0
+
+    def set(self, ref, data: dict):
+        self.batch.set(ref, data)
+        self.pending += 1
+        if self.pending == FIRESTORE_BATCH_LIMIT:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.batch.commit()
+            self.total += self.pending
+            self.batch = self.db.batch()
+            self.pending = 0
+
+
+def contexto(i: int) -> str:
+    return f"contexto {i:03d}"
+
+
+def verbo(i: int, j: int) -> str:
+    return f"verbo{i:03d}_{j}"
+
+
+# ==============================
+# CATÁLOGO
+# ==============================
+def seed_catalog(db, n_exercises: int, n_contexts: int, seed: int = 7) -> Dict[Tuple[str, str], List[str]]:
+    """Crea el catálogo; devuelve {(contexto, verbo): [ids]}."""
+    import assign_logic  # después de init_app
+
+    rng = random.Random(seed)
+    writer = _Writer(db)
+    catalog: Dict[Tuple[str, str], List[str]] = {}
+
+    for n in range(n_exercises):
+        c = n % n_contexts
+        v = (n // n_contexts) % VERBOS_POR_CONTEXTO
+        ctx, vb = contexto(c), verbo(c, v)
+        ex_id = f"S{n:06d}"
+        tipo = "privado" if rng.random() < 0.1 else "publico"
+        personalizado = tipo == "privado"
+
+        writer.set(db.collection("ejercicios").document(ex_id), {
+            "id": ex_id,
+            "terapia": "VNEST",
+            "revisado": True,
+            "tipo": tipo,
+            "creado_por": "bench",
+            "personalizado": personalizado,
+            "fecha_creacion": firestore.SERVER_TIMESTAMP,
+        })
+        writer.set(db.collection("ejercicios_VNEST").document(ex_id), {
+            "id_ejercicio_general": ex_id,
+            "contexto": ctx,
+            "verbo": vb,
+            "nivel": NIVELES[n % len(NIVELES)],
+            "oraciones": [{"oracion": f"Oración {k}.", "correcta": k % 2 == 0} for k in range(10)],
+            "pares": [],
+            **assign_logic.selection_fields(tipo, personalizado),
+        })
+        catalog.setdefault((ctx, vb), []).append(ex_id)
+
+    writer.flush()
+    return catalog
+
+
+# ==============================
+# PACIENTES
+# ==============================
+def seed_patients(
+    db,
+    catalog: Dict[Tuple[str, str], List[str]],
+    n_contexts: int,
+    patients_by_history: Dict[int, int],
+    seed: int = 11,
+) -> Dict[int, List[dict]]:
+    """
+    Crea pacientes con historiales de distintos tamaños.
+    Devuelve {tamaño: [{"email", "contexto"}]}.
+    """
+    rng = random.Random(seed)
+    writer = _Writer(db)
+    base = datetime(2025, 1, 1)
+    patients: Dict[int, List[dict]] = {}
+    n = 0
+
+    for size, count in patients_by_history.items():
+        for _ in range(count):
+            email = f"paciente{n:05d}@bench.test"
+            ctx = contexto(n % n_contexts)
+            n += 1
+            patient_ref = db.collection("pacientes").document(email)
+            writer.set(patient_ref, {"email": email, "nombre": f"Paciente {n}", "terapeuta": "bench"})
+
+            # Historial: ejercicios del contexto de casa, recorriendo los verbos en ronda
+            pool = [
+                (vb, ex_id)
+                for (c, vb), ids in catalog.items() if c == ctx
+                for ex_id in ids
+            ]
+            rng.shuffle(pool)
+            for prioridad, (vb, ex_id) in enumerate(pool[:size], start=1):
+                completado = rng.random() < 0.8
+                writer.set(patient_ref.collection("ejercicios_asignados").document(ex_id), {
+                    "id_ejercicio": ex_id,
+                    "contexto": ctx,
+                    "tipo": "VNEST",
+                    "verbo": vb,
+                    "nivel": "medio",
+                    "personalizado": False,
+                    "estado": "completado" if completado else "pendiente",
+                    "prioridad": prioridad,
+                    "ultima_fecha_realizado": base + timedelta(hours=prioridad) if completado else None,
+                    "veces_realizado": 1 if completado else 0,
+                })
+            writer.set(
+                patient_ref.collection("contadores").document("ejercicios_asignados"),
+                {"ultima_prioridad": min(size, len(pool))},
+            )
+            patients.setdefault(size, []).append({"email": email, "contexto": ctx})
+
+    writer.flush()
+    return patients
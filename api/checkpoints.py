@@ -0,0 +1,122 @@
+import os, time, sqlite3, asyncio
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # pip install langgraph-checkpoint-sqlite
+    SqliteSaver = None
+
+# ============================================================
+# Checkpoints del grafo VNeST (SQLite local)
+# ============================================================
+# Cada ejecución guarda su estado después de cada nodo con thread_id = run_id.
+# Si un nodo falla (agotados sus reintentos) la ejecución queda guardada y
+# POST /context/generate/resume/{run_id} la continúa desde el último nodo
+# completo, sin repetir las llamadas al LLM que ya terminaron.
+# Las ejecuciones que terminan bien se borran: la base solo guarda las interrumpidas.
+# Las interrumpidas que nadie reanuda se borran al arrancar la API cuando pasan
+# CHECKPOINT_TTL_S sin actividad (tabla ejecuciones: último checkpoint por run_id).
+
+CHECKPOINTS_ENABLED = os.getenv("CHECKPOINTS_ENABLED", "1") == "1" and SqliteSaver is not None
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.sqlite3")
+CHECKPOINT_TTL_S = float(os.getenv("CHECKPOINT_TTL_S", str(7 * 24 * 3600)))
+
+if SqliteSaver is not None:
+    class ThreadedSqliteSaver(SqliteSaver):
+        """
+        SqliteSaver con la API async que usa ainvoke, resuelta con asyncio.to_thread
+        (igual que llm_cache y jobs). A diferencia de AsyncSqliteSaver no queda
+        ligado a un event loop ni deja un hilo vivo que impida cerrar el proceso.
+        Además registra la última actividad de cada run_id para purge_expired.
+        """
+
+        def setup(self):
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS ejecuciones ("
+                " thread_id TEXT PRIMARY KEY, actualizado REAL NOT NULL)"
+            )
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            with self.cursor() as cur:
+                cur.execute(
+                    "INSERT OR REPLACE INTO ejecuciones (thread_id, actualizado) VALUES (?, ?)",
+                    (str(config["configurable"]["thread_id"]), time.time()),
+                )
+            return saved
+
+        def delete_thread(self, thread_id):
+            super().delete_thread(thread_id)
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM ejecuciones WHERE thread_id = ?", (str(thread_id),))
+
+        def purge_expired(self) -> int:
+            with self.cursor() as cur:
+                # Checkpoints de antes de la tabla: su plazo empieza a contar ahora
+                cur.execute(
+                    "INSERT OR IGNORE INTO ejecuciones (thread_id, actualizado)"
+                    " SELECT DISTINCT thread_id, ? FROM checkpoints",
+                    (time.time(),),
+                )
+                vencidas = [
+                    row[0] for row in cur.execute(
+                        "SELECT thread_id FROM ejecuciones WHERE actualizado < ?",
+                        (time.time() - CHECKPOINT_TTL_S,),
+                    ).fetchall()
+                ]
+            for thread_id in vencidas:
+                self.delete_thread(thread_id)
+            return len(vencidas)
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            items = await asyncio.to_thread(
+                lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+            )
+            for item in items:
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+_saver = None
+
+
+def get_saver():
+    """Checkpointer del proceso (None si están desactivados). La conexión se abre en el primer uso."""
+    global _saver
+    if not CHECKPOINTS_ENABLED:
+        return None
+    if _saver is None:
+        _saver = ThreadedSqliteSaver(sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False))
+    return _saver
+
+
+def purge_expired() -> int:
+    """Borra las ejecuciones interrumpidas sin actividad en CHECKPOINT_TTL_S. Devuelve cuántas eliminó."""
+    saver = get_saver()
+    return saver.purge_expired() if saver is not None else 0
+
+
+async def forget(run_id: str):
+    """Borra los checkpoints de una ejecución que ya no hay que reanudar."""
+    if _saver is not None:
+        await _saver.adelete_thread(run_id)
+
+
+async def aclose():
+    """Cierra la conexión (apagado de la app)."""
+    global _saver
+    if _saver is not None:
+        _saver.conn.close()
+    _saver = None
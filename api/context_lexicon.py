@@ -0,0 +1,106 @@
+import random
+from firebase_admin import firestore
+from typing import Dict, List, Optional
+
+db = firestore.client()
+
+# ============================================================
+# Léxico por contexto
+# ============================================================
+# /contextos_lexico/{contexto_normalizado}:
+#   contexto, verbos, verbos_clasificados, clasificador, verbos_usados, fecha_creacion
+#
+# Con el léxico guardado, step1 (generar verbos) y step2 (clasificarlos) se
+# saltan para contextos conocidos. _mirror evita releer Firestore en step0,
+# pero verbos_usados no puede ir atrasado: llm_cache (SQLite) lo comparten los
+# workers de uvicorn y worker.py, y con la misma lista de verbos libres otro
+# proceso recibiría de caché el mismo verbo y pares, es decir, un ejercicio
+# duplicado. step3 pide el léxico con refresh=True (una lectura del documento).
+
+COLLECTION = "contextos_lexico"
+NIVELES = ("facil", "medio", "dificil")
+
+_mirror: Dict[str, dict] = {}
+
+
+def normalize_context(contexto: str) -> str:
+    """Clave estable del contexto (los IDs de Firestore no admiten '/')."""
+    return " ".join((contexto or "").strip().lower().split()).replace("/", "-")
+
+
+def get_lexicon(contexto: str, refresh: bool = False) -> Optional[dict]:
+    """
+    Devuelve el léxico del contexto desde el espejo local o Firestore; None si no existe.
+    refresh=True lo relee de Firestore (verbos_usados al día) y actualiza el espejo.
+    """
+    key = normalize_context(contexto)
+    if key in _mirror and not refresh:
+        return _mirror[key]
+
+    doc = db.collection(COLLECTION).document(key).get()
+    if not doc.exists:
+        return None
+    data = doc.to_dict()
+    data.setdefault("verbos_usados", [])
+    _mirror[key] = data
+    return data
+
+
+def save_lexicon(
+    contexto: str,
+    verbos: List[str],
+    verbos_clasificados: Dict[str, List[str]],
+    clasificador: str = "llm",
+):
+    """
+    Guarda los verbos y su clasificación para reutilizarlos en ejecuciones futuras.
+    `clasificador` ("llm" | "local") indica quién produjo la clasificación.
+    Se escribe con merge y sin tocar verbos_usados (solo lo cambia mark_verb_used
+    con ArrayUnion): dos primeras ejecuciones simultáneas del mismo contexto no
+    se borran los verbos usados.
+    """
+    key = normalize_context(contexto)
+    data = {
+        "contexto": contexto,
+        "verbos": verbos,
+        "verbos_clasificados": verbos_clasificados,
+        "clasificador": clasificador,
+    }
+    db.collection(COLLECTION).document(key).set(
+        {**data, "fecha_creacion": firestore.SERVER_TIMESTAMP}, merge=True
+    )
+    previo = _mirror.get(key) or {}
+    _mirror[key] = {**data, "verbos_usados": list(previo.get("verbos_usados", []))}
+
+
+def mark_verb_used(contexto: str, verbo: str):
+    """Registra que el verbo ya tiene un ejercicio en este contexto."""
+    key = normalize_context(contexto)
+    db.collection(COLLECTION).document(key).set(
+        {"verbos_usados": firestore.ArrayUnion([verbo])}, merge=True
+    )
+    entry = _mirror.get(key)
+    if entry is not None and verbo not in entry["verbos_usados"]:
+        entry["verbos_usados"].append(verbo)
+
+
+def available_verbs(lexicon: dict, nivel: str) -> Dict[str, List[str]]:
+    """
+    Clasificación restringida a los verbos aún no usados del nivel pedido.
+    Si todos ya se usaron, se vuelve a ofrecer el nivel completo en otro orden
+    (ver level_exhausted: ese caso además se pide sin llm_cache).
+    """
+    clasificados = lexicon.get("verbos_clasificados", {})
+    usados = set(lexicon.get("verbos_usados", []))
+    del_nivel = clasificados.get(nivel, [])
+    if not del_nivel:
+        return clasificados
+    libres = [v for v in del_nivel if v not in usados]
+    return {nivel: libres or random.sample(del_nivel, len(del_nivel))}
+
+
+def level_exhausted(lexicon: dict, nivel: str) -> bool:
+    """True si ya se usaron todos los verbos del nivel (el prompt 3 se repetiría tal cual)."""
+    del_nivel = lexicon.get("verbos_clasificados", {}).get(nivel, [])
+    usados = set(lexicon.get("verbos_usados", []))
+    return bool(del_nivel) and all(v in usados for v in del_nivel)
@@ -0,0 +1,57 @@
+from typing import List, Optional, Tuple
+
+from firebase_admin import firestore
+
+import assign_logic
+
+db = firestore.client()
+
+# ============================================================
+# Persistencia de ejercicios generados
+# ============================================================
+# Un ejercicio son dos documentos con el mismo id: /ejercicios/{id} (general)
+# y /ejercicios_{terapia}/{id} (contenido). Se escriben en un solo commit,
+# junto con la asignación al paciente si corresponde, y sin releerlos:
+# si algo falla no quedan documentos huérfanos.
+
+def save_exercise(
+    general_doc: dict,
+    specific_collection: str,
+    specific_doc: dict,
+    patient_id: Optional[str] = None,
+) -> str:
+    """
+    Guarda el ejercicio general y el específico. Con `patient_id` también lo
+    asigna, en la misma transacción que toma la prioridad del contador del
+    paciente (assign_logic); sin paciente basta un WriteBatch.
+    Devuelve el id del ejercicio.
+    """
+    doc_id = general_doc["id"]
+    if patient_id is None:
+        save_exercises([(general_doc, specific_collection, specific_doc)])
+        return doc_id
+
+    general_ref = db.collection("ejercicios").document(doc_id)
+    specific_ref = db.collection(specific_collection).document(doc_id)
+    assignment = assign_logic.assignment_record(doc_id, general_doc, specific_doc)
+    assign_logic.assign_with_priority(
+        patient_id,
+        doc_id,
+        assignment,
+        extra_writes=[(general_ref, general_doc), (specific_ref, specific_doc)],
+    )
+    return doc_id
+
+
+def save_exercises(exercises: List[Tuple[dict, str, dict]]):
+    """
+    Guarda varios ejercicios sin paciente en un solo WriteBatch.
+    exercises: [(general_doc, specific_collection, specific_doc)]; el que llama
+    respeta el límite de escrituras por batch (dos por ejercicio).
+    """
+    batch = db.batch()
+    for general_doc, specific_collection, specific_doc in exercises:
+        doc_id = general_doc["id"]
+        batch.set(db.collection("ejercicios").document(doc_id), general_doc)
+        batch.set(db.collection(specific_collection).document(doc_id), specific_doc)
+    batch.commit()
@@ -0,0 +1,113 @@
+import os, json, time, uuid, sqlite3, threading
+from typing import Optional
+
+# ============================================================
+# Cola de trabajos de generación (SQLite local)
+# ============================================================
+# La API solo encola y consulta; worker.py (otro proceso) los ejecuta.
+# Estados: pendiente -> en_proceso -> completado | error
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.sqlite3")
+TIPOS = ("vnest", "sr", "personalizacion", "perfil")
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(JOBS_DB_PATH, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, tipo TEXT NOT NULL, payload TEXT NOT NULL,"
+            " estado TEXT NOT NULL, resultado TEXT, error TEXT,"
+            " intentos INTEGER NOT NULL DEFAULT 0,"
+            " creado REAL NOT NULL, actualizado REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_estado ON jobs (estado, creado)")
+        _local.conn = conn
+    return conn
+
+
+def _to_dict(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "tipo": row["tipo"],
+        "estado": row["estado"],
+        "payload": json.loads(row["payload"]),
+        "resultado": json.loads(row["resultado"]) if row["resultado"] else None,
+        "error": row["error"],
+        "intentos": row["intentos"],
+        "creado": row["creado"],
+        "actualizado": row["actualizado"],
+    }
+
+# ==============================
+# API (lado FastAPI)
+# ==============================
+def enqueue(tipo: str, payload: dict) -> str:
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de trabajo desconocido: {tipo}")
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    _conn().execute(
+        "INSERT INTO jobs (id, tipo, payload, estado, creado, actualizado) VALUES (?, ?, ?, 'pendiente', ?, ?)",
+        (job_id, tipo, json.dumps(payload, ensure_ascii=False), now, now),
+    )
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    row = _conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return _to_dict(row) if row else None
+
+# ==============================
+# WORKER
+# ==============================
+def claim_next() -> Optional[dict]:
+    """Toma el trabajo pendiente más antiguo y lo marca en_proceso de forma atómica."""
+    conn = _conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE estado = 'pendiente' ORDER BY creado LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET estado = 'en_proceso', intentos = intentos + 1, actualizado = ? WHERE id = ?",
+            (time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    job = _to_dict(row)
+    job["estado"] = "en_proceso"
+    return job
+
+
+def complete(job_id: str, resultado):
+    _conn().execute(
+        "UPDATE jobs SET estado = 'completado', resultado = ?, error = NULL, actualizado = ? WHERE id = ?",
+        (json.dumps(resultado, ensure_ascii=False, default=str), time.time(), job_id),
+    )
+
+
+def fail(job_id: str, error: str):
+    _conn().execute(
+        "UPDATE jobs SET estado = 'error', error = ?, actualizado = ? WHERE id = ?",
+        (error, time.time(), job_id),
+    )
+
+
+def requeue_stale(older_than_s: float) -> int:
+    """Devuelve a pendiente los trabajos en_proceso abandonados por un worker caído."""
+    cur = _conn().execute(
+        "UPDATE jobs SET estado = 'pendiente', actualizado = ? WHERE estado = 'en_proceso' AND actualizado < ?",
+        (time.time(), time.time() - older_than_s),
+    )
+    return cur.rowcount
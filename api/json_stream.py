@@ -0,0 +1,248 @@
+import json
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# ============================================================
+# Validación incremental de JSON (respuestas en streaming)
+# ============================================================
+# IncrementalJSON recibe el texto del modelo por pedazos y revisa, a medida que
+# llega, la sintaxis y la forma pedida en un StreamSchema. Apenas la salida ya
+# no puede terminar bien lanza StreamAbort, para cortar la respuesta sin esperar
+# los max_tokens restantes. También entrega cada campo apenas se completa
+# (on_value), para reenviar resultados parciales.
+#
+# Rutas: llaves separadas por "." y "[]" para los elementos de un arreglo;
+# los patrones aceptan "*" (fnmatch). Ej.: "oraciones.[]", "expansiones.*.opciones".
+
+CONTAINER = {"{": dict, "[": list}
+SCALAR_START = set("-0123456789tfn")
+LOOSE_QUOTES = set("'“”")  # comillas que parse_json corrige: ahí se deja de revisar
+WHITESPACE = set(" \t\r\n")
+
+Path = Tuple[str, ...]
+
+
+class StreamAbort(ValueError):
+    """La salida en curso no puede terminar en un JSON válido para el esquema."""
+
+
+class StreamSchema:
+    """
+    Forma mínima que debe tener la salida para que valga la pena seguir leyéndola.
+    - required: llaves obligatorias del objeto raíz (se revisan al cerrarlo)
+    - types: {ruta: dict | list | str} tipo esperado del valor
+    - min_items / max_items: {ruta: n} tamaño de arreglos (mínimo al cerrarse, máximo al crecer)
+    Lo que se puede reparar después (vnest_validation) no debería estar aquí.
+    """
+
+    def __init__(
+        self,
+        required: Iterable[str] = (),
+        types: Optional[Dict[str, type]] = None,
+        min_items: Optional[Dict[str, int]] = None,
+        max_items: Optional[Dict[str, int]] = None,
+    ):
+        self.required = tuple(required)
+        self.types = types or {}
+        self.min_items = min_items or {}
+        self.max_items = max_items or {}
+
+    @staticmethod
+    def _lookup(rules: dict, path: str):
+        for pattern, value in rules.items():
+            if fnmatchcase(path, pattern):
+                return value
+        return None
+
+
+def _dotted(path: Path) -> str:
+    return ".".join(path)
+
+
+class IncrementalJSON:
+    """
+    Analizador por pedazos: feed(texto) por cada fragmento y finish() al final.
+    on_value(ruta, valor) se llama con cada valor completo hasta emit_depth
+    niveles; los contenedores más arriba de ese nivel se anuncian por sus hijos.
+    Si la salida no es JSON estricto pero parse_json la puede corregir (bloque
+    ``` o comillas simples/curvas) se deja de revisar y se le deja el trabajo.
+    """
+
+    def __init__(
+        self,
+        schema: Optional[StreamSchema] = None,
+        on_value: Optional[Callable[[Path, object], None]] = None,
+        emit_depth: int = 2,
+    ):
+        self.schema = schema or StreamSchema()
+        self.on_value = on_value
+        self.emit_depth = emit_depth
+        self.buf = ""
+        self.stack = []  # marcos: {"kind", "path", "state", "start", "count", "keys", "key"}
+        self.started = False
+        self.done = False
+        self.disabled = False
+        self.string = None  # {"start", "path" | None si es una llave, "escape"}
+        self.scalar = None  # {"start", "path"}
+
+    # ---------- API ----------
+    def feed(self, text: str):
+        start = len(self.buf)
+        self.buf += text
+        if self.disabled or self.done:
+            return
+        for i in range(start, len(self.buf)):
+            self._char(self.buf[i], i)
+            if self.disabled or self.done:
+                return
+
+    def finish(self):
+        """Fin del stream: la salida debe haber cerrado su objeto raíz."""
+        if self.disabled or self.done:
+            return
+        raise StreamAbort("la respuesta terminó antes de cerrar el JSON (¿max_tokens?)")
+
+    # ---------- MÁQUINA DE ESTADOS ----------
+    def _char(self, c: str, i: int):
+        if self.string is not None:
+            self._string_char(c, i)
+            return
+        if self.scalar is not None:
+            if c not in WHITESPACE and c not in ",]}":
+                return
+            self._end_scalar(i)
+            if self.done:
+                return
+        if c in WHITESPACE:
+            return
+
+        if not self.started:
+            if c in CONTAINER:
+                self.started = True
+                self._begin_value((), c, i)
+            elif c == "`":
+                self.disabled = True
+            else:
+                raise StreamAbort(f"la respuesta no empieza con JSON ({c!r})")
+            return
+
+        frame = self.stack[-1]
+        state = frame["state"]
+        if state == "key":
+            if c == '"':
+                self.string = {"start": i, "path": None, "escape": False}
+            elif c in LOOSE_QUOTES:
+                self.disabled = True
+            elif c == "}":  # objeto vacío o coma final (parse_json la tolera)
+                self._close(frame, c, i)
+            else:
+                raise StreamAbort(f"se esperaba una llave en {_dotted(frame['path']) or 'la raíz'}")
+        elif state == "colon":
+            if c != ":":
+                raise StreamAbort(f"falta ':' después de '{frame['key']}'")
+            frame["state"] = "value"
+        elif state == "value":
+            if frame["kind"] is list and c == "]":
+                self._close(frame, c, i)
+                return
+            if c in LOOSE_QUOTES:
+                self.disabled = True
+                return
+            if frame["kind"] is list:
+                frame["count"] += 1
+                self._check_max(frame)
+                path = frame["path"] + ("[]",)
+            else:
+                path = frame["path"] + (frame["key"],)
+            self._begin_value(path, c, i)
+        elif state == "comma":
+            if c == ",":
+                frame["state"] = "key" if frame["kind"] is dict else "value"
+            elif c in "}]":
+                self._close(frame, c, i)
+            else:
+                raise StreamAbort(f"se esperaba ',' en {_dotted(frame['path']) or 'la raíz'}")
+
+    def _string_char(self, c: str, i: int):
+        s = self.string
+        if s["escape"]:
+            s["escape"] = False
+        elif c == "\\":
+            s["escape"] = True
+        elif c == '"':
+            self.string = None
+            frame = self.stack[-1]
+            if s["path"] is None:
+                frame["key"] = json.loads(self.buf[s["start"]:i + 1], strict=False)
+                frame["keys"].add(frame["key"])
+                frame["state"] = "colon"
+            else:
+                self._end_value(s["path"], s["start"], i + 1)
+
+    def _begin_value(self, path: Path, c: str, i: int):
+        if c in CONTAINER:
+            kind = CONTAINER[c]
+        elif c == '"':
+            kind = str
+        elif c in SCALAR_START:
+            kind = None
+        else:
+            raise StreamAbort(f"valor inválido en {_dotted(path)} ({c!r})")
+
+        expected = StreamSchema._lookup(self.schema.types, _dotted(path))
+        if expected is not None and kind is not expected:
+            raise StreamAbort(f"{_dotted(path)} debería ser {expected.__name__}")
+
+        if kind in (dict, list):
+            self.stack.append({
+                "kind": kind, "path": path, "start": i, "count": 0, "keys": set(), "key": None,
+                "state": "key" if kind is dict else "value",
+            })
+        elif kind is str:
+            self.string = {"start": i, "path": path, "escape": False}
+        else:
+            self.scalar = {"start": i, "path": path}
+
+    def _end_scalar(self, end: int):
+        token = self.scalar
+        self.scalar = None
+        try:
+            json.loads(self.buf[token["start"]:end])
+        except json.JSONDecodeError:
+            raise StreamAbort(f"valor inválido en {_dotted(token['path'])}")
+        self._end_value(token["path"], token["start"], end)
+
+    def _check_max(self, frame: dict):
+        limit = StreamSchema._lookup(self.schema.max_items, _dotted(frame["path"]))
+        if limit is not None and frame["count"] > limit:
+            raise StreamAbort(f"{_dotted(frame['path'])} pasa de {limit} elementos")
+
+    def _close(self, frame: dict, c: str, i: int):
+        if (c == "}") != (frame["kind"] is dict):
+            raise StreamAbort(f"cierre '{c}' inesperado en {_dotted(frame['path']) or 'la raíz'}")
+        path = _dotted(frame["path"])
+        if frame["kind"] is list:
+            minimum = StreamSchema._lookup(self.schema.min_items, path)
+            if minimum is not None and frame["count"] < minimum:
+                raise StreamAbort(f"{path} tiene {frame['count']} elementos de {minimum}")
+        elif not frame["path"]:
+            missing = [k for k in self.schema.required if k not in frame["keys"]]
+            if missing:
+                raise StreamAbort(f"faltan las llaves {missing}")
+        self.stack.pop()
+        self._end_value(frame["path"], frame["start"], i + 1, container=True)
+
+    def _end_value(self, path: Path, start: int, end: int, container: bool = False):
+        if not self.stack:
+            self.done = True
+            return
+        self.stack[-1]["state"] = "comma"
+        if self.on_value is None or len(path) > self.emit_depth:
+            return
+        if container and len(path) < self.emit_depth:
+            return  # ya se anunciaron sus hijos
+        try:
+            value = json.loads(self.buf[start:end], strict=False)
+        except json.JSONDecodeError:
+            return  # p. ej. coma final dentro del contenedor: parse_json la corrige al final, sin parcial
+        self.on_value(path, value)
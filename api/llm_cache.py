@@ -0,0 +1,152 @@
+import os, json, time, sqlite3, hashlib, asyncio, threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional
+
+# ==============================
+# CONFIG
+# ==============================
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "512"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+
+# Opt-out por petición: los endpoints lo activan con payload.force_fresh.
+# Una respuesta "fresca" no se lee de caché, pero sí se guarda.
+force_fresh: ContextVar[bool] = ContextVar("llm_force_fresh", default=False)
+
+# ==============================
+# CLAVE
+# ==============================
+def make_key(
+    deployment: str, system: str, prompt: str, temperature: float, max_tokens: int, top_p: Optional[float] = None
+) -> str:
+    parts = [deployment, system, prompt, temperature, max_tokens]
+    if top_p is not None:  # sin top_p las llaves ya guardadas siguen valiendo
+        parts.append(top_p)
+    raw = json.dumps(parts, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ==============================
+# CONTADORES
+# ==============================
+_stats = {
+    "hits_memoria": 0,
+    "hits_disco": 0,
+    "misses": 0,
+    "forzados": 0,
+    "escrituras": 0,
+    "segundos_ahorrados": 0.0,
+}
+
+def stats() -> dict:
+    total = _stats["hits_memoria"] + _stats["hits_disco"] + _stats["misses"]
+    hits = _stats["hits_memoria"] + _stats["hits_disco"]
+    return {
+        **_stats,
+        "segundos_ahorrados": round(_stats["segundos_ahorrados"], 2),
+        "hit_ratio": round(hits / total, 3) if total else 0.0,
+        "items_memoria": len(_memory),
+    }
+
+# ==============================
+# NIVEL 1: LRU EN MEMORIA
+# ==============================
+# key -> (expires_at, content, latency_s)
+_memory: "OrderedDict[str, tuple]" = OrderedDict()
+
+def _memory_get(key: str) -> Optional[tuple]:
+    entry = _memory.get(key)
+    if entry is None:
+        return None
+    if entry[0] < time.time():
+        del _memory[key]
+        return None
+    _memory.move_to_end(key)
+    return entry
+
+def _memory_put(key: str, entry: tuple):
+    _memory[key] = entry
+    _memory.move_to_end(key)
+    while len(_memory) > LLM_CACHE_MAX_ITEMS:
+        _memory.popitem(last=False)
+
+# ==============================
+# NIVEL 2: SQLITE EN DISCO
+# ==============================
+# Compartido por todos los workers de uvicorn; WAL permite lecturas concurrentes.
+_local = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(LLM_CACHE_PATH, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY, content TEXT NOT NULL,"
+            " latency_s REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+def _disk_get(key: str) -> Optional[tuple]:
+    row = _conn().execute(
+        "SELECT expires_at, content, latency_s FROM llm_cache WHERE key = ?", (key,)
+    ).fetchone()
+    if row is None:
+        return None
+    if row[0] < time.time():
+        with _conn() as conn:
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        return None
+    return row
+
+def _disk_put(key: str, entry: tuple):
+    with _conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, expires_at, content, latency_s) VALUES (?, ?, ?, ?)",
+            (key, *entry),
+        )
+
+def purge_expired() -> int:
+    """Borra del disco las entradas vencidas. Devuelve cuántas eliminó."""
+    with _conn() as conn:
+        cur = conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+    return cur.rowcount
+
+# ==============================
+# API
+# ==============================
+async def get(key: str) -> Optional[str]:
+    """Busca en memoria y luego en disco. None si no hay entrada válida o se pidió respuesta fresca."""
+    if not LLM_CACHE_ENABLED:
+        return None
+    if force_fresh.get():
+        _stats["forzados"] += 1
+        return None
+
+    entry = _memory_get(key)
+    if entry is not None:
+        _stats["hits_memoria"] += 1
+        _stats["segundos_ahorrados"] += entry[2]
+        return entry[1]
+
+    entry = await asyncio.to_thread(_disk_get, key)
+    if entry is not None:
+        _memory_put(key, entry)
+        _stats["hits_disco"] += 1
+        _stats["segundos_ahorrados"] += entry[2]
+        return entry[1]
+
+    _stats["misses"] += 1
+    return None
+
+async def put(key: str, content: str, latency_s: float):
+    """Guarda una respuesta ya validada en ambos niveles."""
+    if not LLM_CACHE_ENABLED:
+        return
+    entry = (time.time() + LLM_CACHE_TTL_S, content, latency_s)
+    _memory_put(key, entry)
+    await asyncio.to_thread(_disk_put, key, entry)
+    _stats["escrituras"] += 1
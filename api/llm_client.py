@@ -0,0 +1,187 @@
+import os, json, time, asyncio
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from openai import AsyncAzureOpenAI
+
+import json_stream
+import llm_cache
+import llm_usage
+import metrics
+
+# ==============================
+# AZURE CONFIG
+# ==============================
+load_dotenv("env.env")
+AZURE_ENDPOINT = os.getenv("AZURE_ENDPOINT", "https://invuniandesai-2.openai.azure.com/")
+AZURE_DEPLOYMENT = os.getenv("AZURE_DEPLOYMENT", "gpt-4.1")
+AZURE_API_KEY = os.getenv("AZURE_API_KEY")
+AZURE_API_VERSION = "2024-12-01-preview"
+
+# ==============================
+# POOL DE CONEXIONES
+# ==============================
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_KEEPALIVE_EXPIRY_S", "60"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "10"))
+
+# Streaming con validación incremental (solo en las llamadas que pasan un StreamSchema)
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+LLM_STREAM_RETRIES = int(os.getenv("LLM_STREAM_RETRIES", "1"))
+
+_client: Optional[AsyncAzureOpenAI] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 requiere el paquete opcional `h2` (pip install httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_client() -> AsyncAzureOpenAI:
+    """
+    Devuelve el cliente Azure OpenAI del proceso.
+    Se crea una sola vez y reutiliza el mismo pool keep-alive en todas las llamadas.
+    El pool queda ligado al event loop; si cambia (scripts con asyncio.run) se recrea.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_S, connect=LLM_CONNECT_TIMEOUT_S),
+        )
+        _client = AsyncAzureOpenAI(
+            api_key=AZURE_API_KEY,
+            azure_endpoint=AZURE_ENDPOINT,
+            api_version=AZURE_API_VERSION,
+            http_client=http_client,
+        )
+        _client_loop = loop
+    return _client
+
+
+async def aclose_client():
+    """Cierra el pool de conexiones (apagado de la app)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+# ==============================
+# PROMPT RUNNER
+# ==============================
+def _count_usage(resp):
+    # Los tokens se cuentan aunque luego falle el parseo: Azure ya los cobró
+    tokens = llm_usage.tokens_from_response(resp)
+    llm_usage.add(metrics.current_node.get(), tokens)
+    metrics.count_tokens(tokens)
+
+
+async def _complete(request: dict) -> str:
+    resp = await get_client().chat.completions.create(**request)
+    _count_usage(resp)
+    return resp.choices[0].message.content.strip()
+
+
+async def _complete_streaming(request: dict, schema: json_stream.StreamSchema, on_value=None) -> str:
+    """
+    Lee la respuesta por pedazos y la valida mientras llega (json_stream).
+    Si ya no puede terminar bien se cierra la conexión y se reintenta de inmediato,
+    hasta LLM_STREAM_RETRIES veces; después sube el StreamAbort.
+    on_value(ruta, valor, intento) recibe cada campo completo; si hay reintento
+    los campos se vuelven a emitir desde el principio con el nuevo número de intento.
+    Un intento cortado no informa tokens: Azure manda el uso solo en el último pedazo.
+    """
+    for intento in range(1, LLM_STREAM_RETRIES + 2):
+        emit = (lambda path, value, n=intento: on_value(path, value, n)) if on_value else None
+        checker = json_stream.IncrementalJSON(schema, emit)
+        stream = await get_client().chat.completions.create(
+            **request, stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    _count_usage(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    checker.feed(chunk.choices[0].delta.content)
+            checker.finish()
+            return checker.buf.strip()
+        except json_stream.StreamAbort as e:
+            metrics.count_llm_error("StreamAbort")
+            print(f"✂️ Respuesta cortada a los {len(checker.buf)} caracteres (intento {intento}): {e}")
+            error = e
+        finally:
+            await stream.close()
+    raise error
+
+
+async def run_prompt(
+    prompt: str,
+    system: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: Optional[float] = None,
+    top_p: Optional[float] = None,
+    parser: Callable[[str], Any] = json.loads,
+    schema: Optional[json_stream.StreamSchema] = None,
+    on_value: Optional[Callable[[tuple, Any, int], None]] = None,
+) -> Dict:
+    """
+    Envía un prompt al deployment de Azure y devuelve la respuesta JSON parseada.
+    `timeout` (segundos) aplica solo a esta llamada; por defecto LLM_TIMEOUT_S.
+    `top_p` solo se envía si se indica (si no, el valor por defecto de Azure).
+    Las respuestas se sirven desde llm_cache cuando ya existen para los mismos parámetros.
+    Con `schema` (y LLM_STREAM=1) la respuesta llega en streaming y se corta apenas
+    deja de cumplirlo; `on_value` recibe los campos a medida que se completan.
+    """
+    key = llm_cache.make_key(AZURE_DEPLOYMENT, system, prompt, temperature, max_tokens, top_p)
+    with metrics.track_llm() as call:
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            call["outcome"] = "cache"
+            llm_usage.add(metrics.current_node.get(), None)
+            if on_value is not None:
+                # Mismos eventos parciales que sin caché
+                try:
+                    json_stream.IncrementalJSON(on_value=lambda path, value: on_value(path, value, 1)).feed(cached)
+                except ValueError:  # StreamAbort o JSONDecodeError
+                    pass  # solo JSON que parse_json tuvo que corregir: sin parciales
+            return parser(cached)
+
+        t0 = time.perf_counter()
+        request = dict(
+            model=AZURE_DEPLOYMENT,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"},
+            timeout=timeout or LLM_TIMEOUT_S,
+        )
+        if top_p is not None:
+            request["top_p"] = top_p
+        if schema is not None and LLM_STREAM:
+            content = await _complete_streaming(request, schema, on_value)
+        else:
+            content = await _complete(request)
+        result = parser(content)
+
+        # Solo se guarda lo que se pudo parsear
+        await llm_cache.put(key, content, time.perf_counter() - t0)
+        return result
@@ -0,0 +1,117 @@
+import os, time, uuid, asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# ============================================================
+# Uso de tokens por ejecución
+# ============================================================
+# run_prompt suma los tokens de cada respuesta de Azure (prompt, completion y
+# cached) al acumulador de la ejecución activa, separado por nodo. Al terminar
+# el pipeline (metrics.track_pipeline) se guarda un registro en
+# /uso_llm/{job_id | run_id}:
+#   pipeline, endpoint, creado_por, job_id, run_id, ok, duracion_s, intentos, fecha,
+#   totales:  {llamadas, cache_hits, prompt_tokens, completion_tokens, cached_tokens}
+#   por_nodo: {nodo: {... mismos campos}}
+# Una ejecución reanudada (mismo run_id) o un trabajo reintentado suma sus
+# tokens, duración e intentos al mismo documento con Increment; pipeline, ok y
+# fecha quedan los del último intento.
+# Los mismos tokens van a Prometheus en metrics (aphasia_llm_tokens_total).
+
+LLM_USAGE_RECORDS = os.getenv("LLM_USAGE_RECORDS", "1") == "1"
+LLM_USAGE_COLLECTION = os.getenv("LLM_USAGE_COLLECTION", "uso_llm")
+
+# Quién y desde dónde: los fija la API (middleware y endpoints) o el worker
+endpoint: ContextVar[str] = ContextVar("llm_usage_endpoint", default="-")
+creado_por: ContextVar[str] = ContextVar("llm_usage_creado_por", default="-")
+job_id: ContextVar[Optional[str]] = ContextVar("llm_usage_job_id", default=None)
+# La fijan las entradas del grafo VNeST (thread_id de sus checkpoints)
+run_id: ContextVar[Optional[str]] = ContextVar("llm_usage_run_id", default=None)
+
+_current: ContextVar[Optional[dict]] = ContextVar("llm_usage_current", default=None)
+
+TOKEN_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+
+def _empty() -> Dict[str, int]:
+    return {"llamadas": 0, "cache_hits": 0, **{f: 0 for f in TOKEN_FIELDS}}
+
+
+def tokens_from_response(resp) -> Dict[str, int]:
+    """Tokens de una respuesta de chat completions (cached_tokens solo si Azure lo informa)."""
+    usage = getattr(resp, "usage", None)
+    if usage is None:
+        return {f: 0 for f in TOKEN_FIELDS}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+    }
+
+
+def add(node: str, tokens: Optional[Dict[str, int]]):
+    """Suma una llamada a la ejecución activa. tokens=None cuenta un acierto de llm_cache."""
+    run = _current.get()
+    if run is None:
+        return
+    for bucket in (run["totales"], run["por_nodo"].setdefault(node, _empty())):
+        if tokens is None:
+            bucket["cache_hits"] += 1
+            continue
+        bucket["llamadas"] += 1
+        for f in TOKEN_FIELDS:
+            bucket[f] += tokens[f]
+
+# ==============================
+# REGISTRO POR EJECUCIÓN
+# ==============================
+def _save(record: dict):
+    try:
+        from firebase_admin import firestore
+        doc_id = record["job_id"] or record["run_id"] or uuid.uuid4().hex
+        inc = firestore.Increment
+        doc = {
+            **record,
+            "duracion_s": inc(record["duracion_s"]),
+            "intentos": inc(1),
+            "totales": {k: inc(v) for k, v in record["totales"].items()},
+            "por_nodo": {
+                nodo: {k: inc(v) for k, v in campos.items()}
+                for nodo, campos in record["por_nodo"].items()
+            },
+            "fecha": firestore.SERVER_TIMESTAMP,
+        }
+        firestore.client().collection(LLM_USAGE_COLLECTION).document(doc_id).set(doc, merge=True)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el uso de tokens ({record['pipeline']}): {e}")
+
+
+@contextmanager
+def track_run(pipeline: str):
+    """Acumula los tokens de una ejecución y al salir guarda su registro sin bloquear el event loop."""
+    run = {"totales": _empty(), "por_nodo": {}}
+    token = _current.set(run)
+    t0 = time.perf_counter()
+    ok = False
+    try:
+        yield run
+        ok = True
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # generador cerrado desde otro contexto
+        totales = run["totales"]
+        if LLM_USAGE_RECORDS and (totales["llamadas"] or totales["cache_hits"]):
+            record = {
+                "pipeline": pipeline,
+                "endpoint": endpoint.get(),
+                "creado_por": creado_por.get(),
+                "job_id": job_id.get(),
+                "run_id": run_id.get(),
+                "ok": ok,
+                "duracion_s": round(time.perf_counter() - t0, 3),
+                **run,
+            }
+            asyncio.get_running_loop().run_in_executor(None, _save, record)
@@ -1,16 +1,41 @@
-from fastapi import FastAPI
+import json, uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from starlette.routing import Match
+from pydantic import BaseModel, ValidationError
+from typing import List, Optional
 from firebase_admin import firestore
 from datetime import datetime
 
 # Importaciones de tus funciones auxiliares
-from main_langraph_vnest import main_langraph_vnest
+from main_langraph_vnest import main_langraph_vnest, stream_langraph_vnest, resume_langraph_vnest, get_workflow
 from main_langraph_sr import main_langraph_sr
 from main_personalization import main_personalization
+import llm_client
+import llm_cache
+import llm_usage
+import jobs
+import batch_generation
+import checkpoints
+import metrics
+import single_flight
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_workflow()  # compila el grafo VNeST al arrancar
+    metrics.instrument_firestore()
+    llm_cache.purge_expired()
+    single_flight.purge_expired()
+    checkpoints.purge_expired()
+    yield
+    await llm_client.aclose_client()
+    await checkpoints.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 db = firestore.client()
 
 app.add_middleware(
@@ -21,25 +46,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoint de origen para el registro de tokens (llm_usage). Se usa la plantilla
+# de la ruta (/context/generate/resume/{run_id}), no la URL: scope["route"] aún
+# no existe en el middleware, así que se busca la ruta que corresponde.
+def _route_template(scope) -> str:
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "-")
+    return "-"
+
+
+@app.middleware("http")
+async def tag_llm_usage_endpoint(request, call_next):
+    llm_usage.endpoint.set(_route_template(request.scope))
+    return await call_next(request)
+
 
 class ContextGeneratePayload(BaseModel):
     context: str
     nivel: str
     creado_por: str
     tipo: str 
+    force_fresh: bool = False
 
 class SRPayload(BaseModel):
     user_id: str
     profile: dict
+    force_fresh: bool = False
 
 class PersonalizePayload(BaseModel):
     user_id: str
     exercise_id: str
     profile: dict
+    force_fresh: bool = False
 
 class ProfileStructurePayload(BaseModel):
     user_id: str
     raw_text: str
+    force_fresh: bool = False
+
+class BatchItem(BaseModel):
+    context: str
+    nivel: str
+    tipo: str = "privado"
+
+class BatchGeneratePayload(BaseModel):
+    creado_por: str
+    items: List[BatchItem]
+    force_fresh: bool = False
+
+class JobPayload(BaseModel):
+    tipo: str  # "vnest" | "sr" | "personalizacion" | "perfil"
+    payload: dict
+
+# Cada tipo de trabajo recibe el mismo payload que su endpoint síncrono
+JOB_PAYLOADS = {
+    "vnest": ContextGeneratePayload,
+    "sr": SRPayload,
+    "personalizacion": PersonalizePayload,
+    "perfil": ProfileStructurePayload,
+}
 
 # ========================
 #  ENDPOINTS
@@ -50,29 +117,149 @@ def read_root():
     return {"Hello": "World"}
 
 # --- Generar ejercicio VNEST
+# Pedidos idénticos simultáneos comparten una sola generación (single_flight);
+# con Idempotency-Key un reintento recibe el ejercicio ya generado.
 @app.post("/context/generate")
-def create_exercise(payload: ContextGeneratePayload):
-    response = main_langraph_vnest(payload.context, payload.nivel, payload.creado_por, payload.tipo)
+async def create_exercise(
+    payload: ContextGeneratePayload, idempotency_key: Optional[str] = Header(None)
+):
+    llm_cache.force_fresh.set(payload.force_fresh)
+    llm_usage.creado_por.set(payload.creado_por)
+    run_id = uuid.uuid4().hex
+
+    async def generate():
+        try:
+            return await main_langraph_vnest(
+                payload.context, payload.nivel, payload.creado_por, payload.tipo, run_id=run_id
+            )
+        except Exception as e:
+            e.run_id = run_id  # quienes compartían la ejecución reanudan el mismo run_id
+            raise
+
+    try:
+        response = await single_flight.run(
+            "/context/generate", payload.model_dump(), generate, idempotency_key
+        )
+    except single_flight.IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        print("Error en /context/generate:", e)
+        raise HTTPException(status_code=500, detail={"error": str(e), "run_id": getattr(e, "run_id", run_id)})
     return response
 
+# --- Reanudar una generación VNEST que falló, desde su último nodo completo
+@app.post("/context/generate/resume/{run_id}")
+async def resume_exercise(run_id: str):
+    try:
+        response = await resume_langraph_vnest(run_id)
+    except Exception as e:
+        print("Error en /context/generate/resume:", e)
+        raise HTTPException(status_code=500, detail={"error": str(e), "run_id": run_id})
+    if response is None:
+        raise HTTPException(status_code=404, detail="No hay una ejecución interrumpida con ese run_id")
+    return response
+
+# --- Generar ejercicio VNEST con progreso por nodo (Server-Sent Events)
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/context/generate/stream")
+async def create_exercise_stream(payload: ContextGeneratePayload):
+    async def events():
+        llm_cache.force_fresh.set(payload.force_fresh)
+        llm_usage.creado_por.set(payload.creado_por)
+        run_id = uuid.uuid4().hex
+        try:
+            async for event, data in stream_langraph_vnest(
+                payload.context, payload.nivel, payload.creado_por, payload.tipo, run_id=run_id
+            ):
+                yield _sse(event, data)
+        except Exception as e:
+            print("Error en /context/generate/stream:", e)
+            yield _sse("error", {"detail": str(e), "run_id": run_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# --- Generar varios ejercicios VNEST (contextos x niveles) en un solo pedido
+@app.post("/context/generate/batch")
+async def create_exercise_batch(payload: BatchGeneratePayload):
+    if not payload.items:
+        raise HTTPException(status_code=400, detail="El lote no tiene ítems")
+    llm_cache.force_fresh.set(payload.force_fresh)
+    llm_usage.creado_por.set(payload.creado_por)
+    report = await batch_generation.generate_batch(
+        [item.model_dump() for item in payload.items], payload.creado_por
+    )
+    return {"total": len(report), "ok": sum(1 for r in report if r["ok"]), "items": report}
+
 # --- Generar tarjetas SR
 @app.post("/spaced-retrieval/")
-def create_sr_cards(payload: SRPayload):
+async def create_sr_cards(payload: SRPayload):
     print("Payload recibido:", payload)
-    response = main_langraph_sr(payload.user_id, payload.profile)
+    llm_cache.force_fresh.set(payload.force_fresh)
+    response = await main_langraph_sr(payload.user_id, payload.profile)
     return response
 
-# --- Personalizar ejercicio
+# --- Personalizar ejercicio (mismo single-flight e Idempotency-Key que /context/generate)
 @app.post("/personalize-exercise/")
-def personalize_exercise(payload: PersonalizePayload):
-    response = main_personalization(payload.user_id, payload.exercise_id, payload.profile)
+async def personalize_exercise(
+    payload: PersonalizePayload, idempotency_key: Optional[str] = Header(None)
+):
+    llm_cache.force_fresh.set(payload.force_fresh)
+    try:
+        response = await single_flight.run(
+            "/personalize-exercise/",
+            payload.model_dump(),
+            lambda: main_personalization(payload.user_id, payload.exercise_id, payload.profile),
+            idempotency_key,
+        )
+    except single_flight.IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     return response
 
 # --- Estructurar perfil
 @app.post("/profile/structure/")
-def structure_profile(payload: ProfileStructurePayload):
+async def structure_profile(payload: ProfileStructurePayload):
     from main_profile_structure import main_profile_structure
-    response = main_profile_structure(payload.user_id, payload.raw_text)
+    llm_cache.force_fresh.set(payload.force_fresh)
+    response = await main_profile_structure(payload.user_id, payload.raw_text)
     print("Respuesta generada:", response)
     return response
 
+# --- Encolar un trabajo de generación (lo ejecuta worker.py)
+@app.post("/jobs", status_code=202)
+def create_job(job: JobPayload):
+    model = JOB_PAYLOADS.get(job.tipo)
+    if model is None:
+        raise HTTPException(status_code=400, detail=f"Tipo de trabajo desconocido: {job.tipo}")
+    try:
+        payload = model.model_validate(job.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors())
+    job_id = jobs.enqueue(job.tipo, payload.model_dump())
+    return {"job_id": job_id, "estado": "pendiente"}
+
+# --- Estado y resultado de un trabajo
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+# --- Estadísticas de la caché de LLM
+@app.get("/llm/cache/stats")
+def llm_cache_stats():
+    return llm_cache.stats()
+
+# --- Métricas Prometheus (pipelines, nodos, run_prompt y Firestore)
+@app.get("/metrics")
+def prometheus_metrics():
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas (METRICS_ENABLED=0 o falta prometheus_client)")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
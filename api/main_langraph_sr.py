@@ -1,10 +1,10 @@
-import os, json
-from dotenv import load_dotenv
+import os, json, asyncio
 from typing import Dict, List, Optional
 from typing_extensions import TypedDict
 import firebase_admin
 from firebase_admin import credentials, firestore
-from openai import AzureOpenAI
+import llm_client
+import metrics
 from prompts_sr import generate_sr_prompt
 
 # ==============================
@@ -16,22 +16,6 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# ==============================
-# AZURE CONFIG
-# ==============================
-load_dotenv("env.env")
-AZURE_ENDPOINT = "https://invuniandesai-2.openai.azure.com/"
-AZURE_DEPLOYMENT = "gpt-4.1"
-AZURE_API_KEY = os.getenv("AZURE_API_KEY")
-AZURE_API_VERSION = "2024-12-01-preview"
-
-def get_client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=AZURE_API_KEY,
-        azure_endpoint=AZURE_ENDPOINT,
-        api_version=AZURE_API_VERSION,
-    )
-
 # ==============================
 # STATE
 # ==============================
@@ -45,59 +29,88 @@ class SRState(TypedDict, total=False):
 # ==============================
 import uuid
 
-def save_sr_cards(user_id: str, cards: List[Dict]):
+# Límite de Firestore por WriteBatch; cada tarjeta son 3 escrituras
+FIRESTORE_BATCH_LIMIT = 500
+WRITES_PER_CARD = 3
+
+@metrics.node
+def save_sr_cards(user_id: str, cards: List[Dict]) -> List[str]:
+    """
+    Guarda las tarjetas y sus asignaciones en WriteBatch: un commit (un viaje)
+    por cada FIRESTORE_BATCH_LIMIT escrituras. Hasta 166 tarjetas todo queda
+    en un solo commit, que se aplica completo o no se aplica.
+    """
     col = db.collection("ejercicios_SR")
-
-    for card in cards:
-        # 🔹 Generar ID único tipo VNEST (ej. E4A2B7)
-        doc_id = f"E{uuid.uuid4().hex[:6].upper()}"
-
-        # 🔹 Datos del ejercicio SR
-        sr_data = {
-            "id_ejercicio_general": doc_id,
-            "pregunta": card.get("stimulus", ""),
-            "rta_correcta": card.get("answer", ""),
-            "interval_index": 0,
-            "intervals_sec" : [15, 30, 60, 120, 300],
-            "success_streak": 0,
-            "lapses": 0,
-            "next_due": 0,
-            "status": "learning",
-        }
-
-        # 🔹 Guardar en la colección de ejercicios generales
-        db.collection("ejercicios").document(doc_id).set({
-            "id": doc_id,
-            "terapia": "SR",
-            "revisado": False,
-            "tipo": "privado",
-            "creado_por": "IA",
-            "personalizado": True,
-            "referencia_base": None,
-            "id_paciente": user_id,
-            "descripcion_adaptado": "",
-            "fecha_creacion": firestore.SERVER_TIMESTAMP,
-        })
-
-        # 🔹 Guardar el ejercicio SR específico
-        col.document(doc_id).set(sr_data)
-
-        # 🔹 Registrar el ejercicio en el paciente
-        asignar_a_paciente(user_id, doc_id)
-
-def asignar_a_paciente(user_id: str, ejercicio_id: str):
-    asignados_ref = (
+    cards_per_batch = FIRESTORE_BATCH_LIMIT // WRITES_PER_CARD
+    doc_ids = []
+
+    for start in range(0, len(cards), cards_per_batch):
+        batch = db.batch()
+        for card in cards[start:start + cards_per_batch]:
+            # 🔹 Generar ID único tipo VNEST (ej. E4A2B7)
+            doc_id = f"E{uuid.uuid4().hex[:6].upper()}"
+
+            # 🔹 Datos del ejercicio SR
+            sr_data = {
+                "id_ejercicio_general": doc_id,
+                "pregunta": card.get("stimulus", ""),
+                "rta_correcta": card.get("answer", ""),
+                "interval_index": 0,
+                "intervals_sec" : [15, 30, 60, 120, 300],
+                "success_streak": 0,
+                "lapses": 0,
+                "next_due": 0,
+                "status": "learning",
+            }
+
+            # 🔹 Guardar en la colección de ejercicios generales
+            batch.set(db.collection("ejercicios").document(doc_id), {
+                "id": doc_id,
+                "terapia": "SR",
+                "revisado": False,
+                "tipo": "privado",
+                "creado_por": "IA",
+                "personalizado": True,
+                "referencia_base": None,
+                "id_paciente": user_id,
+                "descripcion_adaptado": "",
+                "fecha_creacion": firestore.SERVER_TIMESTAMP,
+            })
+
+            # 🔹 Guardar el ejercicio SR específico
+            batch.set(col.document(doc_id), sr_data)
+
+            # 🔹 Registrar el ejercicio en el paciente
+            asignar_a_paciente(user_id, doc_id, batch)
+            doc_ids.append(doc_id)
+        batch.commit()
+
+    return doc_ids
+
+def asignar_a_paciente(user_id: str, ejercicio_id: str, batch=None):
+    """Registra la asignación; con `batch` la agrega al lote en lugar de escribirla ya."""
+    asignado_ref = (
         db.collection("pacientes")
         .document(user_id)
         .collection("ejercicios_asignados")
+        .document(ejercicio_id)
     )
 
-    asignados_ref.document(ejercicio_id).set({
+    # verbo/nivel/personalizado van copiados en la asignación (igual que en
+    # assign_logic) para filtrar sin leer el ejercicio; SR no tiene verbo ni nivel
+    data = {
         "id_ejercicio": ejercicio_id,
         "tipo": "privado",
+        "verbo": None,
+        "nivel": None,
+        "personalizado": True,
         "estado": "pendiente",
         "fecha_asignacion": firestore.SERVER_TIMESTAMP,
-    })
+    }
+    if batch is not None:
+        batch.set(asignado_ref, data)
+    else:
+        asignado_ref.set(data)
 
 
 # ==============================
@@ -113,33 +126,28 @@ def parse_json(raw: str):
             s = s[start:end+1]
     return json.loads(s)
 
-def run_prompt(prompt: str) -> Dict:
-    client = get_client()
-    resp = client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": "Eres experto en terapia del lenguaje y Spaced Retrieval."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.3,
-        max_tokens=1000,
-        response_format={"type": "json_object"},
+SYSTEM_PROMPT = "Eres experto en terapia del lenguaje y Spaced Retrieval."
+
+@metrics.node
+async def run_prompt(prompt: str) -> Dict:
+    return await llm_client.run_prompt(
+        prompt, SYSTEM_PROMPT, temperature=0.3, max_tokens=1000, parser=parse_json
     )
-    content = resp.choices[0].message.content
-    return parse_json(content)
 
 # ==============================
 # MAIN
 # ==============================
-def main_langraph_sr(user_id: str, patient_profile: dict):
+@metrics.pipeline("sr")
+async def main_langraph_sr(user_id: str, patient_profile: dict):
     prompt = generate_sr_prompt(patient_profile)
-    out = run_prompt(prompt)
+    out = await run_prompt(prompt)
 
     cards = out.get("cards", [])
     if not cards:
         raise ValueError("El modelo no devolvió tarjetas SR")
 
-    save_sr_cards(user_id, cards)
+    # Firestore es síncrono: se ejecuta en un hilo para no bloquear el event loop
+    await asyncio.to_thread(save_sr_cards, user_id, cards)
 
     # Devuelvo igual que antes para no romper nada aguas arriba
     return {"user_id": user_id, "cards": cards}
@@ -167,7 +175,7 @@ if __name__ == "__main__":
         "rutinas": {"comida_favorita": "Ajiaco", "actividad_favorita": "Caminar"},
         "objetos": {"mascota": {"nombre": "Rocky"}},
     }
-    res = main_langraph_sr("paciente123", profile)
+    res = asyncio.run(main_langraph_sr("paciente123", profile))
     print(json.dumps(res, indent=2, ensure_ascii=False))
     graph_path = export_graph_mermaid_manual()
     print(f"Mermaid graph exported to: {graph_path}")
@@ -1,13 +1,37 @@
-import os, json
-from dotenv import load_dotenv
-from typing import Dict, List, Optional
+import os, json, asyncio, operator
+from typing import Annotated, Callable, Dict, List, Optional
 from typing_extensions import TypedDict
 import firebase_admin
 from firebase_admin import credentials, firestore
 
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph
+from langgraph.types import RetryPolicy, Send
 from langchain_core.tools import tool
-from openai import AzureOpenAI
+import openai
+from google.api_core import exceptions as gcp_exceptions
+import checkpoints
+import json_stream
+import llm_cache
+import llm_client
+import llm_usage
+import metrics
+import verb_classifier
+from vnest_validation import (
+    N_ORACIONES,
+    STREAM_CLASSIFICATION,
+    STREAM_PAIR,
+    STREAM_SENTENCES,
+    STREAM_VERBS,
+    InvalidOutputError,
+    check_classification,
+    check_pair,
+    check_sentences,
+    check_svo,
+    check_verbs,
+    stream_svo,
+    validate_final,
+)
 
 import uuid
 
@@ -20,21 +44,20 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# ==============================
-# AZURE CONFIG
-# ==============================
-load_dotenv("env.env")
-AZURE_ENDPOINT = "https://invuniandesai-2.openai.azure.com/"
-AZURE_DEPLOYMENT = "gpt-4.1"     # tu deployment
-AZURE_API_KEY = os.getenv("AZURE_API_KEY")
-AZURE_API_VERSION = "2024-12-01-preview"
-
-def get_client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=AZURE_API_KEY,
-        azure_endpoint=AZURE_ENDPOINT,
-        api_version=AZURE_API_VERSION,
-    )
+# Estos módulos crean su cliente de Firestore al importarse: van después de initialize_app
+import context_lexicon
+import exercise_store
+from assign_logic import selection_fields
+
+# "local" clasifica los verbos con verb_classifier; "llm" usa el prompt verb_by_difficulty
+VERB_CLASSIFIER = os.getenv("VNEST_VERB_CLASSIFIER", "local")
+
+# Reintentos por nodo: solo se repite el nodo que falló, con espera exponencial
+VNEST_NODE_MAX_ATTEMPTS = int(os.getenv("VNEST_NODE_MAX_ATTEMPTS", "3"))
+VNEST_NODE_RETRY_INITIAL_S = float(os.getenv("VNEST_NODE_RETRY_INITIAL_S", "1.0"))
+
+# Llamadas de reparación (solo la parte inválida) antes de regenerar el nodo completo
+VNEST_REPAIR_ATTEMPTS = int(os.getenv("VNEST_REPAIR_ATTEMPTS", "1"))
 
 # ==============================
 # STATE
@@ -48,9 +71,13 @@ class ExerciseState(TypedDict, total=False):
     verbos_clasificados: Dict[str, List[str]]
     verbo_seleccionado: str
     oraciones_svo: List[Dict[str, str]]
+    pares_expandidos: Annotated[List[Dict], operator.add]  # fan-out de step4, uno por par
+    verbo: str
     pares: List[Dict]
     oraciones: List[Dict]
     doc_id: Optional[str]
+    diferir_guardado: bool  # modo lote: step5 no escribe, deja los docs en docs_pendientes
+    docs_pendientes: Dict[str, Dict]
 # ==============================
 # HELPERS FIRESTORE
 # ==============================
@@ -69,11 +96,14 @@ def _normalize_for_front(doc_id: str, data: dict) -> dict:
 # PROMPTS (importados)
 # ==============================
 from prompts_vnest import (
+    system_prompt,
     generate_verb_prompt,
     verb_by_difficulty,
     pair_subject_object,
-    sentence_expansion,
-    generate_prompt,
+    pair_expansion,
+    verb_sentences,
+    repair_pair_expansion,
+    repair_sentences,
 )
 
 # ==============================
@@ -113,99 +143,230 @@ def parse_json(raw: str):
         raise e
 
 
-def run_prompt(prompt: str) -> Dict:
-    client = get_client()
+def _log_and_parse(content: str):
+    print("📥 Respuesta cruda:\n", content)
+    print("="*60 + "\n")
+    return parse_json(content)
+
+def _forward_partial(path: tuple, value, intento: int):
+    """Reenvía cada campo que termina de llegar del LLM al stream "custom" del grafo (evento SSE "parcial")."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return  # fuera de una ejecución del grafo
+    writer({"nodo": metrics.current_node.get(), "campo": ".".join(path), "valor": value, "intento": intento})
+
+
+async def run_prompt(
+    prompt: str,
+    check: Optional[Callable[[dict], dict]] = None,
+    schema: Optional[json_stream.StreamSchema] = None,
+) -> Dict:
+    """
+    `check` (de vnest_validation) valida la salida al parsearla: si lanza
+    InvalidOutputError la respuesta no se guarda en llm_cache.
+    `schema` activa el streaming: la respuesta se corta y se pide de nuevo apenas
+    deja de cumplirlo, y sus campos se reenvían a medida que llegan.
+    """
     print("\n" + "="*60)
 
     print("Prompt enviado:\n", prompt[:1000], "...")  # imprimimos máx 1000 chars
     print("="*60)
 
-    resp = client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": "Eres experto en terapias del lenguaje y generación de ejercicios VNeST."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.4,
-        max_tokens=2100,
-        response_format={"type": "json_object"},
+    parser = _log_and_parse if check is None else (lambda content: check(_log_and_parse(content)))
+    return await llm_client.run_prompt(
+        prompt, system_prompt(prompt), temperature=0.4, max_tokens=2100, parser=parser,
+        schema=schema, on_value=_forward_partial if schema is not None else None,
     )
 
-    content = resp.choices[0].message.content
-    print("📥 Respuesta cruda:\n", content)
-    print("="*60 + "\n")
-
-    return parse_json(content)
 
-
-def _validate_final(out5: dict):
-    if "verbo" not in out5 or not out5["verbo"]:
-        raise ValueError("Falta 'verbo'")
-    if "pares" not in out5 or not isinstance(out5["pares"], list):
-        raise ValueError("Faltan pares")
-    if "oraciones" not in out5 or len(out5["oraciones"]) != 10:
-        raise ValueError("Debe haber 10 oraciones")
+async def run_validated(
+    prompt: str,
+    check: Callable[[dict], dict],
+    schema: Optional[json_stream.StreamSchema] = None,
+    repair: Optional[Callable] = None,
+) -> Dict:
+    """
+    run_prompt con validación y reparación parcial (la reparación usa el mismo `schema`).
+    Si la salida no cumple, repair(error) devuelve (prompt mínimo, check que une lo
+    ya válido con lo nuevo) y se pide solo lo que falta, hasta VNEST_REPAIR_ATTEMPTS
+    veces. Si sigue inválida el error sube y la RetryPolicy regenera el nodo.
+    """
+    try:
+        return await run_prompt(prompt, check, schema)
+    except InvalidOutputError as e:
+        error = e
+    for _ in range(VNEST_REPAIR_ATTEMPTS if repair else 0):
+        print(f"🔧 Salida inválida ({error}); se pide solo lo que falta")
+        repair_prompt, repair_check = repair(error)
+        try:
+            out = await run_prompt(repair_prompt, repair_check, schema)
+            metrics.count_repair("ok")
+            return out
+        except InvalidOutputError as e:
+            metrics.count_repair("error")
+            error = e
+    raise error
+
+
+def _pair_repair(verbo: str, par: dict):
+    """Reparación de step4_expand_pair: regenera solo los bloques de expansión inválidos."""
+    def repair(error: InvalidOutputError):
+        def merge(out: dict) -> dict:
+            nuevos = out.get("expansiones") if isinstance(out.get("expansiones"), dict) else {}
+            expansiones = {**error.salida["expansiones"], **{k: nuevos.get(k) for k in error.errores}}
+            return check_pair({"expansiones": expansiones}, par["sujeto"], par["objeto"])
+        return repair_pair_expansion(verbo, par, error.errores), merge
+    return repair
+
+
+def _sentences_repair(verbo: str):
+    """Reparación de step4_generate_sentences: pide solo las oraciones que faltan para llegar a 10."""
+    def repair(error: InvalidOutputError):
+        existentes = error.salida["oraciones"]
+        def merge(out: dict) -> dict:
+            nuevas = out.get("oraciones") if isinstance(out.get("oraciones"), list) else []
+            return check_sentences({"oraciones": existentes + nuevas})
+        faltantes = N_ORACIONES - len(existentes)
+        return repair_sentences(verbo, [o["oracion"] for o in existentes], faltantes), merge
+    return repair
 
 # ==============================
 # NODOS
 # ==============================
-def step1_generate_verbs(state: ExerciseState) -> ExerciseState:
+@metrics.node
+def step0_load_lexicon(state: ExerciseState) -> ExerciseState:
+    """Carga verbos ya generados y clasificados para el contexto, si existen."""
+    lexicon = context_lexicon.get_lexicon(state["contexto"])
+    if not lexicon:
+        return {}
+    print(f"♻️ Léxico reutilizado para el contexto '{state['contexto']}'")
+    return {
+        "verbos": lexicon["verbos"],
+        "verbos_clasificados": lexicon["verbos_clasificados"],
+    }
+
+def route_after_lexicon(state: ExerciseState) -> str:
+    """Con léxico conocido se salta directo a la selección de pares."""
+    if state.get("verbos_clasificados"):
+        return "step3_select_pairs"
+    return "step1_generate_verbs"
+
+@metrics.node
+async def step1_generate_verbs(state: ExerciseState) -> ExerciseState:
     """Genera 7 verbos transitivos a partir del contexto proporcionado."""
-    out1 = run_prompt(generate_verb_prompt(state["contexto"]))
+    out1 = await run_validated(generate_verb_prompt(state["contexto"]), check_verbs, STREAM_VERBS)
     state["verbos"] = out1["verbos"]
     return state
 
-def step2_classify_verbs(state: ExerciseState) -> ExerciseState:
-    """Clasifica los verbos generados en fácil, medio y difícil."""
-    out2 = run_prompt(verb_by_difficulty(state["contexto"], state["verbos"]))
-    state["verbos_clasificados"] = out2["verbos_clasificados"]
+@metrics.node
+async def step2_classify_verbs(state: ExerciseState) -> ExerciseState:
+    """Clasifica los verbos generados en fácil, medio y difícil (localmente o con el LLM)."""
+    if VERB_CLASSIFIER == "llm":
+        out2 = await run_validated(
+            verb_by_difficulty(state["contexto"], state["verbos"]), check_classification, STREAM_CLASSIFICATION
+        )
+        state["verbos_clasificados"] = out2["verbos_clasificados"]
+    else:
+        state["verbos_clasificados"] = verb_classifier.classify_verbs(state["verbos"])
+    await asyncio.to_thread(
+        context_lexicon.save_lexicon,
+        state["contexto"],
+        state["verbos"],
+        state["verbos_clasificados"],
+        VERB_CLASSIFIER,
+    )
     return state
 
-def step3_select_pairs(state: ExerciseState) -> ExerciseState:
-    """Selecciona un verbo del nivel indicado y genera 3 oraciones SVO disyuntivas."""
-    out3 = run_prompt(
-        pair_subject_object(
-            state["contexto"],
-            state["verbos_clasificados"],
-            nivel=state["nivel"],
-            n_oraciones=3,
+@metrics.node
+async def step3_select_pairs(state: ExerciseState) -> ExerciseState:
+    """Selecciona un verbo aún no usado del nivel indicado y genera 3 oraciones SVO disyuntivas."""
+    # Releído: otro proceso pudo usar verbos desde que se llenó el espejo
+    lexicon = await asyncio.to_thread(context_lexicon.get_lexicon, state["contexto"], True) or {
+        "verbos_clasificados": state["verbos_clasificados"]
+    }
+    # Nivel agotado: el prompt se repetiría y llm_cache devolvería el mismo ejercicio
+    fresh = llm_cache.force_fresh.set(True) if context_lexicon.level_exhausted(lexicon, state["nivel"]) else None
+    try:
+        out3 = await run_validated(
+            pair_subject_object(
+                state["contexto"],
+                context_lexicon.available_verbs(lexicon, state["nivel"]),
+                nivel=state["nivel"],
+                n_oraciones=3,
+            ),
+            lambda out: check_svo(out, 3),
+            stream_svo(3),
         )
-    )
+    finally:
+        if fresh is not None:
+            llm_cache.force_fresh.reset(fresh)
     state["verbo_seleccionado"] = out3["verbo_seleccionado"]
     state["oraciones_svo"] = out3["oraciones"]
+    await asyncio.to_thread(
+        context_lexicon.mark_verb_used, state["contexto"], state["verbo_seleccionado"]
+    )
     return state
 
-def step4_expand_sentences(state: ExerciseState) -> ExerciseState:
-    """Genera expansiones y 10 oraciones; fija 'verbo' en el state pase lo que pase."""
-    out4 = run_prompt(sentence_expansion(state["verbo_seleccionado"], state["oraciones_svo"]))
-    final_prompt = generate_prompt(out4)
-    out5 = run_prompt(final_prompt)
-
-    # Aunque falle la validación, no queremos romper la cadena
-    try:
-        _validate_final(out5)
-    except Exception as e:
-        print("_validate_final falló:", e)
-
-    # Verbo final robusto
-    verbo_final = (out5.get("verbo") or state.get("verbo_seleccionado") or "").strip()
+def fan_out_step4(state: ExerciseState) -> List[Send]:
+    """Una llamada concurrente por par SVO más una independiente para las 10 oraciones."""
+    verbo = state["verbo_seleccionado"]
+    sends = [
+        Send("step4_expand_pair", {"verbo_seleccionado": verbo, "indice": i, "par": par})
+        for i, par in enumerate(state["oraciones_svo"])
+    ]
+    sends.append(Send("step4_generate_sentences", {"verbo_seleccionado": verbo}))
+    return sends
+
+@metrics.node
+async def step4_expand_pair(task: dict) -> ExerciseState:
+    """Genera las expansiones (dónde/cuándo/por qué) de un solo par; si alguna no cumple, repara solo esa."""
+    verbo, par = task["verbo_seleccionado"], task["par"]
+    out = await run_validated(
+        pair_expansion(verbo, par),
+        lambda out: check_pair(out, par["sujeto"], par["objeto"]),
+        STREAM_PAIR,
+        _pair_repair(verbo, par),
+    )
+    return {"pares_expandidos": [{**out, "indice": task["indice"]}]}
+
+@metrics.node
+async def step4_generate_sentences(task: dict) -> ExerciseState:
+    """Genera las 10 oraciones del ejercicio; solo necesita el verbo. Si faltan, pide solo esas."""
+    verbo = task["verbo_seleccionado"]
+    out = await run_validated(
+        verb_sentences(verbo), check_sentences, STREAM_SENTENCES, _sentences_repair(verbo)
+    )
+    return {"oraciones": out["oraciones"]}
+
+@metrics.node
+def step4_merge(state: ExerciseState) -> ExerciseState:
+    """Reduce: junta los pares en el orden de step3 y fija 'verbo' pase lo que pase."""
+    pares = [
+        {k: v for k, v in p.items() if k != "indice"}
+        for p in sorted(state.get("pares_expandidos", []), key=lambda p: p["indice"])
+    ]
+    verbo_final = (state.get("verbo_seleccionado") or "").strip()
     if not verbo_final:
         raise ValueError("No se pudo determinar 'verbo' en step4.")
 
-    # Devuelve solo el delta con 'verbo'
-    return {
-        "verbo": verbo_final,
-        "pares": out5.get("pares", []),
-        "oraciones": out5.get("oraciones", []),
-    }
+    out5 = {"verbo": verbo_final, "pares": pares, "oraciones": state.get("oraciones", [])}
+
+    # Cada nodo ya validó (y reparó) su parte: esto solo detecta piezas perdidas.
+    # Un ejercicio incompleto no se guarda; la ejecución queda en su checkpoint.
+    validate_final(out5, len(state.get("oraciones_svo", [])))
+    return out5
 
 
+@metrics.node
 def step5_save_db(state: ExerciseState) -> ExerciseState:
     """
     Guarda directamente el nuevo ejercicio generado por el terapeuta.
+    Es síncrono a propósito: LangGraph lo ejecuta en un hilo dentro de ainvoke.
     Crea documentos en:
       - 'ejercicios' (información general)
       - 'ejercicios_VNEST' (contenido extendido)
+    Con 'diferir_guardado' no escribe: devuelve los documentos para un commit agrupado.
     """
 
     verbo_final = (state.get("verbo") or state.get("verbo_seleccionado") or "").strip()
@@ -233,9 +394,7 @@ def step5_save_db(state: ExerciseState) -> ExerciseState:
         "referencia_base": None,
         "id_paciente": None,
         "descripcion_adaptado": "",
-        "fecha_creacion": firestore.SERVER_TIMESTAMP,
     }
-    db.collection("ejercicios").document(doc_id).set(general_doc)
 
     # 2️⃣ Guardar contenido extendido (ejercicios_VNEST)
     vnest_doc = {
@@ -244,13 +403,11 @@ def step5_save_db(state: ExerciseState) -> ExerciseState:
         "contexto": contexto,
         "verbo": verbo_final,
         "oraciones": oraciones,
-        "pares": pares
+        "pares": pares,
+        **selection_fields(visibilidad, False),
     }
-    db.collection("ejercicios_VNEST").document(doc_id).set(vnest_doc)
 
-    print(f"✅ Nuevo ejercicio VNeST guardado correctamente: {doc_id}")
-
-    return {
+    delta = {
         "doc_id": doc_id,
         "verbo": verbo_final,
         "nivel": nivel,
@@ -260,6 +417,31 @@ def step5_save_db(state: ExerciseState) -> ExerciseState:
         "oraciones": oraciones,
     }
 
+    if state.get("diferir_guardado"):
+        delta["docs_pendientes"] = {"ejercicios": general_doc, "ejercicios_VNEST": vnest_doc}
+        return delta
+
+    save_pending_docs({"ejercicios": general_doc, "ejercicios_VNEST": vnest_doc})
+
+    print(f"✅ Nuevo ejercicio VNeST guardado correctamente: {doc_id}")
+    return delta
+
+
+def save_pending_docs(*pending: Dict[str, Dict]):
+    """
+    Escribe los documentos armados por step5 de uno o varios ejercicios (lotes) en
+    un solo commit. fecha_creacion se agrega aquí y no en step5 porque
+    SERVER_TIMESTAMP no se puede serializar en los checkpoints.
+    """
+    exercise_store.save_exercises([
+        (
+            {**docs["ejercicios"], "fecha_creacion": firestore.SERVER_TIMESTAMP},
+            "ejercicios_VNEST",
+            docs["ejercicios_VNEST"],
+        )
+        for docs in pending
+    ])
+
 # ==============================
 # GRAFO
 # ==============================
@@ -270,11 +452,16 @@ def export_graph_mermaid_manual(out_path: str = "langgraph_vnest.mmd") -> str:
     """
     mermaid = [
         "flowchart TD",
-        "  START([Start]) --> step1_generate_verbs[step1_generate_verbs: genera 7 verbos]",
-        "  step1_generate_verbs --> step2_classify_verbs[step2_classify_verbs: clasifica verbos]",
+        "  START([Start]) --> step0_load_lexicon[step0_load_lexicon: léxico guardado del contexto]",
+        "  step0_load_lexicon -->|contexto nuevo| step1_generate_verbs[step1_generate_verbs: genera 7 verbos]",
+        "  step0_load_lexicon -->|contexto conocido| step3_select_pairs",
+        "  step1_generate_verbs --> step2_classify_verbs[step2_classify_verbs: clasifica verbos local o LLM y guarda léxico]",
         "  step2_classify_verbs --> step3_select_pairs[step3_select_pairs: selecciona verbo y 3 SVO]",
-        "  step3_select_pairs --> step4_expand_sentences[step4_expand_sentences: expansiones + 10 oraciones]",
-        "  step4_expand_sentences --> step5_save_db[step5_save_db: lee/guarda en Firestore]",
+        "  step3_select_pairs -->|un Send por par| step4_expand_pair[step4_expand_pair: expansiones de un par]",
+        "  step3_select_pairs -->|Send| step4_generate_sentences[step4_generate_sentences: 10 oraciones del verbo]",
+        "  step4_expand_pair --> step4_merge[step4_merge: une pares y oraciones]",
+        "  step4_generate_sentences --> step4_merge",
+        "  step4_merge --> step5_save_db[step5_save_db: lee/guarda en Firestore]",
         "  step5_save_db --> END([Finish])",
     ]
     os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
@@ -283,33 +470,99 @@ def export_graph_mermaid_manual(out_path: str = "langgraph_vnest.mmd") -> str:
     return os.path.abspath(out_path)
 
 
-def build_graph():
-    graph = StateGraph(ExerciseState)
+def is_transient_error(exc: Exception) -> bool:
+    """
+    Fallas que vale la pena reintentar: JSON inválido o fuera de esquema (ya sin
+    reparación posible), red/429/5xx de Azure y Firestore.
+    """
+    return isinstance(exc, (
+        json.JSONDecodeError,
+        json_stream.StreamAbort,
+        InvalidOutputError,
+        openai.APIConnectionError,  # incluye APITimeoutError
+        openai.RateLimitError,
+        openai.InternalServerError,
+        gcp_exceptions.ServiceUnavailable,
+        gcp_exceptions.DeadlineExceeded,
+        gcp_exceptions.Aborted,
+        gcp_exceptions.InternalServerError,
+        gcp_exceptions.TooManyRequests,
+    ))
+
+
+NODE_RETRY = RetryPolicy(
+    max_attempts=VNEST_NODE_MAX_ATTEMPTS,
+    initial_interval=VNEST_NODE_RETRY_INITIAL_S,
+    backoff_factor=2.0,
+    retry_on=is_transient_error,
+)
 
-    graph.add_node("step1_generate_verbs", step1_generate_verbs)
-    graph.add_node("step2_classify_verbs", step2_classify_verbs)
-    graph.add_node("step3_select_pairs", step3_select_pairs)
-    graph.add_node("step4_expand_sentences", step4_expand_sentences)
-    graph.add_node("step5_save_db", step5_save_db)
 
+def build_graph(checkpointer=None):
+    graph = StateGraph(ExerciseState)
+
+    for name, fn in (
+        ("step0_load_lexicon", step0_load_lexicon),
+        ("step1_generate_verbs", step1_generate_verbs),
+        ("step2_classify_verbs", step2_classify_verbs),
+        ("step3_select_pairs", step3_select_pairs),
+        ("step4_expand_pair", step4_expand_pair),
+        ("step4_generate_sentences", step4_generate_sentences),
+        ("step4_merge", step4_merge),
+        ("step5_save_db", step5_save_db),
+    ):
+        graph.add_node(name, fn, retry_policy=NODE_RETRY)
+
+    graph.add_conditional_edges(
+        "step0_load_lexicon",
+        route_after_lexicon,
+        ["step1_generate_verbs", "step3_select_pairs"],
+    )
     graph.add_edge("step1_generate_verbs", "step2_classify_verbs")
     graph.add_edge("step2_classify_verbs", "step3_select_pairs")
-    graph.add_edge("step3_select_pairs", "step4_expand_sentences")
-    graph.add_edge("step4_expand_sentences", "step5_save_db")
+    graph.add_conditional_edges(
+        "step3_select_pairs",
+        fan_out_step4,
+        ["step4_expand_pair", "step4_generate_sentences"],
+    )
+    graph.add_edge("step4_expand_pair", "step4_merge")
+    graph.add_edge("step4_generate_sentences", "step4_merge")
+    graph.add_edge("step4_merge", "step5_save_db")
 
-    graph.set_entry_point("step1_generate_verbs")
+    graph.set_entry_point("step0_load_lexicon")
     graph.set_finish_point("step5_save_db")
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+_workflow = None
+_workflow_saver = None
+
+def get_workflow():
+    """
+    Grafo compilado una sola vez y reutilizado en todas las peticiones.
+    Se recompila solo si cambia el checkpointer (p. ej. tras checkpoints.aclose()).
+    """
+    global _workflow, _workflow_saver
+    saver = checkpoints.get_saver()
+    if _workflow is None or _workflow_saver is not saver:
+        _workflow = build_graph(saver)
+        _workflow_saver = saver
+    return _workflow
+
+
+def run_config(run_id: str) -> dict:
+    """Config propia de cada invocación para que las ejecuciones concurrentes no compartan nada."""
+    return {
+        "run_name": "vnest",
+        "configurable": {"thread_id": run_id},
+        "metadata": {"run_id": run_id},
+    }
 
 # ==============================
 # MAIN
 # ==============================
-def main_langraph_vnest(contexto: str, nivel: str, creado_por: str, tipo: str) -> dict:
-    workflow = build_graph()
-    initial_state = {"contexto": contexto, "nivel": nivel, "creado_por": creado_por, "tipo": tipo}
-    final_state = workflow.invoke(initial_state)
-
+def _to_response(final_state: dict) -> dict:
     return {
         "id": final_state.get("doc_id", "fake_id"),
         "verbo": final_state.get("verbo") or final_state.get("verbo_seleccionado"),
@@ -321,10 +574,86 @@ def main_langraph_vnest(contexto: str, nivel: str, creado_por: str, tipo: str) -
     }
 
 
+@metrics.pipeline("vnest")
+async def main_langraph_vnest(
+    contexto: str, nivel: str, creado_por: str, tipo: str, run_id: Optional[str] = None
+) -> dict:
+    """run_id identifica la ejecución en los checkpoints; si falla, se reanuda con resume_langraph_vnest."""
+    run_id = run_id or uuid.uuid4().hex
+    llm_usage.run_id.set(run_id)
+    workflow = get_workflow()
+    initial_state = {"contexto": contexto, "nivel": nivel, "creado_por": creado_por, "tipo": tipo}
+    final_state = await workflow.ainvoke(initial_state, config=run_config(run_id))
+    await checkpoints.forget(run_id)
+    return _to_response(final_state)
+
+
+@metrics.pipeline("vnest_resume")
+async def resume_langraph_vnest(run_id: str) -> Optional[dict]:
+    """
+    Continúa una ejecución interrumpida desde su último checkpoint.
+    Devuelve None si no hay checkpoints para run_id.
+    Las ejecuciones de un lote (diferir_guardado) se guardan aquí mismo.
+    """
+    llm_usage.run_id.set(run_id)
+    workflow = get_workflow()
+    config = run_config(run_id)
+    snapshot = await workflow.aget_state(config)
+    if not snapshot.values:
+        return None
+
+    # Sin nodos pendientes: el grafo terminó pero no se alcanzó a guardar el lote
+    final_state = await workflow.ainvoke(None, config=config) if snapshot.next else snapshot.values
+    if final_state.get("docs_pendientes"):
+        await asyncio.to_thread(save_pending_docs, final_state["docs_pendientes"])
+    await checkpoints.forget(run_id)
+    return _to_response(final_state)
+
+
+# Campos que se emiten al terminar cada nodo (el resto del state no aporta al front)
+STREAM_FIELDS = {
+    "step0_load_lexicon": ("verbos", "verbos_clasificados"),
+    "step1_generate_verbs": ("verbos",),
+    "step2_classify_verbs": ("verbos_clasificados",),
+    "step3_select_pairs": ("verbo_seleccionado", "oraciones_svo"),
+    "step4_expand_pair": ("pares_expandidos",),
+    "step4_generate_sentences": ("oraciones",),
+    "step4_merge": ("verbo", "pares", "oraciones"),
+    "step5_save_db": ("doc_id",),
+}
+
+async def stream_langraph_vnest(
+    contexto: str, nivel: str, creado_por: str, tipo: str, run_id: Optional[str] = None
+):
+    """
+    Igual que main_langraph_vnest, pero produce (evento, datos) a medida que termina cada nodo.
+    Mientras un nodo espera al LLM emite "parcial" con cada campo que ya llegó
+    ({nodo, campo, valor, intento}; si la respuesta se corta y se reintenta, los
+    campos vuelven a llegar con el intento siguiente).
+    El último evento es "resultado" con la misma respuesta que el endpoint síncrono.
+    """
+    run_id = run_id or uuid.uuid4().hex
+    llm_usage.run_id.set(run_id)
+    workflow = get_workflow()
+    state = {"contexto": contexto, "nivel": nivel, "creado_por": creado_por, "tipo": tipo}
+    with metrics.track_pipeline("vnest_stream"):
+        async for mode, chunk in workflow.astream(
+            state, config=run_config(run_id), stream_mode=["updates", "custom"]
+        ):
+            if mode == "custom":
+                yield "parcial", chunk
+                continue
+            for node, delta in chunk.items():
+                delta = delta or {}
+                state.update(delta)
+                fields = STREAM_FIELDS.get(node, ())
+                yield node, {k: delta[k] for k in fields if k in delta}
+    await checkpoints.forget(run_id)
+    yield "resultado", _to_response(state)
+
 if __name__ == "__main__":
-    build_graph()
     path = export_graph_mermaid_manual("graphs/langgraph_vnest.mmd")
     print("✅ Mermaid exportado en:", path)
 
-    resultado = main_langraph_vnest("Un hospital")
+    resultado = asyncio.run(main_langraph_vnest("Un hospital", "facil", "terapeuta_demo", "privado"))
     #print(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -1,11 +1,10 @@
-import os, json, uuid
-from dotenv import load_dotenv
-from typing import Dict, Any
+import json, uuid, asyncio
+from typing import Dict, Any, Optional
 import firebase_admin
 from firebase_admin import credentials, firestore
-from openai import AzureOpenAI
+import llm_client
+import metrics
 from prompts_personalization import generate_personalization_prompt
-from assign_logic import assign_exercise_to_patient
 
 # ==============================
 # FIREBASE CONFIG
@@ -16,25 +15,14 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# ==============================
-# AZURE CONFIG
-# ==============================
-load_dotenv("env.env")
-AZURE_ENDPOINT = "https://invuniandesai-2.openai.azure.com/"
-AZURE_DEPLOYMENT = "gpt-4.1"
-AZURE_API_KEY = os.getenv("AZURE_API_KEY")
-AZURE_API_VERSION = "2024-12-01-preview"
-
-def get_client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=AZURE_API_KEY,
-        azure_endpoint=AZURE_ENDPOINT,
-        api_version=AZURE_API_VERSION,
-    )
+# Crean su cliente de Firestore al importarse: van después de initialize_app
+import exercise_store
+from assign_logic import selection_fields
 
 # ==============================
 # FIRESTORE HELPERS
 # ==============================
+@metrics.node
 def get_exercise_base(exercise_id: str) -> Dict[str, Any]:
     """Obtiene un ejercicio base desde /ejercicios/{exercise_id} y su contenido extendido."""
 
@@ -64,8 +52,12 @@ def get_exercise_base(exercise_id: str) -> Dict[str, Any]:
 
     return {**base_data, **extra_data}
 
-def save_personalized_exercise(exercise_data: Dict[str, Any]) -> str:
-    """Guarda el ejercicio personalizado tanto en /ejercicios como en la subcolección específica."""
+@metrics.node
+def save_personalized_exercise(exercise_data: Dict[str, Any], patient_id: Optional[str] = None) -> str:
+    """
+    Guarda el ejercicio personalizado tanto en /ejercicios como en la subcolección específica.
+    Con `patient_id` lo asigna en el mismo commit (exercise_store).
+    """
 
     # --- 1️⃣ Crear ID único
     doc_id = f"E{uuid.uuid4().hex[:6].upper()}"
@@ -86,62 +78,58 @@ def save_personalized_exercise(exercise_data: Dict[str, Any]) -> str:
         "fecha_creacion": firestore.SERVER_TIMESTAMP,
     }
 
-    # --- 3️⃣ Guardar en la colección general
-    db.collection("ejercicios").document(doc_id).set(general_data)
-
-    # --- 4️⃣ Guardar en la colección específica
+    # --- 3️⃣ Datos de la colección específica
     terapia = exercise_data.get("terapia")
     if terapia == "VNEST":
-        vnest_data = {
+        specific_data = {
             "id_ejercicio_general": doc_id,
             "contexto": exercise_data.get("contexto"),
             "nivel": exercise_data.get("nivel"),
             "oraciones": exercise_data.get("oraciones", []),
             "pares": exercise_data.get("pares", []),
             "verbo": exercise_data.get("verbo", ""),
+            **selection_fields("privado", True),
         }
-        db.collection("ejercicios_VNEST").document(doc_id).set(vnest_data)
     elif terapia == "SR":
-        db.collection("ejercicios_SR").document(doc_id).set(exercise_data)
+        specific_data = exercise_data
     else:
         raise ValueError(f"Terapia desconocida: {terapia}")
 
+    # --- 4️⃣ General + específico (+ asignación) en un solo commit
+    exercise_store.save_exercise(general_data, f"ejercicios_{terapia}", specific_data, patient_id)
+
     print(f"✅ Ejercicio personalizado guardado: {doc_id}")
     return doc_id
 
 # ==============================
 # OPENAI RUNNER
 # ==============================
-def run_prompt(prompt: str) -> Dict[str, Any]:
-    client = get_client()
-    resp = client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": "Eres un terapeuta experto en lenguaje y afasia. Debes personalizar ejercicios de terapia."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.4,
-        max_tokens=3000,
-        response_format={"type": "json_object"},
-    )
-    content = resp.choices[0].message.content.strip()
+SYSTEM_PROMPT = "Eres un terapeuta experto en lenguaje y afasia. Debes personalizar ejercicios de terapia."
 
+def _log_and_parse(content: str) -> Dict[str, Any]:
     print("\n" + "=" * 80)
     print("🔍 RAW MODEL RESPONSE (Azure OpenAI):")
     print(content)
     print("=" * 80 + "\n")
-
     return json.loads(content)
 
+@metrics.node
+async def run_prompt(prompt: str) -> Dict[str, Any]:
+    return await llm_client.run_prompt(
+        prompt, SYSTEM_PROMPT, temperature=0.4, max_tokens=3000, parser=_log_and_parse
+    )
+
 # ==============================
 # MAIN PERSONALIZATION
 # ==============================
-def main_personalization(user_id: str, exercise_id: str, patient_profile: Dict[str, Any]):
+@metrics.pipeline("personalizacion")
+async def main_personalization(user_id: str, exercise_id: str, patient_profile: Dict[str, Any]):
     """Genera un ejercicio personalizado para un paciente (UID) y lo guarda en Firestore."""
 
-    base_exercise = get_exercise_base(exercise_id)
+    # Firestore es síncrono: se ejecuta en un hilo para no bloquear el event loop
+    base_exercise = await asyncio.to_thread(get_exercise_base, exercise_id)
     prompt = generate_personalization_prompt(base_exercise, patient_profile, user_id)
-    result = run_prompt(prompt)
+    result = await run_prompt(prompt)
 
     # --- Asegurar metadatos importantes ---
     result["id_paciente"] = user_id
@@ -150,11 +138,8 @@ def main_personalization(user_id: str, exercise_id: str, patient_profile: Dict[s
     result["personalizado"] = True
     result["contexto"] = base_exercise.get("contexto") or base_exercise.get("context_hint")
 
-    # --- Guardar en Firestore
-    new_id = save_personalized_exercise(result)
-
-    # --- Asignar el ejercicio al paciente
-    assign_exercise_to_patient(user_id, new_id)
+    # --- Guardar en Firestore y asignar al paciente (un solo commit)
+    new_id = await asyncio.to_thread(save_personalized_exercise, result, user_id)
 
     return {"ok": True, "saved_id": new_id, "personalized": result}
 
@@ -174,7 +159,7 @@ if __name__ == "__main__":
     print("Perfil cargado desde Firestore:")
     print(json.dumps(profile, indent=2, ensure_ascii=False))
 
-    res = main_personalization(patient_id, exercise_id, profile)
+    res = asyncio.run(main_personalization(patient_id, exercise_id, profile))
 
     print("\nResultado de la personalización:")
     print(json.dumps(res, indent=2, ensure_ascii=False))
@@ -1,10 +1,10 @@
 # main_profile_structure.py
-import os, json
-from dotenv import load_dotenv
+import os, json, asyncio
 from typing import Dict, Any
 import firebase_admin
 from firebase_admin import credentials, firestore
-from openai import AzureOpenAI
+import llm_client
+import metrics
 from prompts_profile_structure import generate_profile_structure_prompt
 
 # ==============================
@@ -16,39 +16,14 @@ if not firebase_admin._apps:
     firebase_admin.initialize_app(cred)
 db = firestore.client()
 
-# ==============================
-# AZURE CONFIG
-# ==============================
-load_dotenv("env.env")
-AZURE_ENDPOINT = "https://invuniandesai-2.openai.azure.com/"
-AZURE_DEPLOYMENT = "gpt-4.1"
-AZURE_API_KEY = os.getenv("AZURE_API_KEY")
-AZURE_API_VERSION = "2024-12-01-preview"
-
-def get_client() -> AzureOpenAI:
-    return AzureOpenAI(
-        api_key=AZURE_API_KEY,
-        azure_endpoint=AZURE_ENDPOINT,
-        api_version=AZURE_API_VERSION,
-    )
-
 # ==============================
 # OPENAI RUNNER
 # ==============================
-def run_prompt(prompt: str) -> Dict[str, Any]:
-    client = get_client()
-    resp = client.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": "Eres un asistente experto en estructurar perfiles clínicos de pacientes con afasia."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.2,
-        max_tokens=1500,
-        response_format={"type": "json_object"},
-    )
-    content = resp.choices[0].message.content.strip()
-    return json.loads(content)
+SYSTEM_PROMPT = "Eres un asistente experto en estructurar perfiles clínicos de pacientes con afasia."
+
+@metrics.node
+async def run_prompt(prompt: str) -> Dict[str, Any]:
+    return await llm_client.run_prompt(prompt, SYSTEM_PROMPT, temperature=0.2, max_tokens=1500)
 
 def export_graph_mermaid_manual(out_path: str = "graphs/langgraph_profile_structure.mmd") -> str:
     mermaid = [
@@ -66,14 +41,15 @@ def export_graph_mermaid_manual(out_path: str = "graphs/langgraph_profile_struct
 # ==============================
 # MAIN FUNCTION
 # ==============================
-def main_profile_structure(user_id: str, raw_text: str):
+@metrics.pipeline("perfil")
+async def main_profile_structure(user_id: str, raw_text: str):
     """
     Recibe texto no estructurado del paciente y devuelve un perfil organizado
     con secciones: personal, familia, rutinas y objetos.
     """
 
     prompt = generate_profile_structure_prompt(raw_text, user_id)
-    result = run_prompt(prompt)
+    result = await run_prompt(prompt)
 
     # # (Opcional) Guardar una copia estructurada del perfil
     # doc_ref = db.collection("perfiles_IA").document(user_id)
@@ -97,7 +73,7 @@ if __name__ == "__main__":
         "Algunos objetos importantes para mí son mi reloj antiguo y mis gafas de lectura."
     )
 
-    res = main_profile_structure(fake_user_id, fake_raw_text)
+    res = asyncio.run(main_profile_structure(fake_user_id, fake_raw_text))
 
     print("\nResultado del perfil estructurado:")
     print(json.dumps(res, indent=2, ensure_ascii=False))
@@ -0,0 +1,259 @@
+import os, time, inspect, functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import llm_usage
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+except ImportError:  # pip install prometheus_client
+    Histogram = None
+
+# ============================================================
+# Métricas Prometheus de los pipelines
+# ============================================================
+# - aphasia_pipeline_seconds{pipeline, outcome}: ejecución completa (vnest, vnest_stream, vnest_batch, sr, ...)
+# - aphasia_node_seconds{pipeline, node, outcome}: cada nodo de LangGraph y los pasos de SR/personalización/perfil
+# - aphasia_llm_seconds{pipeline, node, outcome}: cada run_prompt (outcome: ok | cache | error)
+# - aphasia_firestore_seconds{pipeline, node, op, outcome}: cada viaje a Firestore
+# - aphasia_llm_errors_total{pipeline, node, error}: fallas de run_prompt por tipo de excepción
+#   (error="StreamAbort": respuestas cortadas a mitad de streaming y reintentadas)
+# - aphasia_llm_tokens_total{pipeline, node, endpoint, creado_por, kind}: tokens prompt | completion | cached
+# - aphasia_llm_cached_ratio{pipeline, node}: fracción del prompt servida desde la caché de prefijos de Azure
+# - aphasia_llm_repairs_total{pipeline, node, outcome}: llamadas de reparación de salidas inválidas (ok | error)
+# - aphasia_single_flight_total{endpoint, outcome}: pedidos ejecutados, compartidos con uno en curso o idempotentes
+# El _count de cada histograma es el contador de ejecuciones por resultado.
+#
+# El pipeline y el nodo activos viajan en ContextVars (como llm_cache.force_fresh):
+# asyncio.to_thread y las tareas de LangGraph copian el contexto, así que
+# run_prompt y Firestore quedan etiquetados sin pasar parámetros.
+# Sin prometheus_client o con METRICS_ENABLED=0 solo se mantienen las ContextVars.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1" and Histogram is not None
+
+current_pipeline: ContextVar[str] = ContextVar("current_pipeline", default="-")
+current_node: ContextVar[str] = ContextVar("current_node", default="-")
+
+# De 5 ms (lecturas de Firestore) a ~1.5 min (pipeline VNeST completo)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+
+if METRICS_ENABLED:
+    PIPELINE_SECONDS = Histogram(
+        "aphasia_pipeline_seconds", "Duración de cada ejecución de un pipeline",
+        ["pipeline", "outcome"], buckets=SECONDS_BUCKETS,
+    )
+    NODE_SECONDS = Histogram(
+        "aphasia_node_seconds", "Duración de cada nodo o paso de un pipeline",
+        ["pipeline", "node", "outcome"], buckets=SECONDS_BUCKETS,
+    )
+    LLM_SECONDS = Histogram(
+        "aphasia_llm_seconds", "Duración de cada run_prompt (incluye aciertos de caché)",
+        ["pipeline", "node", "outcome"], buckets=SECONDS_BUCKETS,
+    )
+    FIRESTORE_SECONDS = Histogram(
+        "aphasia_firestore_seconds", "Duración de cada viaje a Firestore",
+        ["pipeline", "node", "op", "outcome"], buckets=SECONDS_BUCKETS,
+    )
+    LLM_ERRORS = Counter(
+        "aphasia_llm_errors_total", "Fallas de run_prompt por tipo de excepción",
+        ["pipeline", "node", "error"],
+    )
+    LLM_TOKENS = Counter(
+        "aphasia_llm_tokens_total", "Tokens consumidos en Azure OpenAI",
+        ["pipeline", "node", "endpoint", "creado_por", "kind"],
+    )
+    LLM_CACHED_RATIO = Histogram(
+        "aphasia_llm_cached_ratio", "cached_tokens / prompt_tokens de cada llamada a Azure",
+        ["pipeline", "node"], buckets=(0, 0.1, 0.25, 0.5, 0.6, 0.7, 0.8, 0.9, 0.95, 1),
+    )
+    LLM_REPAIRS = Counter(
+        "aphasia_llm_repairs_total", "Llamadas de reparación de salidas que no cumplieron el esquema",
+        ["pipeline", "node", "outcome"],
+    )
+    SINGLE_FLIGHT = Counter(
+        "aphasia_single_flight_total", "Pedidos de generación por resultado del single-flight",
+        ["endpoint", "outcome"],
+    )
+
+
+def _reset(var: ContextVar, token):
+    try:
+        var.reset(token)
+    except ValueError:
+        pass  # generador cerrado desde otro contexto (p. ej. el cliente cortó el stream)
+
+# ==============================
+# PIPELINES Y NODOS
+# ==============================
+@contextmanager
+def track_pipeline(name: str):
+    """Mide una ejecución completa, deja `name` como pipeline activo y registra su uso de tokens."""
+    token = current_pipeline.set(name)
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        with llm_usage.track_run(name):
+            yield
+        outcome = "ok"
+    finally:
+        if METRICS_ENABLED:
+            PIPELINE_SECONDS.labels(name, outcome).observe(time.perf_counter() - t0)
+        _reset(current_pipeline, token)
+
+
+def pipeline(name: str):
+    """Decorador para funciones async de entrada: equivale a envolver el cuerpo en track_pipeline(name)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with track_pipeline(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def _track_node(name: str):
+    token = current_node.set(name)
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        if METRICS_ENABLED:
+            NODE_SECONDS.labels(current_pipeline.get(), name, outcome).observe(time.perf_counter() - t0)
+        _reset(current_node, token)
+
+
+def node(fn):
+    """Decorador: mide la función como nodo del pipeline activo (etiqueta = nombre de la función)."""
+    name = fn.__name__
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with _track_node(name):
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _track_node(name):
+                return fn(*args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def track_llm():
+    """Mide un run_prompt. El bloque puede cambiar call["outcome"] (p. ej. a "cache")."""
+    call = {"outcome": "ok"}
+    t0 = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        call["outcome"] = "error"
+        count_llm_error(type(e).__name__)
+        raise
+    finally:
+        if METRICS_ENABLED:
+            LLM_SECONDS.labels(current_pipeline.get(), current_node.get(), call["outcome"]).observe(
+                time.perf_counter() - t0
+            )
+
+def count_llm_error(error: str):
+    """Una falla de run_prompt por tipo (también los intentos cortados en streaming, que se reintentan)."""
+    if METRICS_ENABLED:
+        LLM_ERRORS.labels(current_pipeline.get(), current_node.get(), error).inc()
+
+def count_tokens(tokens: dict):
+    """Suma los tokens de una respuesta (pipeline, nodo, endpoint y terapeuta activos) y su proporción cacheada."""
+    if not METRICS_ENABLED:
+        return
+    pipeline_name, node_name = current_pipeline.get(), current_node.get()
+    labels = (pipeline_name, node_name, llm_usage.endpoint.get(), llm_usage.creado_por.get())
+    for kind in ("prompt", "completion", "cached"):
+        if tokens[f"{kind}_tokens"]:
+            LLM_TOKENS.labels(*labels, kind).inc(tokens[f"{kind}_tokens"])
+    if tokens["prompt_tokens"]:
+        LLM_CACHED_RATIO.labels(pipeline_name, node_name).observe(tokens["cached_tokens"] / tokens["prompt_tokens"])
+
+
+def count_repair(outcome: str):
+    """Una llamada de reparación (ok: la salida quedó válida; error: sigue inválida)."""
+    if METRICS_ENABLED:
+        LLM_REPAIRS.labels(current_pipeline.get(), current_node.get(), outcome).inc()
+
+def count_single_flight(endpoint: str, outcome: str):
+    """ejecutada | compartida (se unió a una en curso) | idempotente (resultado guardado de su llave)."""
+    if METRICS_ENABLED:
+        SINGLE_FLIGHT.labels(endpoint, outcome).inc()
+
+# ==============================
+# FIRESTORE
+# ==============================
+_firestore_instrumented = False
+
+
+def _observe_firestore(op: str, outcome: str, t0: float, pipeline_name: str, node_name: str):
+    FIRESTORE_SECONDS.labels(pipeline_name, node_name, op, outcome).observe(time.perf_counter() - t0)
+
+
+def _timed_call(op: str, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        pipeline_name, node_name = current_pipeline.get(), current_node.get()
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            result = method(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            _observe_firestore(op, outcome, t0, pipeline_name, node_name)
+    return wrapper
+
+
+def _timed_stream(op: str, method):
+    """Para los métodos que devuelven generadores: mide hasta que se agotan (o se cierran)."""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        pipeline_name, node_name = current_pipeline.get(), current_node.get()
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            result = yield from method(*args, **kwargs)
+            outcome = "ok"
+            return result
+        except GeneratorExit:
+            outcome = "ok"  # el consumidor dejó de leer antes del final
+            raise
+        finally:
+            _observe_firestore(op, outcome, t0, pipeline_name, node_name)
+    return wrapper
+
+
+def instrument_firestore():
+    """Mide cada viaje del SDK de Firestore (idempotente). Se llama al arrancar la API y el worker."""
+    global _firestore_instrumented
+    if _firestore_instrumented or not METRICS_ENABLED:
+        return
+    _firestore_instrumented = True
+
+    from google.cloud.firestore_v1 import Client
+    from google.cloud.firestore_v1.batch import WriteBatch
+    from google.cloud.firestore_v1.document import DocumentReference
+    from google.cloud.firestore_v1.query import Query
+    from google.cloud.firestore_v1.transaction import Transaction
+
+    # set/update/delete de un documento pasan por WriteBatch.commit
+    DocumentReference.get = _timed_call("get", DocumentReference.get)
+    Client.get_all = _timed_stream("get_all", Client.get_all)
+    Query._make_stream = _timed_stream("query", Query._make_stream)
+    WriteBatch.commit = _timed_call("commit", WriteBatch.commit)
+    Transaction._commit = _timed_call("transaction_commit", Transaction._commit)
+
+# ==============================
+# EXPOSICIÓN
+# ==============================
+def render() -> tuple:
+    """(cuerpo, content-type) en formato de texto de Prometheus."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -2,32 +2,150 @@ import json
 from typing import List
 
 # ---------- Prompts ----------
+# Las reglas fijas de cada paso van en su propio system prompt (SYSTEM_PROMPTS,
+# elegido con system_prompt() por la marca "PROMPT N" del mensaje) y los
+# builders devuelven solo esa marca + los datos variables al final, así las
+# instrucciones fijas quedan como prefijo estable de cada paso. Ningún paso llega
+# a los 1024 tokens que Azure necesita para cachear un prefijo; si alguno los
+# pasa, empieza a cachearse sin cambios. Un solo bloque con las reglas de todos
+# los pasos (~1.4k tokens en cada llamada) costaba más que no cachear nada.
+
+INSTRUCCIONES_VERBOS = (
+    "PROMPT 1 (verbos del contexto):\n"
+    "Dado el CONTEXTO de los datos, genera una lista de exactamente 7 verbos transitivos que cumplan: "
+    "0) Deben ser verbos que puedan claramente usarse en el contexto dado; "
+    "1) Requieren complemento directo; 2) Son cotidianos y familiares; "
+    "3) No son genéricos (evita 'hacer', 'tener', 'llevar'); "
+    "4) Son diferentes entre sí; 5) En infinitivo; 6) Mezcla de dificultades. "
+    "Responde SOLO con JSON válido, sin texto adicional. "
+    'Formato: {"contexto":"string","verbos":["v1","v2","v3","v4","v5","v6","v7"]}'
+)
+
+INSTRUCCIONES_CLASIFICACION = (
+    "PROMPT 2 (clasificar verbos por dificultad):\n"
+    "Toma el JSON de ENTRADA y clasifica los verbos por dificultad. "
+    "Responde SOLO con JSON válido, sin texto adicional. "
+    "Reglas de clasificación: "
+    "Fácil = 1–2 sílabas, muy comunes y fáciles de pronunciar; "
+    "Medio = 2–3 sílabas y dificultad léxica intermedia; "
+    "Difícil = 3+ sílabas o mayor complejidad fonética/léxica. "
+    "Distribución equilibrada (p. ej., 2/3/2). "
+    'Salida (solo JSON): {"contexto":"string","verbos_clasificados":{"facil":[...],"medio":[...],"dificil":[...]}}'
+)
+
+INSTRUCCIONES_PARES = (
+    "PROMPT 3 (oraciones sujeto-verbo-objeto):\n"
+    "Toma un ÚNICO verbo del NIVEL SOLICITADO entre los VERBOS CLASIFICADOS y genera oraciones en español siguiendo estas reglas:\n"
+    "- Cantidad: exactamente la CANTIDAD DE ORACIONES indicada, oraciones simples (sujeto + verbo + objeto) usando SIEMPRE el MISMO verbo.\n"
+    "- Disyuntivas entre sí: cada sujeto debe vincularse a un objeto que no pueda usarse con otro sujeto de la lista; si intercambias sujeto u objeto entre oraciones y sigue teniendo sentido, la oración es inválida y debe reemplazarse.\n"
+    "- Especificidad máxima: las oraciones deben ser tan concretas y únicas que sea imposible intercambiar sujeto y objeto sin perder el sentido.\n"
+    "- Variedad: oraciones en contextos/temas distintos.\n"
+    "- Conjugación y gramática correctas (presente del indicativo por defecto). Sin pronombres ni nombres propios.\n"
+    "- Sujeto: rol/profesión/entidad típicamente **agente** del verbo elegido.\n"
+    "- Objeto: persona/objeto/documento típicamente **paciente** o **resultado** del verbo elegido.\n\n"
+    "Reglas de PROTOTIPICIDAD (obligatorias):\n"
+    "1) Compatibilidad verbo–sujeto: el SUJETO debe ser un agente habitual del verbo.\n"
+    "2) Compatibilidad verbo–objeto: el OBJETO debe ser una entidad canónica del verbo.\n"
+    "3) Evita combinaciones inter-dominio débiles o atípicas.\n"
+    "4) Cobertura de tipos de OBJETO en el conjunto: usa tres tipos distintos.\n"
+    "5) Prohibido usar sujetos u objetos genéricos ('persona', 'cosa', etc.).\n"
+    "6) Exactamente UNA oración debe estar directamente relacionada con el CONTEXTO de los datos.\n\n"
+    "Salida obligatoria: SOLO JSON válido.\n"
+    "Formato de salida (\"nivel\" es el NIVEL SOLICITADO):\n"
+    '{"nivel":"string","verbo_seleccionado":"string","oraciones":[{"oracion":"string","sujeto":"string","objeto":"string"}]}'
+)
+
+INSTRUCCIONES_EXPANSION = (
+    "PROMPT 4A (expansiones de un par):\n"
+    "Toma el VERBO y la ORACIÓN (con SUJETO y OBJETO) de los datos y genera expansiones específicas para el par.\n"
+    "Instrucciones:\n"
+    "- Desarrolla 3 interrogantes: ¿Dónde?, ¿Cuándo? y ¿Por qué?.\n"
+    "- Cada interrogante debe tener exactamente 4 opciones y solo 1 opción correcta.\n"
+    "- Las opciones deben ser concretas y específicas al par (sujeto–verbo–objeto).\n"
+    "- Mantén coherencia semántica con el verbo y la oración.\n"
+    "- Además, agrega una explicación corta (máx. 20 palabras) para CADA opción, indicando por qué es correcta o incorrecta.\n"
+    "- Ejemplo: 'opcion': 'En la cocina', 'explicacion': 'El chef suele trabajar en la cocina, por eso es correcta.'\n"
+    "- IMPORTANTE: No uses comillas dentro de las explicaciones. En lugar de eso, usa comillas simples (' ').\n"
+    "- No cambies el sujeto ni el objeto de entrada.\n"
+    "- Responde SOLO con JSON válido.\n\n"
+    "Formato requerido:\n"
+    '{"sujeto":"string","objeto":"string","expansiones":{'
+    '"donde":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]},'
+    '"cuando":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]},'
+    '"por_que":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]}'
+    "}}"
+)
+
+INSTRUCCIONES_ORACIONES = (
+    "PROMPT 4B (oraciones del ejercicio):\n"
+    "Requisitos para \"oraciones\":\n"
+    "- Usa SIEMPRE el VERBO de los datos.\n"
+    "- Crea EXACTAMENTE 10 oraciones simples (SVC).\n"
+    "- Mezcla correctas e incorrectas.\n"
+    "- Cada una: {\"oracion\":\"string\",\"correcta\":true|false}.\n"
+    "- Responde SOLO con JSON válido.\n\n"
+    "Formato requerido (\"verbo\" es el VERBO de los datos):\n"
+    '{"verbo":"string","oraciones":[{"oracion":"string","correcta":true,"explicacion":"string"}]}'
+)
+
+INSTRUCCIONES_REPARACION_PAR = (
+    "PROMPT R4A (reparar las expansiones de un par):\n"
+    "Una respuesta anterior del PROMPT 4A no cumplió el formato. Regenera SOLO los BLOQUES A CORREGIR "
+    "de los DATOS, con las mismas reglas del PROMPT 4A, y no repitas los bloques que ya estaban bien. "
+    "opcion_correcta debe ser idéntica a una de las 4 opciones.\n"
+    'Formato: {"expansiones":{"<bloque>":{"opciones":["string","string","string","string"],"opcion_correcta":"string","explicaciones":["string","string","string","string"]}}}\n'
+    "- Responde SOLO con JSON válido."
+)
+
+INSTRUCCIONES_REPARACION_ORACIONES = (
+    "PROMPT R4B (completar las oraciones del ejercicio):\n"
+    "Una respuesta anterior del PROMPT 4B no trajo las 10 oraciones. Genera SOLO la CANTIDAD FALTANTE "
+    "de oraciones nuevas para el VERBO, con las mismas reglas del PROMPT 4B, distintas de las ORACIONES EXISTENTES.\n"
+    'Formato: {"oraciones":[{"oracion":"string","correcta":true,"explicacion":"string"}]}\n'
+    "- Responde SOLO con JSON válido."
+)
+
+INTRO = "Eres experto en terapias del lenguaje y generación de ejercicios VNeST."
+
+
+def _system(*partes: str) -> str:
+    return "\n\n".join([
+        INTRO,
+        "El mensaje trae el paso a ejecutar seguido de sus DATOS. Sigue estas instrucciones:",
+        *partes,
+    ])
+
+
+SYSTEM_PROMPTS = {
+    "PROMPT 1": _system(INSTRUCCIONES_VERBOS),
+    "PROMPT 2": _system(INSTRUCCIONES_CLASIFICACION),
+    "PROMPT 3": _system(INSTRUCCIONES_PARES),
+    "PROMPT 4A": _system(INSTRUCCIONES_EXPANSION),
+    "PROMPT 4B": _system(INSTRUCCIONES_ORACIONES),
+    "PROMPT R4A": _system(INSTRUCCIONES_EXPANSION, INSTRUCCIONES_REPARACION_PAR),
+    "PROMPT R4B": _system(INSTRUCCIONES_ORACIONES, INSTRUCCIONES_REPARACION_ORACIONES),
+}
+
+
+def system_prompt(prompt: str) -> str:
+    """System prompt del paso indicado en la primera línea del mensaje ("PROMPT 4A", ...)."""
+    return SYSTEM_PROMPTS.get(prompt.split("\n", 1)[0], INTRO)
+
 
 def generate_verb_prompt(contexto: str) -> str:
     # Prompt 1: 7 verbos transitivos específicos
     return (
-        f"Dado el siguiente contexto: '{contexto}'. "
-        "Genera una lista de exactamente 7 verbos transitivos que cumplan: "
-        "0) Deben ser verbos que puedan claramente usarse en el contexto dado; "
-        "1) Requieren complemento directo; 2) Son cotidianos y familiares; "
-        "3) No son genéricos (evita 'hacer', 'tener', 'llevar'); "
-        "4) Son diferentes entre sí; 5) En infinitivo; 6) Mezcla de dificultades. "
-        "Responde SOLO con JSON válido, sin texto adicional. "
-        'Formato: {\"contexto\":\"string\",\"verbos\":[\"v1\",\"v2\",\"v3\",\"v4\",\"v5\",\"v6\",\"v7\"]}'
+        "PROMPT 1\n"
+        "DATOS:\n"
+        f"CONTEXTO: {contexto}"
     )
 
 def verb_by_difficulty(contexto: str, verbos: List[str]) -> str:
     # Prompt 2: clasificar por dificultad
     return (
-        "Toma este JSON y clasifica los verbos por dificultad. "
-        "Responde SOLO con JSON válido, sin texto adicional. "
-        f'Entrada: {{\"contexto\":\"{contexto}\",\"verbos\":{json.dumps(verbos, ensure_ascii=False)}}} '
-        "Reglas de clasificación: "
-        "Fácil = 1–2 sílabas, muy comunes y fáciles de pronunciar; "
-        "Medio = 2–3 sílabas y dificultad léxica intermedia; "
-        "Difícil = 3+ sílabas o mayor complejidad fonética/léxica. "
-        "Distribución equilibrada (p. ej., 2/3/2). "
-        'Salida (solo JSON): {\"contexto\":\"string\",\"verbos_clasificados\":{\"facil\":[...],\"medio\":[...],\"dificil\":[...]}}'
+        "PROMPT 2\n"
+        "DATOS:\n"
+        f'ENTRADA: {{"contexto":"{contexto}","verbos":{json.dumps(verbos, ensure_ascii=False)}}}'
     )
 
 def pair_subject_object(contexto: str, verbos_clasificados: dict, nivel: str, n_oraciones: int = 3) -> str:
@@ -37,76 +155,55 @@ def pair_subject_object(contexto: str, verbos_clasificados: dict, nivel: str, n_
     n_oraciones: cuántas oraciones disyuntivas generar (por defecto 3)
     """
     return (
-        "PROMPT 3:\n\n"
-        f"Contexto: {contexto}\n"
-        f"Verbos clasificados: {verbos_clasificados}\n"
-        f"Nivel solicitado: {nivel}\n\n"
-        "Toma un ÚNICO verbo del nivel indicado y genera oraciones en español siguiendo estas reglas:\n"
-        f"- Cantidad: exactamente {n_oraciones} oraciones simples (sujeto + verbo + objeto) usando SIEMPRE el MISMO verbo.\n"
-        "- Disyuntivas entre sí: cada sujeto debe vincularse a un objeto que no pueda usarse con otro sujeto de la lista; si intercambias sujeto u objeto entre oraciones y sigue teniendo sentido, la oración es inválida y debe reemplazarse.\n"
-        "- Especificidad máxima: las oraciones deben ser tan concretas y únicas que sea imposible intercambiar sujeto y objeto sin perder el sentido.\n"
-        "- Variedad: oraciones en contextos/temas distintos.\n"
-        "- Conjugación y gramática correctas (presente del indicativo por defecto). Sin pronombres ni nombres propios.\n"
-        "- Sujeto: rol/profesión/entidad típicamente **agente** del verbo elegido.\n"
-        "- Objeto: persona/objeto/documento típicamente **paciente** o **resultado** del verbo elegido.\n\n"
-        "Reglas de PROTOTIPICIDAD (obligatorias):\n"
-        "1) Compatibilidad verbo–sujeto: el SUJETO debe ser un agente habitual del verbo.\n"
-        "2) Compatibilidad verbo–objeto: el OBJETO debe ser una entidad canónica del verbo.\n"
-        "3) Evita combinaciones inter-dominio débiles o atípicas.\n"
-        "4) Cobertura de tipos de OBJETO en el conjunto: usa tres tipos distintos.\n"
-        "5) Prohibido usar sujetos u objetos genéricos ('persona', 'cosa', etc.).\n"
-        f"6) Exactamente UNA oración debe estar directamente relacionada con el contexto '{contexto}'.\n\n"
-        "Salida obligatoria: SOLO JSON válido.\n"
-        "Formato de salida:\n"
-        "{"
-        f"\"nivel\":\"{nivel}\","
-        "\"verbo_seleccionado\":\"string\","
-        "\"oraciones\":["
-        "{\"oracion\":\"string\",\"sujeto\":\"string\",\"objeto\":\"string\"}"
-        "]}"
+        "PROMPT 3\n"
+        "DATOS:\n"
+        f"CONTEXTO: {contexto}\n"
+        f"VERBOS CLASIFICADOS: {verbos_clasificados}\n"
+        f"NIVEL SOLICITADO: {nivel}\n"
+        f"CANTIDAD DE ORACIONES: {n_oraciones}"
+    )
+
+def pair_expansion(verbo: str, oracion: dict) -> str:
+    """
+    Expansiones de UN solo par; step4 lanza una llamada por par en paralelo.
+    oracion: {"oracion": "...", "sujeto": "...", "objeto": "..."} (salida del Prompt 3)
+    """
+    return (
+        "PROMPT 4A\n"
+        "DATOS:\n"
+        f"VERBO: {verbo}\n"
+        f"ORACIÓN: {oracion.get('oracion', '')}\n"
+        f"SUJETO: {oracion.get('sujeto', '')}\n"
+        f"OBJETO: {oracion.get('objeto', '')}"
+    )
+
+def verb_sentences(verbo: str) -> str:
+    """Las 10 oraciones finales solo dependen del verbo; se generan en paralelo con las expansiones."""
+    return (
+        "PROMPT 4B\n"
+        "DATOS:\n"
+        f"VERBO: {verbo}"
     )
 
-def sentence_expansion(verbo: str, oraciones: list[dict]) -> str:
+def repair_pair_expansion(verbo: str, par: dict, errores: dict) -> str:
+    """Reparación de 4A: solo los bloques de expansión inválidos de un par (errores: {bloque: motivo})."""
+    bloques = "\n".join(f"- {bloque}: {motivo}" for bloque, motivo in errores.items())
     return (
-        "PROMPT 4:\n"
-        "Toma el siguiente verbo y las oraciones (con sujeto y objeto) y genera expansiones específicas para cada par.\n"
+        "PROMPT R4A\n"
+        "DATOS:\n"
         f"VERBO: {verbo}\n"
-        f"ORACIONES: {oraciones}\n\n"
-        "Instrucciones:\n"
-        "- Para CADA oración, desarrolla 3 interrogantes: ¿Dónde?, ¿Cuándo? y ¿Por qué?.\n"
-        "- Cada interrogante debe tener exactamente 4 opciones y solo 1 opción correcta.\n"
-        "- Las opciones deben ser concretas y específicas al par (sujeto–verbo–objeto).\n"
-        "- Mantén coherencia semántica con el verbo y las oraciones.\n"
-        "- Además, agrega una explicación corta (máx. 20 palabras) para CADA opción, indicando por qué es correcta o incorrecta.\n"
-        "- Ejemplo: 'opcion': 'En la cocina', 'explicacion': 'El chef suele trabajar en la cocina, por eso es correcta.'\n"
-        "- IMPORTANTE: No uses comillas dentro de las explicaciones. En lugar de eso, usa comillas simples (' ').\n"
-        "- Responde SOLO con JSON válido.\n\n"
-        "Formato requerido:\n"
-        '{'
-        f'"verbo":"{verbo}",'
-        '"pares":['
-        '{"sujeto":"string","objeto":"string","expansiones":{'
-        '"donde":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]},'
-        '"cuando":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]},'
-        '"por_que":{"opciones":["string","string","string","string"],"opcion_correcta":"string", "explicaciones":["string","string","string","string"]}'
-        "}}]}"
+        f"ORACIÓN: {par.get('oracion', '')}\n"
+        f"SUJETO: {par.get('sujeto', '')}\n"
+        f"OBJETO: {par.get('objeto', '')}\n"
+        f"BLOQUES A CORREGIR:\n{bloques}"
     )
 
-def generate_prompt(json_prev: dict) -> str:
+def repair_sentences(verbo: str, existentes: List[str], faltantes: int) -> str:
+    """Reparación de 4B: solo las oraciones que faltan para completar 10."""
     return (
-        "PROMPT 5:\n"
-        "Toma el siguiente JSON y AGRÉGALE una última parte llamada \"oraciones\". "
-        "No elimines ni cambies ninguna clave existente. Devuelve SOLO JSON válido.\n\n"
-        f"JSON de entrada:\n{json.dumps(json_prev, ensure_ascii=False)}\n\n"
-        "Requisitos para \"oraciones\":\n"
-        "- Usa el MISMO verbo del JSON de entrada.\n    "
-        "- Crea EXACTAMENTE 10 oraciones simples (SVC).\n"
-        "- Mezcla correctas e incorrectas.\n"
-        "- Cada una: {\"oracion\":\"string\",\"correcta\":true|false}.\n\n"
-        "Formato requerido:\n"
-        "{"
-        "  \"verbo\": \"string\","
-        "  \"pares\": [ { \"sujeto\": \"string\", \"objeto\": \"string\", \"expansiones\": { ... } } ],"
-        "  \"oraciones\": [ { \"oracion\": \"string\", \"correcta\": true, \"explicacion\": \"string\" } ]"
-        "}"
+        "PROMPT R4B\n"
+        "DATOS:\n"
+        f"VERBO: {verbo}\n"
+        f"CANTIDAD FALTANTE: {faltantes}\n"
+        f"ORACIONES EXISTENTES: {json.dumps(existentes, ensure_ascii=False)}"
     )
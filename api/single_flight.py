@@ -0,0 +1,133 @@
+import os, json, time, asyncio, hashlib, sqlite3, threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import metrics
+
+# ============================================================
+# Peticiones repetidas: single-flight + llaves de idempotencia
+# ============================================================
+# Un doble clic o un re-render del front manda el mismo POST varias veces en
+# pocos segundos, y cada uno corría el pipeline completo y guardaba un
+# ejercicio duplicado.
+# - Single-flight: las peticiones concurrentes con el mismo payload normalizado
+#   (texto libre sin mayúsculas ni espacios extra, sin force_fresh) se unen a la
+#   ejecución en curso y reciben su mismo resultado o su misma excepción.
+# - Idempotency-Key (encabezado): el resultado de una ejecución que terminó bien
+#   se guarda en SQLite durante IDEMPOTENCY_TTL_S; los reintentos del cliente
+#   con la misma llave lo reciben sin generar de nuevo. La misma llave con otro
+#   payload es un conflicto (422). Las fallas no se guardan: el reintento vuelve a ejecutar.
+# Las ejecuciones en curso viven en memoria: el alcance es un proceso de la API.
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") == "1"
+IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH", "idempotency.sqlite3")
+IDEMPOTENCY_TTL_S = float(os.getenv("IDEMPOTENCY_TTL_S", str(24 * 3600)))
+
+# No cambian el ejercicio pedido: un doble clic con y sin force_fresh es la misma petición
+IGNORED_FIELDS = ("force_fresh",)
+# Texto libre que escribe el terapeuta: "Hacer  mercado" y "hacer mercado" son el
+# mismo pedido. Los ids (user_id, exercise_id, creado_por) se comparan tal cual.
+TEXT_FIELDS = ("context",)
+
+_inflight: Dict[str, asyncio.Task] = {}
+_local = threading.local()
+
+
+class IdempotencyConflict(ValueError):
+    """La llave de idempotencia ya se usó con otro endpoint o payload."""
+
+
+def _norm(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+def payload_key(endpoint: str, payload: dict) -> str:
+    """Huella del pedido: endpoint + payload normalizado."""
+    fields = {
+        k: _norm(v) if k in TEXT_FIELDS and isinstance(v, str) else v
+        for k, v in payload.items() if k not in IGNORED_FIELDS
+    }
+    raw = json.dumps([endpoint, fields], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+# ==============================
+# RESULTADOS POR LLAVE (SQLite)
+# ==============================
+def _conn() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(IDEMPOTENCY_DB_PATH, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS idempotencia ("
+            " llave TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload_key TEXT NOT NULL,"
+            " respuesta TEXT NOT NULL, creado REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+
+def _get(llave: str) -> Optional[sqlite3.Row]:
+    return _conn().execute(
+        "SELECT * FROM idempotencia WHERE llave = ? AND creado >= ?",
+        (llave, time.time() - IDEMPOTENCY_TTL_S),
+    ).fetchone()
+
+
+def _put(llave: str, endpoint: str, key: str, respuesta: Any):
+    _conn().execute(
+        "INSERT OR REPLACE INTO idempotencia (llave, endpoint, payload_key, respuesta, creado) VALUES (?, ?, ?, ?, ?)",
+        (llave, endpoint, key, json.dumps(respuesta, ensure_ascii=False, default=str), time.time()),
+    )
+
+
+def purge_expired() -> int:
+    """Borra las llaves vencidas. Devuelve cuántas eliminó."""
+    cur = _conn().execute("DELETE FROM idempotencia WHERE creado < ?", (time.time() - IDEMPOTENCY_TTL_S,))
+    return cur.rowcount
+
+# ==============================
+# API
+# ==============================
+def _forget(key: str, task: asyncio.Task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # ya la recibieron quienes esperaban; evita el aviso de asyncio
+
+
+async def run(
+    endpoint: str,
+    payload: dict,
+    factory: Callable[[], Awaitable[Any]],
+    idempotency_key: Optional[str] = None,
+) -> Any:
+    """
+    Ejecuta factory() una sola vez por pedido en curso y devuelve su resultado.
+    La ejecución corre en su propia tarea (con el contexto de quien llegó primero):
+    si un cliente se desconecta, los demás la siguen esperando.
+    """
+    key = payload_key(endpoint, payload)
+    if idempotency_key:
+        stored = await asyncio.to_thread(_get, idempotency_key)
+        if stored is not None:
+            if stored["endpoint"] != endpoint or stored["payload_key"] != key:
+                raise IdempotencyConflict("La llave de idempotencia ya se usó con otro pedido")
+            metrics.count_single_flight(endpoint, "idempotente")
+            return json.loads(stored["respuesta"])
+
+    task = _inflight.get(key) if SINGLE_FLIGHT_ENABLED else None
+    if task is None:
+        metrics.count_single_flight(endpoint, "ejecutada")
+        task = asyncio.ensure_future(factory())
+        if SINGLE_FLIGHT_ENABLED:
+            _inflight[key] = task
+            task.add_done_callback(lambda t: _forget(key, t))
+    else:
+        metrics.count_single_flight(endpoint, "compartida")
+        print(f"🔗 Pedido idéntico en curso para {endpoint}: se comparte su resultado")
+
+    result = await asyncio.shield(task)
+    if idempotency_key:
+        await asyncio.to_thread(_put, idempotency_key, endpoint, key, result)
+    return result
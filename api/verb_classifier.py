@@ -0,0 +1,158 @@
+import os
+from functools import lru_cache
+from typing import Dict, List
+
+# ============================================================
+# Clasificación local de verbos por dificultad
+# ============================================================
+# Reemplaza la llamada a Azure de step2_classify_verbs aplicando las mismas
+# reglas del prompt verb_by_difficulty (prompts_vnest.py):
+#   Fácil   = 1–2 sílabas, muy comunes y fáciles de pronunciar
+#   Medio   = 2–3 sílabas, dificultad léxica intermedia
+#   Difícil = 3+ sílabas o mayor complejidad fonética/léxica
+#   Distribución equilibrada (2/3/2 para 7 verbos)
+
+FREQ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "verbos_frecuentes.txt")
+
+VOWELS = set("aeiouáéíóúü")
+STRONG = set("aeoáéíóú")  # í/ú acentuadas forman hiato como las fuertes
+CLUSTERS = {"pr", "br", "tr", "dr", "cr", "kr", "gr", "fr", "pl", "bl", "cl", "kl", "gl", "fl"}
+
+# ==============================
+# SILABEO
+# ==============================
+def _units(word: str) -> List[str]:
+    """Parte la palabra en unidades fonéticas: dígrafos (ch, ll, rr, qu, gu+e/i) cuentan como una."""
+    w = word.lower().strip()
+    units, i = [], 0
+    while i < len(w):
+        two = w[i:i + 2]
+        nxt = w[i + 2:i + 3]
+        if two in ("ch", "ll", "rr"):
+            units.append(two)
+            i += 2
+        elif two in ("qu", "gu") and nxt in ("e", "i", "é", "í"):
+            units.append(two)  # la 'u' no suena
+            i += 2
+        else:
+            units.append(w[i])
+            i += 1
+    return units
+
+
+def _is_vowel(unit: str, nxt: str) -> bool:
+    if unit in VOWELS:
+        return True
+    # 'y' final funciona como vocal (hoy, muy)
+    return unit == "y" and not nxt
+
+
+def syllabify(word: str) -> List[str]:
+    """Divide una palabra en sílabas con las reglas ortográficas del español."""
+    units = _units(word)
+    if not units:
+        return []
+
+    kinds = []
+    for i, u in enumerate(units):
+        nxt = units[i + 1] if i + 1 < len(units) else ""
+        kinds.append("V" if _is_vowel(u, nxt) else "C")
+
+    # Núcleos: vocales seguidas forman diptongo salvo dos fuertes (hiato)
+    nuclei = []  # pares (inicio, fin) sobre units
+    i = 0
+    while i < len(units):
+        if kinds[i] != "V":
+            i += 1
+            continue
+        start = i
+        while (
+            i + 1 < len(units)
+            and kinds[i + 1] == "V"
+            and not (units[i] in STRONG and units[i + 1] in STRONG)
+        ):
+            i += 1
+        nuclei.append((start, i))
+        i += 1
+
+    if not nuclei:
+        return [word]
+
+    # Consonantes entre núcleos: una pasa a la siguiente sílaba; si las dos
+    # últimas forman grupo inseparable (pr, bl, ...), pasan juntas.
+    cuts = []
+    for (_, end), (nstart, _) in zip(nuclei, nuclei[1:]):
+        between = units[end + 1:nstart]
+        if len(between) >= 2 and "".join(between[-2:]) in CLUSTERS:
+            cuts.append(nstart - 2)
+        elif between:
+            cuts.append(nstart - 1)
+        else:
+            cuts.append(nstart)
+
+    syllables, prev = [], 0
+    for c in cuts + [len(units)]:
+        syllables.append("".join(units[prev:c]))
+        prev = c
+    return syllables
+
+
+def count_syllables(word: str) -> int:
+    return len(syllabify(word))
+
+# ==============================
+# FRECUENCIA
+# ==============================
+_freq_rank: Dict[str, int] = {}
+
+def frequency_rank(verbo: str) -> int:
+    """Posición del verbo en la lista de frecuentes (0 = más frecuente); -1 si no está."""
+    if not _freq_rank:
+        with open(FREQ_PATH, encoding="utf-8") as f:
+            words = [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+        _freq_rank.update({w: i for i, w in enumerate(words)})
+    return _freq_rank.get(verbo.lower().strip(), -1)
+
+# ==============================
+# PUNTAJE Y CLASIFICACIÓN
+# ==============================
+def phonetic_complexity(verbo: str) -> float:
+    """Grupos consonánticos (tr, bl, ...), 'rr', 'x' y codas dobles dificultan la pronunciación."""
+    units = _units(verbo)
+    score = 0.0
+    for a, b in zip(units, units[1:]):
+        if a + b in CLUSTERS:
+            score += 1
+        elif a not in VOWELS and b not in VOWELS and a != "y" and b != "y":
+            score += 0.5  # coda + ataque (ns, bs, cc, ...)
+    score += sum(1 for u in units if u in ("rr", "x"))
+    return score
+
+
+@lru_cache(maxsize=4096)
+def difficulty_score(verbo: str) -> float:
+    rank = frequency_rank(verbo)
+    if rank == -1:
+        lexical = 1.5
+    elif rank < 100:
+        lexical = 0.0
+    elif rank < 300:
+        lexical = 0.5
+    else:
+        lexical = 1.0
+    return count_syllables(verbo) + 0.5 * phonetic_complexity(verbo) + lexical
+
+
+def classify_verbs(verbos: List[str]) -> Dict[str, List[str]]:
+    """
+    Clasifica los verbos en facil/medio/dificil.
+    Se ordenan por puntaje y se reparten en proporción 2/3/2, como pide el prompt.
+    """
+    ordered = sorted(verbos, key=lambda v: (difficulty_score(v), v))
+    n = len(ordered)
+    n_extremo = round(n * 2 / 7)
+    return {
+        "facil": ordered[:n_extremo],
+        "medio": ordered[n_extremo:n - n_extremo],
+        "dificil": ordered[n - n_extremo:],
+    }
@@ -0,0 +1,197 @@
+from typing import Dict
+
+from json_stream import StreamSchema
+
+# ============================================================
+# Validación estructural de las salidas VNeST
+# ============================================================
+# assert_len y validate_exp_block también los usa database/seed.py para los
+# ejercicios que se cargan a mano; aquí se aplican a la salida de cada nodo del
+# grafo. Cada check_* devuelve la salida normalizada o lanza InvalidOutputError
+# con lo que falta, separado por parte (bloque de expansión, oraciones, ...)
+# para que el nodo pida solo esa parte.
+# Se usan como parser de run_prompt: lo que no pasa no entra a llm_cache.
+# Los STREAM_* son la parte que se revisa mientras la respuesta llega en
+# streaming (json_stream): solo lo que no tiene reparación, para cortar y pedir de nuevo.
+
+N_VERBOS = 7
+N_OPCIONES = 4
+N_ORACIONES = 10
+EXPANSIONES = ("donde", "cuando", "por_que")
+NIVELES = ("facil", "medio", "dificil")
+
+
+class InvalidOutputError(ValueError):
+    """
+    La respuesta es JSON válido pero no cumple el esquema.
+    errores: {parte: motivo}; salida: lo rescatable, base para la reparación.
+    """
+
+    def __init__(self, errores: Dict[str, str], salida=None):
+        super().__init__("; ".join(f"{k}: {v}" for k, v in errores.items()))
+        self.errores = errores
+        self.salida = salida
+
+
+def norm(s: str) -> str:
+    return " ".join((s or "").strip().split())
+
+
+def assert_len(arr, n, name):
+    if not isinstance(arr, list) or len(arr) != n:
+        raise ValueError(f"{name} debe ser un array de tamaño {n}")
+
+
+def validate_exp_block(block: dict, name: str) -> dict:
+    if not isinstance(block, dict):
+        raise ValueError(f"expansiones.{name} falta o no es un objeto")
+    opciones = block.get("opciones") or []
+    assert_len(opciones, N_OPCIONES, f"expansiones.{name}.opciones")
+    opciones = [norm(x) if isinstance(x, str) else "" for x in opciones]
+    if not all(opciones) or len(set(opciones)) != N_OPCIONES:
+        raise ValueError(f"expansiones.{name}.opciones tiene opciones vacías o repetidas")
+    correct = norm(block.get("opcion_correcta", ""))
+    if correct not in opciones:
+        raise ValueError(f"expansiones.{name}.opcion_correcta no está en opciones")
+    validated = {"opciones": opciones, "opcion_correcta": correct}
+    if "explicaciones" in block:
+        assert_len(block["explicaciones"], N_OPCIONES, f"expansiones.{name}.explicaciones")
+        validated["explicaciones"] = block["explicaciones"]
+    return validated
+
+# ==============================
+# CHECKS POR NODO
+# ==============================
+def check_verbs(out: dict) -> dict:
+    """step1: 7 verbos distintos (sobrantes se descartan)."""
+    verbos, vistos = [], set()
+    for v in out.get("verbos") or []:
+        v = norm(v) if isinstance(v, str) else ""
+        if v and v.lower() not in vistos:
+            vistos.add(v.lower())
+            verbos.append(v)
+    if len(verbos) < N_VERBOS:
+        raise InvalidOutputError({"verbos": f"hay {len(verbos)} verbos distintos de {N_VERBOS}"}, out)
+    return {**out, "verbos": verbos[:N_VERBOS]}
+
+
+def check_classification(out: dict) -> dict:
+    """step2 (modo llm): listas facil, medio y dificil, sin dejar ningún nivel vacío."""
+    clasificados = out.get("verbos_clasificados")
+    if not isinstance(clasificados, dict):
+        raise InvalidOutputError({"verbos_clasificados": "falta o no es un objeto"}, out)
+    errores = {
+        nivel: "falta o está vacío"
+        for nivel in NIVELES
+        if not isinstance(clasificados.get(nivel), list) or not clasificados[nivel]
+    }
+    if errores:
+        raise InvalidOutputError(errores, out)
+    return out
+
+
+def check_svo(out: dict, n: int) -> dict:
+    """step3: verbo seleccionado y n oraciones con sujeto, objeto y oración."""
+    errores = {}
+    verbo = norm(out.get("verbo_seleccionado", ""))
+    if not verbo:
+        errores["verbo_seleccionado"] = "falta"
+    oraciones = [
+        {"oracion": norm(o.get("oracion", "")), "sujeto": norm(o.get("sujeto", "")), "objeto": norm(o.get("objeto", ""))}
+        for o in out.get("oraciones") or [] if isinstance(o, dict)
+    ]
+    oraciones = [o for o in oraciones if all(o.values())]
+    if len(oraciones) < n:
+        errores["oraciones"] = f"hay {len(oraciones)} oraciones completas de {n}"
+    if errores:
+        raise InvalidOutputError(errores, out)
+    return {**out, "verbo_seleccionado": verbo, "oraciones": oraciones[:n]}
+
+
+def check_pair(out: dict, sujeto: str, objeto: str) -> dict:
+    """
+    step4_expand_pair: los tres bloques de expansión. Sujeto y objeto se fijan
+    con los de entrada (el prompt prohíbe cambiarlos). Los bloques válidos
+    quedan en la salida del error para conservarlos al reparar.
+    """
+    expansiones = out.get("expansiones") if isinstance(out.get("expansiones"), dict) else {}
+    validos, errores = {}, {}
+    for name in EXPANSIONES:
+        try:
+            validos[name] = validate_exp_block(expansiones.get(name), name)
+        except ValueError as e:
+            errores[name] = str(e)
+    par = {"sujeto": sujeto, "objeto": objeto, "expansiones": validos}
+    if errores:
+        raise InvalidOutputError(errores, par)
+    return par
+
+
+def check_sentences(out: dict) -> dict:
+    """
+    step4_generate_sentences: 10 oraciones distintas con "correcta" booleano.
+    Las sobrantes se descartan; si faltan, la salida del error trae las válidas.
+    """
+    oraciones, vistas = [], set()
+    for o in out.get("oraciones") or []:
+        if not isinstance(o, dict) or not isinstance(o.get("correcta"), bool):
+            continue
+        texto = norm(o.get("oracion", "")) if isinstance(o.get("oracion"), str) else ""
+        if texto and texto.lower() not in vistas:
+            vistas.add(texto.lower())
+            oraciones.append({**o, "oracion": texto})
+    if len(oraciones) < N_ORACIONES:
+        raise InvalidOutputError(
+            {"oraciones": f"hay {len(oraciones)} oraciones válidas de {N_ORACIONES}"}, {"oraciones": oraciones}
+        )
+    return {"oraciones": oraciones[:N_ORACIONES]}
+
+
+def validate_final(out5: dict, n_pares: int):
+    """step4_merge: el ejercicio completo antes de guardarlo."""
+    if not out5.get("verbo"):
+        raise ValueError("Falta 'verbo'")
+    pares = out5.get("pares")
+    assert_len(pares, n_pares, "pares")
+    for par in pares:
+        check_pair(par, par.get("sujeto", ""), par.get("objeto", ""))
+    check_sentences(out5)
+    assert_len(out5.get("oraciones"), N_ORACIONES, "oraciones")
+
+# ==============================
+# ESQUEMAS DE STREAMING
+# ==============================
+# Los conteos que check_* recorta o que la reparación parcial completa no van
+# aquí; sí un tope (el doble) para cortar salidas que se quedan repitiendo elementos.
+STREAM_VERBS = StreamSchema(
+    required=["verbos"],
+    types={"verbos": list},
+    min_items={"verbos": N_VERBOS},
+    max_items={"verbos": 2 * N_VERBOS},
+)
+
+STREAM_CLASSIFICATION = StreamSchema(
+    required=["verbos_clasificados"],
+    types={"verbos_clasificados": dict, "verbos_clasificados.*": list},
+)
+
+STREAM_PAIR = StreamSchema(
+    required=["expansiones"],
+    types={"expansiones": dict},
+    max_items={"expansiones.*.opciones": 2 * N_OPCIONES, "expansiones.*.explicaciones": 2 * N_OPCIONES},
+)
+
+STREAM_SENTENCES = StreamSchema(
+    required=["oraciones"],
+    types={"oraciones": list},
+    max_items={"oraciones": 2 * N_ORACIONES},
+)
+
+
+def stream_svo(n: int) -> StreamSchema:
+    return StreamSchema(
+        required=["verbo_seleccionado", "oraciones"],
+        types={"verbo_seleccionado": str, "oraciones": list, "oraciones.[]": dict},
+        min_items={"oraciones": n},
+        max_items={"oraciones": 2 * n},
+    )
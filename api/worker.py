@@ -0,0 +1,81 @@
+"""
+Worker de trabajos de generación.
+
+Corre en un proceso separado de la API para que la latencia de los
+endpoints no dependa del backlog de generación:
+    python worker.py --concurrency 4 --metrics-port 9101
+"""
+import os, argparse, asyncio, traceback
+
+import jobs
+import llm_cache
+import llm_usage
+import metrics
+from main_langraph_vnest import main_langraph_vnest
+from main_langraph_sr import main_langraph_sr
+from main_personalization import main_personalization
+from main_profile_structure import main_profile_structure
+
+JOBS_WORKER_CONCURRENCY = int(os.getenv("JOBS_WORKER_CONCURRENCY", "4"))
+JOBS_POLL_INTERVAL_S = float(os.getenv("JOBS_POLL_INTERVAL_S", "1.0"))
+JOBS_STALE_S = float(os.getenv("JOBS_STALE_S", "1800"))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+# ==============================
+# PIPELINES POR TIPO
+# ==============================
+# Los payloads tienen la misma forma que los de los endpoints síncronos de main.py
+PIPELINES = {
+    "vnest": lambda p: main_langraph_vnest(p["context"], p["nivel"], p["creado_por"], p["tipo"]),
+    "sr": lambda p: main_langraph_sr(p["user_id"], p["profile"]),
+    "personalizacion": lambda p: main_personalization(p["user_id"], p["exercise_id"], p["profile"]),
+    "perfil": lambda p: main_profile_structure(p["user_id"], p["raw_text"]),
+}
+
+
+async def run_job(job: dict):
+    print(f"▶️ Trabajo {job['id']} ({job['tipo']})")
+    llm_cache.force_fresh.set(job["payload"].get("force_fresh", False))
+    llm_usage.endpoint.set("/jobs")
+    llm_usage.creado_por.set(job["payload"].get("creado_por", "-"))
+    llm_usage.job_id.set(job["id"])
+    try:
+        result = await PIPELINES[job["tipo"]](job["payload"])
+    except Exception as e:
+        traceback.print_exc()
+        await asyncio.to_thread(jobs.fail, job["id"], str(e))
+        print(f"❌ Trabajo {job['id']} falló: {e}")
+        return
+    await asyncio.to_thread(jobs.complete, job["id"], result)
+    print(f"✅ Trabajo {job['id']} completado")
+
+
+async def worker_loop():
+    while True:
+        job = await asyncio.to_thread(jobs.claim_next)
+        if job is None:
+            await asyncio.sleep(JOBS_POLL_INTERVAL_S)
+            continue
+        # Cada trabajo en su propia tarea para aislar su contexto (force_fresh, etc.)
+        await asyncio.create_task(run_job(job))
+
+
+async def main(concurrency: int, metrics_port: int = 0):
+    metrics.instrument_firestore()
+    if metrics_port and metrics.METRICS_ENABLED:
+        from prometheus_client import start_http_server
+        start_http_server(metrics_port)
+        print(f"📈 Métricas en http://0.0.0.0:{metrics_port}/metrics")
+    requeued = jobs.requeue_stale(JOBS_STALE_S)
+    if requeued:
+        print(f"♻️ {requeued} trabajos abandonados vuelven a la cola")
+    print(f"Worker iniciado con {concurrency} tareas concurrentes")
+    await asyncio.gather(*[worker_loop() for _ in range(concurrency)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=JOBS_WORKER_CONCURRENCY)
+    parser.add_argument("--metrics-port", type=int, default=WORKER_METRICS_PORT, help="0 = sin /metrics")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.metrics_port))
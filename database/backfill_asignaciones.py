@@ -0,0 +1,106 @@
+"""
+Migración: copia verbo, nivel, personalizado (y contexto si falta) en las
+asignaciones existentes de /pacientes/{id}/ejercicios_asignados.
+
+get_exercise_for_context filtra las asignaciones por (contexto, verbo, estado)
+sin leer los ejercicios, así que las asignaciones viejas sin esos campos no
+aparecerían. Recorre todas las asignaciones en streaming (collection group),
+lee los ejercicios de cada tanda con get_all y escribe con WriteBatch.
+
+Uso (desde database/, con serviceAccountKey.json):
+    python backfill_asignaciones.py --dry-run
+    python backfill_asignaciones.py
+
+El índice compuesto está en firestore.indexes.json:
+    firebase deploy --only firestore:indexes
+"""
+import os, argparse
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# ---------- CONFIG CREDENCIALES ----------
+KEY_PATH = "serviceAccountKey.json"
+if not os.path.isfile(KEY_PATH):
+    raise FileNotFoundError(f"No encuentro la llave en: {KEY_PATH}")
+
+# ---------- INIT FIREBASE ----------
+if not firebase_admin._apps:
+    cred = credentials.Certificate(KEY_PATH)
+    firebase_admin.initialize_app(cred)
+db = firestore.client()
+
+BATCH_LIMIT = 500  # escrituras por commit
+CAMPOS = ("verbo", "nivel", "personalizado", "contexto")
+
+
+# ---------- UTILS ----------
+def get_docs(collection: str, ids) -> dict:
+    """{id: datos} de los ids de la colección en un solo get_all."""
+    ids = [i for i in dict.fromkeys(ids) if i]
+    if not ids:
+        return {}
+    refs = [db.collection(collection).document(i) for i in ids]
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+
+def build_update(asignacion: dict, general: dict, especifico: dict) -> dict:
+    """Campos que faltan en la asignación, tomados de los ejercicios."""
+    valores = {
+        "verbo": especifico.get("verbo"),
+        "nivel": especifico.get("nivel"),
+        "personalizado": general.get("personalizado", False),
+        "contexto": especifico.get("contexto"),
+    }
+    update = {k: v for k, v in valores.items() if k not in asignacion}
+    # verbo/nivel pueden quedar en None (SR), pero un contexto vacío no aporta nada
+    if update.get("contexto") is None:
+        update.pop("contexto", None)
+    return update
+
+
+def process_chunk(snaps: list, dry_run: bool) -> int:
+    ids = [s.to_dict().get("id_ejercicio") or s.id for s in snaps]
+    generales = get_docs("ejercicios", ids)
+    vnest = get_docs("ejercicios_VNEST", [i for i in ids if generales.get(i, {}).get("terapia") == "VNEST"])
+    sr = get_docs("ejercicios_SR", [i for i in ids if generales.get(i, {}).get("terapia") == "SR"])
+
+    batch = db.batch()
+    updated = 0
+    for snap, ex_id in zip(snaps, ids):
+        especifico = vnest.get(ex_id) or sr.get(ex_id) or {}
+        update = build_update(snap.to_dict(), generales.get(ex_id, {}), especifico)
+        if not update:
+            continue
+        batch.update(snap.reference, update)
+        updated += 1
+    if updated and not dry_run:
+        batch.commit()
+    return updated
+
+
+def backfill(dry_run: bool, chunk_size: int = BATCH_LIMIT):
+    total = updated = 0
+    chunk = []
+    for snap in db.collection_group("ejercicios_asignados").stream():
+        data = snap.to_dict()
+        total += 1
+        if all(c in data for c in CAMPOS):
+            continue
+        chunk.append(snap)
+        if len(chunk) == chunk_size:
+            updated += process_chunk(chunk, dry_run)
+            chunk = []
+            print(f"   ↳ {total} revisadas, {updated} actualizadas")
+    if chunk:
+        updated += process_chunk(chunk, dry_run)
+
+    modo = " (dry-run, sin escribir)" if dry_run else ""
+    print(f"✅ Backfill terminado{modo}: {total} asignaciones revisadas, {updated} actualizadas")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="solo cuenta, no escribe")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_LIMIT)
+    args = parser.parse_args()
+    backfill(args.dry_run, min(args.chunk_size, BATCH_LIMIT))
@@ -0,0 +1,97 @@
+"""
+Migración: agrega a /ejercicios_VNEST los campos de selección aleatoria
+(publico, personalizado, aleatorio) que usa get_exercise_for_context.
+
+publico y personalizado se copian del ejercicio general en /ejercicios
+(publico = tipo distinto de "privado"); aleatorio es una clave en [0, 1)
+que se sortea una sola vez por ejercicio. Recorre la colección en streaming,
+lee los generales de cada tanda con get_all y escribe con WriteBatch.
+
+Uso (desde database/, con serviceAccountKey.json):
+    python backfill_ejercicios_vnest.py --dry-run
+    python backfill_ejercicios_vnest.py
+
+El índice compuesto está en firestore.indexes.json:
+    firebase deploy --only firestore:indexes
+"""
+import os, random, argparse
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# ---------- CONFIG CREDENCIALES ----------
+KEY_PATH = "serviceAccountKey.json"
+if not os.path.isfile(KEY_PATH):
+    raise FileNotFoundError(f"No encuentro la llave en: {KEY_PATH}")
+
+# ---------- INIT FIREBASE ----------
+if not firebase_admin._apps:
+    cred = credentials.Certificate(KEY_PATH)
+    firebase_admin.initialize_app(cred)
+db = firestore.client()
+
+BATCH_LIMIT = 500  # escrituras por commit
+CAMPOS = ("publico", "personalizado", "aleatorio")
+
+
+# ---------- UTILS ----------
+def get_docs(collection: str, ids) -> dict:
+    """{id: datos} de los ids de la colección en un solo get_all."""
+    ids = [i for i in dict.fromkeys(ids) if i]
+    if not ids:
+        return {}
+    refs = [db.collection(collection).document(i) for i in ids]
+    return {snap.id: snap.to_dict() for snap in db.get_all(refs) if snap.exists}
+
+
+def build_update(vnest: dict, general: dict) -> dict:
+    """Campos de selección que faltan en el ejercicio VNEST."""
+    valores = {
+        "publico": general.get("tipo", "publico") != "privado",
+        "personalizado": general.get("personalizado", False),
+        "aleatorio": random.random(),
+    }
+    return {k: v for k, v in valores.items() if k not in vnest}
+
+
+def process_chunk(snaps: list, dry_run: bool) -> int:
+    ids = [s.to_dict().get("id_ejercicio_general") or s.id for s in snaps]
+    generales = get_docs("ejercicios", ids)
+
+    batch = db.batch()
+    updated = 0
+    for snap, general_id in zip(snaps, ids):
+        update = build_update(snap.to_dict(), generales.get(general_id, {}))
+        if not update:
+            continue
+        batch.update(snap.reference, update)
+        updated += 1
+    if updated and not dry_run:
+        batch.commit()
+    return updated
+
+
+def backfill(dry_run: bool, chunk_size: int = BATCH_LIMIT):
+    total = updated = 0
+    chunk = []
+    for snap in db.collection("ejercicios_VNEST").stream():
+        total += 1
+        if all(c in snap.to_dict() for c in CAMPOS):
+            continue
+        chunk.append(snap)
+        if len(chunk) == chunk_size:
+            updated += process_chunk(chunk, dry_run)
+            chunk = []
+            print(f"   ↳ {total} revisados, {updated} actualizados")
+    if chunk:
+        updated += process_chunk(chunk, dry_run)
+
+    modo = " (dry-run, sin escribir)" if dry_run else ""
+    print(f"✅ Backfill terminado{modo}: {total} ejercicios VNEST revisados, {updated} actualizados")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="solo cuenta, no escribe")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_LIMIT)
+    args = parser.parse_args()
+    backfill(args.dry_run, min(args.chunk_size, BATCH_LIMIT))
@@ -16,21 +16,9 @@ if not firebase_admin._apps:
 db = firestore.client()
 
 # ---------- UTILS ----------
-def norm(s: str) -> str:
-    return " ".join((s or "").strip().split())
-
-def assert_len(arr, n, name):
-    if not isinstance(arr, list) or len(arr) != n:
-        raise ValueError(f"{name} debe ser un array de tamaño {n}")
-
-def validate_exp_block(block: dict, name: str):
-    opciones = block.get("opciones") or []
-    assert_len(opciones, 4, f"expansiones.{name}.opciones")
-    opciones = [norm(x) for x in opciones]
-    correct = norm(block.get("opcion_correcta", ""))
-    if correct not in opciones:
-        raise ValueError(f"expansiones.{name}.opcion_correcta no está en opciones")
-    return {"opciones": opciones, "opcion_correcta": correct}
+# Mismas reglas que valida el pipeline VNeST de la API (api/vnest_validation.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from vnest_validation import norm, validate_exp_block
 
 def find_pair_id(verbo: str, sujeto: str, objeto: str):
     q = (db.collection("pairs")
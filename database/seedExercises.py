@@ -1,3 +1,4 @@
+import random
 import firebase_admin
 from firebase_admin import credentials, firestore
 
@@ -46,6 +47,9 @@ def seed_ejercicios():
         "nivel": "fácil",
         "contexto": "Hacer mercado",
         "verbo": "comprar",
+        "publico": True,
+        "personalizado": False,
+        "aleatorio": random.random(),
         "oraciones": [
             {"oracion": "El cliente compra pan.", "correcta": True},
             {"oracion": "El turista compra un recuerdo.", "correcta": True},